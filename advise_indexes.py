@@ -0,0 +1,85 @@
+import os
+import sys
+import argparse
+import sqlite3
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+# Add current dir to path to find 'app'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.infrastructure.index_advisor import IndexAdvisor
+from app.infrastructure.sqlite_pool import SqliteWriter
+from app.infrastructure.workload_log import WorkloadLog
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend (and optionally create) indexes for the recorded query workload.")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "data/sqlite.db"), help="database to analyze")
+    parser.add_argument("--workload", default=os.getenv("WORKLOAD_LOG_PATH", "data/workload.db"),
+                        help="workload log written by the server")
+    parser.add_argument("--min-runs", type=int, default=1, help="ignore statements that ran fewer times")
+    parser.add_argument("--limit", type=int, default=10, help="maximum number of recommendations")
+    parser.add_argument("--foreign-keys", action="store_true",
+                        help="also consider a lookup join per foreign key (useful before any traffic)")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes and run ANALYZE")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"ERROR: Database '{args.db}' not found. Run init_db.py first.")
+        return 1
+
+    workload = []
+    if os.path.exists(args.workload):
+        log = WorkloadLog(args.workload)
+        workload = log.entries(min_runs=args.min_runs)
+        log.close()
+    print(f"[*] Workload: {len(workload)} statements from {args.workload}")
+
+    conn = sqlite3.connect(f"file:{os.path.abspath(args.db)}?mode=ro", uri=True)
+    advisor = IndexAdvisor(conn)
+    if args.foreign_keys:
+        workload += advisor.foreign_key_workload()
+    if not workload:
+        print("Nothing to analyze: serve some queries first, or pass --foreign-keys.")
+        return 0
+
+    recommendations = advisor.advise(workload, limit=args.limit)
+    advisor.close()
+    conn.close()
+
+    if not recommendations:
+        print("No index would reduce the estimated cost of the workload.")
+        return 0
+
+    print(tabulate(
+        [
+            [r.table, ", ".join(r.columns), "yes" if r.covering else "", r.statements, r.runs,
+             f"{r.cost_before:,.0f}", f"{r.cost_after:,.0f}", f"{r.benefit:,.0f}"]
+            for r in recommendations
+        ],
+        headers=["Table", "Columns", "Covering", "Statements", "Runs", "Cost before", "Cost after", "Saved"],
+        tablefmt="grid"
+    ))
+    for r in recommendations:
+        print(f"{r.create_sql};")
+
+    if not args.apply:
+        print("\nRe-run with --apply to create these indexes.")
+        return 0
+
+    writer = SqliteWriter(args.db)
+    with writer.connection() as write_conn:
+        for r in recommendations:
+            print(f"[*] Creating {r.name}...")
+            write_conn.execute(r.create_sql)
+        print("[*] Running ANALYZE...")
+        write_conn.execute("ANALYZE")
+        write_conn.commit()
+    writer.close()
+    print("Done. Running servers pick up the new indexes and statistics on their next query.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+class LLMServiceError(Exception):
+    """
+    Raised by ILLMService implementations when a provider call fails.
+    `retryable` marks transient failures (rate limits, 5xx, timeouts,
+    connection errors) that are worth another attempt.
+    """
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+class CircuitOpenError(LLMServiceError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, message: str = "LLM circuit breaker is open"):
+        super().__init__(message, retryable=False)
+
+class DatabaseBusyError(Exception):
+    """Raised when no database connection became free within the pool's acquire timeout."""
@@ -1,13 +1,19 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from app.domain.models import SchemaInfo, SQLGeneration, ExecutionResult, ValidationResult
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, ContextManager
+from app.domain.models import SchemaInfo, SQLGeneration, ExecutionResult, ValidationResult, FusedGeneration
 
 class IDatabase(ABC):
     """Interface for Database Operations."""
-    
+
     @abstractmethod
-    def execute_query(self, sql: str) -> ExecutionResult:
-        """Executes a SQL query and returns the results."""
+    def execute_query(self, sql: str, max_rows: Optional[int] = None, offset: int = 0) -> ExecutionResult:
+        """
+        Executes a SQL query and returns the results.
+        With `max_rows`, at most that many rows (starting at `offset`) are returned
+        and `truncated` is set when more rows exist.
+        """
         pass
 
     @abstractmethod
@@ -20,8 +26,59 @@ class IDatabase(ABC):
         """Retrieves all table names in the database."""
         pass
 
+    def get_schema_version(self) -> int:
+        """
+        A number that changes whenever table definitions change, so callers can
+        rebuild anything derived from the schema. Default: 0 (never changes).
+        """
+        return 0
+
+    def schema_snapshot(self) -> ContextManager:
+        """
+        Context manager during which schema lookups may be served from one
+        snapshot without re-checking for changes (e.g. for a batch of
+        questions). Default: no-op.
+        """
+        return nullcontext()
+
+    def iter_query(self, sql: str, chunk_size: int = 500) -> Iterator[ExecutionResult]:
+        """
+        Executes a SQL query and yields the rows in chunks (each chunk is an
+        ExecutionResult with the same columns). Default: a single chunk.
+        """
+        yield self.execute_query(sql)
+
+    # Async variants. Default: run the sync method in a worker thread.
+    # Implementations can override to use their own executor.
+
+    async def iter_query_async(self, sql: str, chunk_size: int = 500) -> AsyncIterator[ExecutionResult]:
+        chunks = self.iter_query(sql, chunk_size)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            chunks.close()
+
+    async def execute_query_async(self, sql: str, max_rows: Optional[int] = None, offset: int = 0) -> ExecutionResult:
+        return await asyncio.to_thread(self.execute_query, sql, max_rows, offset)
+
+    async def get_schema_info_async(self, table_names: List[str]) -> List[SchemaInfo]:
+        return await asyncio.to_thread(self.get_schema_info, table_names)
+
+    async def get_all_table_names_async(self) -> List[str]:
+        return await asyncio.to_thread(self.get_all_table_names)
+
+    async def get_schema_version_async(self) -> int:
+        return await asyncio.to_thread(self.get_schema_version)
+
 class ILLMService(ABC):
-    """Interface for LLM Operations."""
+    """
+    Interface for LLM Operations.
+    Provider failures may raise LLMServiceError (see ResilientLLMService).
+    """
 
     @abstractmethod
     def generate_sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
@@ -38,18 +95,66 @@ class ILLMService(ABC):
         """Analyzes query and data to suggest visualization chart."""
         pass
 
+    def generate_fused(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        """
+        One call that picks the tables from `context`, writes the SQL and
+        proposes a chart. Default: plain generate_sql over the whole context,
+        no chart hint.
+        """
+        generation = self.generate_sql(query, context)
+        return FusedGeneration(tables=[info.table_name for info in context], generation=generation)
+
+    # Async variants. Default: run the sync method in a worker thread.
+    # Implementations with a native async client should override these.
+
+    async def generate_sql_async(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        return await asyncio.to_thread(self.generate_sql, query, context)
+
+    async def guess_intent_async(self, query: str, available_tables: List[str]) -> List[str]:
+        return await asyncio.to_thread(self.guess_intent, query, available_tables)
+
+    async def suggest_chart_async(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.suggest_chart, query, columns)
+
+    async def generate_fused_async(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        generation = await self.generate_sql_async(query, context)
+        return FusedGeneration(tables=[info.table_name for info in context], generation=generation)
+
+    def record_success(self, query: str, context: List[SchemaInfo], generation: SQLGeneration):
+        """
+        Feedback: `generation` passed validation and executed successfully for
+        `query` with this `context`. Default: ignored.
+        """
+        pass
+
 class IRagEngine(ABC):
     """Interface for RAG Operations."""
 
     @abstractmethod
-    def get_context(self, query: str) -> List[SchemaInfo]:
-        """Retrieves the relevant schema context for a query."""
+    def get_context(self, query: str, llm_fallback: bool = True) -> List[SchemaInfo]:
+        """
+        Retrieves the relevant schema context for a query.
+        With llm_fallback=False no LLM is called: when nothing matches locally,
+        the whole catalog is returned (the caller lets the LLM choose).
+        """
+        pass
+
+    async def get_context_async(self, query: str, llm_fallback: bool = True) -> List[SchemaInfo]:
+        """Async variant of get_context."""
+        return await asyncio.to_thread(self.get_context, query, llm_fallback)
+
+    def record_success(self, query: str, tables: List[str]):
+        """Feedback: `query` was answered correctly from `tables`. Default: ignored."""
         pass
 
 class IValidator(ABC):
     """Interface for SQL Validation."""
-    
+
     @abstractmethod
     def validate(self, sql: str) -> ValidationResult:
         """Validates the SQL query for safety and syntax."""
         pass
+
+    async def validate_async(self, sql: str) -> ValidationResult:
+        # Validators may touch the database (catalog, prepare): keep them off the event loop
+        return await asyncio.to_thread(self.validate, sql)
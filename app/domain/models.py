@@ -1,12 +1,22 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 
+@dataclass
+class ForeignKey:
+    """A single-column foreign key: table.column -> ref_table.ref_column."""
+    column: str
+    ref_table: str
+    ref_column: str
+
 @dataclass
 class SchemaInfo:
     """Represents the schema information for RAG context."""
     table_name: str
     columns: List[str]
     sample_rows: List[Dict[str, Any]]
+    foreign_keys: List[ForeignKey] = field(default_factory=list)
+    # Join conditions to the other tables of the same context ("a.x = b.y")
+    joins: List[str] = field(default_factory=list)
 
 @dataclass
 class UserQuery:
@@ -21,6 +31,18 @@ class SQLGeneration:
     explanation: Optional[str] = None
     is_safe: bool = False
     error_message: Optional[str] = None
+    cached: bool = False
+    # Estimated size of the prompt sent to the LLM (0 when no call was made)
+    prompt_tokens: int = 0
+
+@dataclass
+class FusedGeneration:
+    """Output of a single fused LLM call: table choice, SQL and a provisional chart."""
+    tables: List[str]
+    generation: SQLGeneration
+    # Chart config keyed on the SELECT's output columns, unchecked until the result
+    # exists. None = no opinion; {"chart_type": "none"} = a table is better.
+    chart_hint: Optional[Dict[str, Any]] = None
 
 @dataclass
 class ValidationResult:
@@ -29,6 +51,16 @@ class ValidationResult:
     sql: Optional[str] = None
     error: Optional[str] = None
 
+@dataclass
+class QueryPlan:
+    """EXPLAIN QUERY PLAN summary with the estimated cost of a statement."""
+    steps: List[str]
+    # Estimated rows visited, and an upper bound on the rows produced
+    cost: float
+    rows: float
+    # "ok", "capped" (run with a tighter time budget) or "rejected"
+    action: str = "ok"
+
 @dataclass
 class ExecutionResult:
     """Result of SQL execution."""
@@ -36,3 +68,34 @@ class ExecutionResult:
     rows: List[Any]
     success: bool
     error: Optional[str] = None
+    cached: bool = False
+    truncated: bool = False
+    timed_out: bool = False
+    plan: Optional[QueryPlan] = None
+
+@dataclass
+class QueryOutcome:
+    """End-to-end result of running one question through the pipeline."""
+    context: List[SchemaInfo]
+    sql: Optional[str] = None
+    explanation: Optional[str] = None
+    execution: Optional[ExecutionResult] = None
+    chart_config: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    query_id: Optional[str] = None
+    plan: Optional[QueryPlan] = None
+    # Timed spans of the run (name, start_ms, duration_ms, attributes)
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+
+@dataclass
+class BatchItem:
+    """One question of a batch run, reported as soon as it finishes."""
+    index: int
+    question: str
+    outcome: QueryOutcome
+    # Time spent on this question, and when it finished relative to the batch start
+    seconds: float
+    finished_at: float
+    # True when the question repeats an earlier one and reuses its outcome
+    duplicate: bool = False
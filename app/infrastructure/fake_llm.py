@@ -0,0 +1,145 @@
+# Infrastructure Layer
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+from app.domain.interfaces import ILLMService
+from app.domain.exceptions import LLMServiceError
+from app.domain.models import SQLGeneration, SchemaInfo, FusedGeneration
+from app.infrastructure.prompt_builder import estimate_tokens
+from app.infrastructure.generation_cache import normalize_question
+
+def latency_distribution(spec: str, seed: Optional[int] = None) -> Union[float, Callable[[], float]]:
+    """
+    Parses a latency spec (seconds) for FakeLLMService: "0.8" (fixed),
+    "uniform:LOW:HIGH", "normal:MEAN:STDDEV", "lognormal:MEDIAN:SIGMA" or
+    "exp:MEAN". Samples come from their own seeded generator.
+    """
+    kind, _, params = spec.strip().partition(":")
+    if not params:
+        return float(kind)
+    args = [float(p) for p in params.split(":")]
+    rng = random.Random(seed)
+    samplers = {
+        "uniform": lambda low, high: lambda: rng.uniform(low, high),
+        "normal": lambda mean, stddev: lambda: rng.gauss(mean, stddev),
+        "lognormal": lambda median, sigma: lambda: rng.lognormvariate(math.log(median), sigma),
+        "exp": lambda mean: lambda: rng.expovariate(1.0 / mean),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}' (expected one of {', '.join(samplers)})")
+    return samplers[kind](*args)
+
+def load_answers(path: str) -> Dict[str, str]:
+    """Canned SQL from a JSON list of {"question": ..., "sql": ...}, keyed on the normalized question."""
+    with open(path) as f:
+        return {normalize_question(item["question"]): item["sql"] for item in json.load(f)}
+
+class FakeLLMService(ILLMService):
+    """
+    Offline ILLMService for tests and load experiments.
+
+    Every call sleeps for `latency` seconds (a number, or a callable returning
+    one, e.g. a sampled distribution) and fails with probability `error_rate`
+    (a retryable LLMServiceError like a 429/503, or with `retryable_errors`
+    off a non-retryable one like an unparsable answer). The answers are
+    deterministic: the canned SQL from `answers` (normalized question -> SQL)
+    when the question is known, otherwise a small SELECT over the first context
+    table; the first tables for guess_intent and a bar chart over the first
+    and last result columns.
+    """
+
+    def __init__(self, latency: Union[float, Callable[[], float]] = 0.05, error_rate: float = 0.0,
+                 seed: Optional[int] = None, answers: Optional[Dict[str, str]] = None,
+                 retryable_errors: bool = True):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retryable_errors = retryable_errors
+        self.answers = answers or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.calls = 0
+        self.errors = 0
+
+    def _next_delay(self) -> float:
+        """Counts the call, then returns its latency or raises the injected error."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency() if callable(self.latency) else self.latency
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if failed:
+            raise LLMServiceError("Injected failure (fake LLM)", retryable=self.retryable_errors)
+        return max(delay, 0.0)
+
+    # ==========================================
+    # Canned answers
+    # ==========================================
+
+    def _sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        prompt_tokens = estimate_tokens(query) + sum(estimate_tokens(" ".join(i.columns)) for i in context)
+        canned = self.answers.get(normalize_question(query))
+        if canned:
+            return SQLGeneration(sql=canned, explanation="Canned answer.", is_safe=True, prompt_tokens=prompt_tokens)
+        if not context:
+            return SQLGeneration(sql="", error_message="No tables in context", is_safe=False)
+        table = context[0].table_name
+        return SQLGeneration(
+            sql=f"SELECT * FROM {table} LIMIT 10",
+            explanation=f"First rows of {table}.",
+            is_safe=True,
+            prompt_tokens=prompt_tokens
+        )
+
+    def _chart(self, columns: List[str]) -> Optional[Dict[str, Any]]:
+        if len(columns) < 2:
+            return None
+        return {
+            "chart_type": "bar",
+            "title": "Result",
+            "x_column": columns[0],
+            "y_columns": [columns[-1]],
+            "labels": [columns[-1]]
+        }
+
+    # ==========================================
+    # ILLMService
+    # ==========================================
+
+    def generate_sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        time.sleep(self._next_delay())
+        return self._sql(query, context)
+
+    def guess_intent(self, query: str, available_tables: List[str]) -> List[str]:
+        time.sleep(self._next_delay())
+        return available_tables[:3]
+
+    def suggest_chart(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        time.sleep(self._next_delay())
+        return self._chart(columns)
+
+    def generate_fused(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        time.sleep(self._next_delay())
+        return FusedGeneration(tables=[i.table_name for i in context[:1]], generation=self._sql(query, context))
+
+    async def generate_sql_async(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        await asyncio.sleep(self._next_delay())
+        return self._sql(query, context)
+
+    async def guess_intent_async(self, query: str, available_tables: List[str]) -> List[str]:
+        await asyncio.sleep(self._next_delay())
+        return available_tables[:3]
+
+    async def suggest_chart_async(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(self._next_delay())
+        return self._chart(columns)
+
+    async def generate_fused_async(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        await asyncio.sleep(self._next_delay())
+        return FusedGeneration(tables=[i.table_name for i in context[:1]], generation=self._sql(query, context))
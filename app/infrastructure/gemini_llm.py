@@ -1,145 +1,276 @@
 from google import genai
-from google.genai import types
+from google.genai import types, errors
+import httpx
 import json
 import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.domain.interfaces import ILLMService
-from app.domain.models import SQLGeneration, SchemaInfo
+from app.domain.exceptions import LLMServiceError
+from app.domain.models import SQLGeneration, SchemaInfo, FusedGeneration
+from app.infrastructure.prompt_builder import SchemaPromptBuilder, estimate_tokens, sanitize_text
+from app.infrastructure.telemetry import metrics, span, Span
+
+LLM_TOKENS = metrics.counter("texttosql_llm_tokens_total", "Tokens reported by Gemini", ["operation", "kind"])
+
+SQL_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sql": {"type": "string"},
+        "explanation": {"type": "string"},
+        "is_safe": {"type": "boolean"}
+    },
+    "required": ["sql", "explanation", "is_safe"]
+}
+
+INTENT_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string"}
+}
+
+CHART_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "chart_type": {"type": "string"},
+        "title": {"type": "string"},
+        "x_column": {"type": "string"},
+        "y_columns": {"type": "array", "items": {"type": "string"}},
+        "labels": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["chart_type", "title", "x_column", "y_columns", "labels"]
+}
+
+# HTTP status codes worth retrying (rate limit, overload, gateway errors)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+FUSED_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tables": {"type": "array", "items": {"type": "string"}},
+        "sql": {"type": "string"},
+        "explanation": {"type": "string"},
+        "is_safe": {"type": "boolean"},
+        "chart": CHART_RESPONSE_SCHEMA
+    },
+    "required": ["tables", "sql", "explanation", "is_safe", "chart"]
+}
 
 class GeminiService(ILLMService):
-    def __init__(self, api_key: str, model_name: str = "gemini-3-flash-preview"):
+    def __init__(self, api_key: str, model_name: str = "gemini-3-flash-preview",
+                 prompt_builder: Optional[SchemaPromptBuilder] = None):
         self.client = genai.Client(api_key=api_key)
         self.model_name = model_name
+        self.prompt_builder = prompt_builder or SchemaPromptBuilder()
 
     def _sanitize_text(self, text: str) -> str:
         """
         Removes surrogate characters that are not allowed in UTF-8 encoding.
         This prevents UnicodeEncodeError when sending data to Gemini.
         """
-        if not isinstance(text, str):
-            return str(text)
-        return text.encode('utf-8', 'ignore').decode('utf-8')
+        return sanitize_text(text)
 
-    def generate_sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
-        # Construct Context String
-        schema_text = ""
-        for info in context:
-            # Sanitize potentially dirty data from database (sample_rows)
-            table_info = f"\nTable: {info.table_name}\nColumns: {', '.join(info.columns)}\nMsg: Sample Rows: {info.sample_rows}\n"
-            schema_text += self._sanitize_text(table_info)
+    def _json_config(self, response_schema: Dict[str, Any]) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=response_schema
+        )
+
+    def _error(self, e: Exception) -> LLMServiceError:
+        """Maps a client/parsing exception to LLMServiceError (retryable or not)."""
+        if isinstance(e, errors.APIError):
+            retryable = e.code in RETRYABLE_STATUS
+            return LLMServiceError(f"Gemini API error {e.code}: {e.message or e.status}", retryable=retryable)
+        if isinstance(e, (json.JSONDecodeError, TypeError)):
+            return LLMServiceError(f"Invalid JSON from model: {e}", retryable=False)
+        if isinstance(e, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError)):
+            return LLMServiceError(f"Gemini connection error: {e}", retryable=True)
+        return LLMServiceError(str(e), retryable=False)
+
+    def _record_usage(self, operation: str, response: Any, call: Span):
+        """Adds the token counts Gemini reports to the span and the token counter."""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        output_tokens = getattr(usage, "candidates_token_count", None) or 0
+        call.set(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+        LLM_TOKENS.inc(prompt_tokens, operation=operation, kind="prompt")
+        LLM_TOKENS.inc(output_tokens, operation=operation, kind="output")
+
+    def _generate_json(self, operation: str, prompt: str, response_schema: Dict[str, Any]) -> Any:
+        """Blocking structured-output call. Returns the parsed JSON payload."""
+        with span(f"llm.{operation}", model=self.model_name) as call:
+            try:
+                response = self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._json_config(response_schema)
+                )
+                self._record_usage(operation, response, call)
+                return json.loads(response.text)
+            except Exception as e:
+                raise self._error(e) from e
+
+    async def _generate_json_async(self, operation: str, prompt: str, response_schema: Dict[str, Any]) -> Any:
+        """Same as _generate_json but uses the genai async client (no thread blocked)."""
+        with span(f"llm.{operation}", model=self.model_name) as call:
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=self._json_config(response_schema)
+                )
+                self._record_usage(operation, response, call)
+                return json.loads(response.text)
+            except Exception as e:
+                raise self._error(e) from e
+
+    # ==========================================
+    # Prompt Builders
+    # ==========================================
+
+    def _build_sql_prompt(self, query: str, context: List[SchemaInfo]) -> Tuple[str, int]:
+        """Returns (prompt, estimated prompt tokens)."""
+        # Precompiled, already sanitized per-table fragments under the token budget
+        schema_text, _ = self.prompt_builder.build(context)
 
         # Sanitize query just in case
         query = self._sanitize_text(query)
 
         prompt = f"""
         You are an expert SQL Generator. Convert the user's natural language query into a valid SQL query for SQLite.
-        
+
         Context:
         {schema_text}
-        
+
         User Query: "{query}"
-        
+
         Rules:
         1. "is_safe" should be false if the query modifies data (INSERT/UPDATE/DELETE/DROP).
         2. Use the provided schema names exactly.
+        3. Join tables only on the listed "Joins" conditions.
         """
-        
-        prompt = self._sanitize_text(prompt)
-
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema={
-                        "type": "object",
-                        "properties": {
-                            "sql": {"type": "string"},
-                            "explanation": {"type": "string"},
-                            "is_safe": {"type": "boolean"}
-                        },
-                        "required": ["sql", "explanation", "is_safe"]
-                    }
-                )
-            )
-            data = json.loads(response.text)
-            return SQLGeneration(
-                sql=data.get("sql", ""),
-                explanation=data.get("explanation", ""),
-                is_safe=data.get("is_safe", True)
-            )
-        except Exception as e:
-            return SQLGeneration(sql="", error_message=str(e), is_safe=False)
 
-    def guess_intent(self, query: str, available_tables: List[str]) -> List[str]:
+        return prompt, estimate_tokens(prompt)
+
+    def _build_fused_prompt(self, query: str, context: List[SchemaInfo]) -> Tuple[str, int]:
+        """SQL prompt plus table selection and a chart for the query's own output columns."""
+        schema_text, _ = self.prompt_builder.build(context)
+        query = self._sanitize_text(query)
+
+        prompt = f"""
+        You are an expert SQL Generator. Convert the user's natural language query into a valid SQL query for SQLite.
+
+        Context:
+        {schema_text}
+
+        User Query: "{query}"
+
+        Rules:
+        1. "tables": the tables from the context that the SQL uses.
+        2. "is_safe" should be false if the query modifies data (INSERT/UPDATE/DELETE/DROP).
+        3. Use the provided schema names exactly.
+        4. Join tables only on the listed "Joins" conditions.
+        5. "chart": the best visualization for the rows your SQL returns.
+           - "chart_type": One of ["bar", "line", "pie", "doughnut", "scatter", "none"]. Use "none" if a table is better.
+           - "x_column" and "y_columns" must be output column names (aliases) of your SELECT.
+           - "labels": A LIST of labels for each dataset.
+        """
+
+        return prompt, estimate_tokens(prompt)
+
+    def _build_intent_prompt(self, query: str, available_tables: List[str]) -> str:
         prompt = f"""
         Given the user query: "{query}"
         And the list of available tables: {', '.join(available_tables)}
-        
+
         Identify the top 3-5 most relevant tables needed to answer this query.
         """
-        
-        prompt = self._sanitize_text(prompt)
-
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema={
-                        "type": "array",
-                        "items": {"type": "string"}
-                    }
-                )
-            )
-            return json.loads(response.text)
-        except:
-            return []
 
-    def suggest_chart(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        return self._sanitize_text(prompt)
+
+    def _build_chart_prompt(self, query: str, columns: List[str]) -> str:
         prompt = f"""
         Analyze the user query and the returned data columns to suggest the best visualization chart type.
-        
+
         User Query: "{query}"
         Columns: {columns}
-        
+
         Return a configuration JSON.
         - "chart_type": One of ["bar", "line", "pie", "doughnut", "scatter", "none"]. Use "none" if a table is better.
         - "title": A concise title for the chart.
         - "x_column": The column name to use for the X-axis (labels).
         - "y_columns": A LIST of column names to use for the Y-axis (values). E.g. ["sales", "profit"].
         - "labels": A LIST of labels for each dataset (e.g., ["Total Revenue", "Net Profit"]).
-        
+
         If "chart_type" is "none", other fields can be null.
         """
-        
-        prompt = self._sanitize_text(prompt)
-
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema={
-                        "type": "object",
-                        "properties": {
-                            "chart_type": {"type": "string"},
-                            "title": {"type": "string"},
-                            "x_column": {"type": "string"},
-                            "y_columns": {"type": "array", "items": {"type": "string"}},
-                            "labels": {"type": "array", "items": {"type": "string"}}
-                        },
-                        "required": ["chart_type", "title", "x_column", "y_columns", "labels"]
-                    }
-                )
-            )
-            
-            data = json.loads(response.text)
-            if data.get("chart_type") == "none":
-                return None
-            return data
-        except:
+
+        return self._sanitize_text(prompt)
+
+    # ==========================================
+    # Response Parsers
+    # ==========================================
+
+    def _parse_sql(self, data: Dict[str, Any], prompt_tokens: int = 0) -> SQLGeneration:
+        return SQLGeneration(
+            sql=data.get("sql", ""),
+            explanation=data.get("explanation", ""),
+            is_safe=data.get("is_safe", True),
+            prompt_tokens=prompt_tokens
+        )
+
+    def _parse_chart(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if data.get("chart_type") == "none":
             return None
+        return data
+
+    def _parse_fused(self, data: Dict[str, Any], context: List[SchemaInfo], prompt_tokens: int) -> FusedGeneration:
+        known = {info.table_name for info in context}
+        return FusedGeneration(
+            tables=[t for t in data.get("tables", []) if t in known],
+            generation=self._parse_sql(data, prompt_tokens),
+            # Kept as-is: {"chart_type": "none"} tells the caller a table is better
+            chart_hint=data.get("chart")
+        )
+
+    # ==========================================
+    # ILLMService (sync)
+    # Failures raise LLMServiceError; ResilientLLMService retries them and
+    # turns the final failure into an empty result.
+    # ==========================================
+
+    def generate_sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        prompt, prompt_tokens = self._build_sql_prompt(query, context)
+        return self._parse_sql(self._generate_json("generate_sql", prompt, SQL_RESPONSE_SCHEMA), prompt_tokens)
+
+    def guess_intent(self, query: str, available_tables: List[str]) -> List[str]:
+        prompt = self._build_intent_prompt(query, available_tables)
+        return self._generate_json("guess_intent", prompt, INTENT_RESPONSE_SCHEMA)
+
+    def suggest_chart(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        prompt = self._build_chart_prompt(query, columns)
+        return self._parse_chart(self._generate_json("suggest_chart", prompt, CHART_RESPONSE_SCHEMA))
+
+    def generate_fused(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        prompt, prompt_tokens = self._build_fused_prompt(query, context)
+        data = self._generate_json("generate_fused", prompt, FUSED_RESPONSE_SCHEMA)
+        return self._parse_fused(data, context, prompt_tokens)
+
+    # ==========================================
+    # ILLMService (async)
+    # ==========================================
+
+    async def generate_sql_async(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        prompt, prompt_tokens = self._build_sql_prompt(query, context)
+        return self._parse_sql(await self._generate_json_async("generate_sql", prompt, SQL_RESPONSE_SCHEMA), prompt_tokens)
+
+    async def guess_intent_async(self, query: str, available_tables: List[str]) -> List[str]:
+        prompt = self._build_intent_prompt(query, available_tables)
+        return await self._generate_json_async("guess_intent", prompt, INTENT_RESPONSE_SCHEMA)
+
+    async def suggest_chart_async(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        prompt = self._build_chart_prompt(query, columns)
+        return self._parse_chart(await self._generate_json_async("suggest_chart", prompt, CHART_RESPONSE_SCHEMA))
+
+    async def generate_fused_async(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        prompt, prompt_tokens = self._build_fused_prompt(query, context)
+        data = await self._generate_json_async("generate_fused", prompt, FUSED_RESPONSE_SCHEMA)
+        return self._parse_fused(data, context, prompt_tokens)
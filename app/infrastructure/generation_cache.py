@@ -0,0 +1,210 @@
+# Infrastructure Layer
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Dict, Any
+from app.domain.interfaces import ILLMService
+from app.domain.models import SQLGeneration, SchemaInfo, FusedGeneration
+
+def normalize_question(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!.;, ")
+
+def schema_fingerprint(context: List[SchemaInfo]) -> str:
+    """Hash of the structural part of the context (tables, columns, FKs). Sample rows are ignored."""
+    payload = [
+        [info.table_name, info.columns, [[fk.column, fk.ref_table, fk.ref_column] for fk in info.foreign_keys]]
+        for info in sorted(context, key=lambda i: i.table_name)
+    ]
+    return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()[:16]
+
+class GenerationCache:
+    """
+    Persistent question -> SQL cache stored in a SQLite side-file.
+
+    - Key: normalized question + schema fingerprint, so a schema change never hits old SQL.
+    - When a question is stored under a new fingerprint, its older entries are deleted.
+    - LRU eviction on `last_used` once `max_entries` is exceeded, plus a TTL on `created_at`.
+    - The file is shared by all uvicorn workers (WAL + busy timeout handle the locking).
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Process-local counters
+        self.hits = 0
+        self.misses = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generations (
+                    cache_key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    explanation TEXT,
+                    is_safe INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_last_used ON generations(last_used)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_question ON generations(question)")
+            self._conn = conn
+        return self._conn
+
+    def _key(self, question: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\n{question}".encode("utf-8")).hexdigest()
+
+    def get(self, query: str, context: List[SchemaInfo]) -> Optional[SQLGeneration]:
+        question = normalize_question(query)
+        key = self._key(question, schema_fingerprint(context))
+        now = time.time()
+
+        with self._lock:
+            conn = self._get_connection()
+            row = conn.execute(
+                "SELECT sql, explanation, is_safe, created_at FROM generations WHERE cache_key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[3] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM generations WHERE cache_key = ?", (key,))
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE generations SET last_used = ? WHERE cache_key = ?", (now, key))
+            self.hits += 1
+
+        return SQLGeneration(sql=row[0], explanation=row[1], is_safe=bool(row[2]), cached=True)
+
+    def put(self, query: str, context: List[SchemaInfo], generation: SQLGeneration):
+        # Only remember usable answers
+        if not generation.sql or generation.error_message:
+            return
+
+        question = normalize_question(query)
+        fingerprint = schema_fingerprint(context)
+        key = self._key(question, fingerprint)
+        now = time.time()
+
+        with self._lock:
+            conn = self._get_connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Schema changed for this question -> drop the stale entries
+                conn.execute(
+                    "DELETE FROM generations WHERE question = ? AND fingerprint != ?", (question, fingerprint)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, question, fingerprint, generation.sql, generation.explanation,
+                     int(generation.is_safe), now, now)
+                )
+                conn.execute("DELETE FROM generations WHERE created_at < ?", (now - self.ttl_seconds,))
+                overflow = conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM generations WHERE cache_key IN "
+                        "(SELECT cache_key FROM generations ORDER BY last_used LIMIT ?)", (overflow,)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class CachingLLMService(ILLMService):
+    """
+    ILLMService decorator that answers generate_sql from a GenerationCache when possible.
+
+    A generation is stored only once the pipeline reports it through
+    record_success() (validated and executed), so SQL that is rejected or
+    fails in SQLite is regenerated next time instead of being replayed.
+    """
+
+    def __init__(self, inner: ILLMService, cache: GenerationCache):
+        self.inner = inner
+        self.cache = cache
+
+    def _lookup(self, query: str, context: List[SchemaInfo]) -> Optional[SQLGeneration]:
+        try:
+            return self.cache.get(query, context)
+        except sqlite3.Error as e:
+            print(f"WARNING: Generation cache read failed: {e}")
+            return None
+
+    def _store(self, query: str, context: List[SchemaInfo], generation: SQLGeneration):
+        try:
+            self.cache.put(query, context, generation)
+        except sqlite3.Error as e:
+            print(f"WARNING: Generation cache write failed: {e}")
+
+    def generate_sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        cached = self._lookup(query, context)
+        if cached:
+            return cached
+        return self.inner.generate_sql(query, context)
+
+    def generate_fused(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        # Only the SQL is cached; a hit has no chart hint and the chart is picked later
+        cached = self._lookup(query, context)
+        if cached:
+            return FusedGeneration(tables=[info.table_name for info in context], generation=cached)
+        return self.inner.generate_fused(query, context)
+
+    def record_success(self, query: str, context: List[SchemaInfo], generation: SQLGeneration):
+        if not generation.cached:
+            self._store(query, context, generation)
+        self.inner.record_success(query, context, generation)
+
+    def guess_intent(self, query: str, available_tables: List[str]) -> List[str]:
+        return self.inner.guess_intent(query, available_tables)
+
+    def suggest_chart(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        return self.inner.suggest_chart(query, columns)
+
+    async def generate_sql_async(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        # The side-file may be locked briefly by another worker; keep that off the loop
+        cached = await asyncio.to_thread(self._lookup, query, context)
+        if cached:
+            return cached
+        return await self.inner.generate_sql_async(query, context)
+
+    async def generate_fused_async(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        cached = await asyncio.to_thread(self._lookup, query, context)
+        if cached:
+            return FusedGeneration(tables=[info.table_name for info in context], generation=cached)
+        return await self.inner.generate_fused_async(query, context)
+
+    async def guess_intent_async(self, query: str, available_tables: List[str]) -> List[str]:
+        return await self.inner.guess_intent_async(query, available_tables)
+
+    async def suggest_chart_async(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        return await self.inner.suggest_chart_async(query, columns)
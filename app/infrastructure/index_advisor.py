@@ -0,0 +1,284 @@
+# Infrastructure Layer
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from app.infrastructure.query_planner import QueryPlanner, TableStats, table_aliases
+from app.infrastructure.schema_catalog import quote_identifier
+from app.infrastructure.workload_log import WorkloadEntry
+
+# "o.user_id = ", "status IN (", "created_at >= " (column on the left)
+_LEFT = re.compile(r"(?:(\w+)\.)?(\w+)\s*(=|==|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bIS\b)", re.IGNORECASE)
+# "= u.user_id" (column on the right of a comparison)
+_RIGHT = re.compile(r"(=|<=|>=|<|>)\s*(?:(\w+)\.)?(\w+)", re.IGNORECASE)
+_QUALIFIED = re.compile(r"(\w+)\.(\w+|\*)")
+_WORD = re.compile(r"\w+")
+_SCAN = re.compile(r"^SCAN (\S+)(?: USING (COVERING )?INDEX \S+)?$")
+
+@dataclass
+class IndexRecommendation:
+    """A candidate index and what it would save on the recorded workload."""
+    table: str
+    columns: List[str]
+    covering: bool
+    # Workload statements it improves, their total runs, and the estimated
+    # cost (rows visited, weighted by runs) without and with the index
+    statements: int
+    runs: int
+    cost_before: float
+    cost_after: float
+    examples: List[str] = field(default_factory=list)
+
+    @property
+    def benefit(self) -> float:
+        return self.cost_before - self.cost_after
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def create_sql(self) -> str:
+        columns = ", ".join(quote_identifier(c) for c in self.columns)
+        return f"CREATE INDEX IF NOT EXISTS {quote_identifier(self.name)} ON {quote_identifier(self.table)} ({columns})"
+
+class IndexAdvisor:
+    """
+    Recommends secondary indexes for a recorded workload.
+
+    For every statement, EXPLAIN QUERY PLAN shows which tables are fully
+    scanned. The columns of a scanned table that appear in join or filter
+    predicates become the index key (equalities first, then one range
+    column); when the statement only touches a few more columns of that
+    table, they are appended so the index covers it.
+
+    Each candidate is then tried "what-if" style on an in-memory copy of the
+    schema that carries the real table statistics: the candidate is created
+    there with estimated rows-per-key, and the statements are re-planned and
+    costed with the QueryPlanner. Candidates are ranked by total saved cost
+    (weighted by how often each statement ran).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, planner: Optional[QueryPlanner] = None,
+                 max_columns: int = 4, min_benefit: float = 1000.0):
+        # Read-only connection to the served database
+        self.conn = conn
+        self.planner = planner or QueryPlanner()
+        self.max_columns = max_columns
+        self.min_benefit = min_benefit
+
+        self._columns = self._load_columns()
+        self._stats = TableStats.load(conn)
+        self._distinct: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self._whatif = self._build_whatif()
+        self._whatif_version = 0
+
+    # ==========================================
+    # What-if database
+    # ==========================================
+
+    def _load_columns(self) -> Dict[str, List[str]]:
+        names = [row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        # row format: (cid, name, type, notnull, dflt_value, pk)
+        return {
+            name: [row[1] for row in self.conn.execute(f"PRAGMA table_info({quote_identifier(name)})")]
+            for name in names
+        }
+
+    def _build_whatif(self) -> sqlite3.Connection:
+        """Empty copy of the schema whose sqlite_stat1 describes the real data."""
+        whatif = sqlite3.connect(":memory:", isolation_level=None)
+        for (sql,) in self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+            "AND name NOT LIKE 'sqlite_%' ORDER BY type DESC"
+        ):
+            whatif.execute(sql)
+        whatif.execute("ANALYZE sqlite_master")  # creates sqlite_stat1
+        whatif.execute("DELETE FROM sqlite_stat1")
+        for table, rows in self._stats.tables.items():
+            whatif.execute("INSERT INTO sqlite_stat1 VALUES (?, NULL, ?)", (table, str(int(rows))))
+        for index, numbers in self._stats.indexes.items():
+            table = whatif.execute("SELECT tbl_name FROM sqlite_master WHERE name = ?", (index,)).fetchone()
+            if table:
+                whatif.execute("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)",
+                               (table[0], index, " ".join(str(int(n)) for n in numbers)))
+        whatif.execute("ANALYZE sqlite_master")  # reloads the statistics
+        return whatif
+
+    def _cost(self, sql: str) -> Optional[float]:
+        try:
+            return self.planner.plan(self._whatif, sql, self._whatif_version).cost
+        except sqlite3.Error:
+            return None
+
+    def _rows_per_key(self, table: str, columns: List[str]) -> str:
+        """sqlite_stat1 'stat' for a hypothetical index, from COUNT(DISTINCT) on the real data."""
+        total = max(self._stats.tables.get(table, 0.0), 1.0)
+        numbers = [str(int(total))]
+        for width in range(1, len(columns) + 1):
+            key = (table, tuple(columns[:width]))
+            if key not in self._distinct:
+                prefix = ", ".join(quote_identifier(c) for c in columns[:width])
+                distinct = self.conn.execute(
+                    f"SELECT COUNT(*) FROM (SELECT DISTINCT {prefix} FROM {quote_identifier(table)})"
+                ).fetchone()[0]
+                self._distinct[key] = max(distinct, 1)
+            numbers.append(str(max(int(round(total / self._distinct[key])), 1)))
+        return " ".join(numbers)
+
+    def _try(self, candidate: IndexRecommendation, workload: List[WorkloadEntry], baseline: Dict[str, float]):
+        """Creates the candidate in the what-if database and adds up what it saves on the workload."""
+        self._whatif.execute(candidate.create_sql)
+        self._whatif.execute("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)",
+                             (candidate.table, candidate.name, self._rows_per_key(candidate.table, candidate.columns)))
+        self._whatif.execute("ANALYZE sqlite_master")
+        self._whatif_version += 1
+        try:
+            for entry in workload:
+                before = baseline.get(entry.sql)
+                after = self._cost(entry.sql)
+                if before is None or after is None or after >= before:
+                    continue
+                candidate.statements += 1
+                candidate.runs += entry.runs
+                candidate.cost_before += before * entry.runs
+                candidate.cost_after += after * entry.runs
+                if len(candidate.examples) < 3:
+                    candidate.examples.append(entry.sql)
+        finally:
+            self._whatif.execute(f"DROP INDEX {quote_identifier(candidate.name)}")
+            self._whatif.execute("DELETE FROM sqlite_stat1 WHERE idx = ?", (candidate.name,))
+            self._whatif.execute("ANALYZE sqlite_master")
+            self._whatif_version += 1
+
+    # ==========================================
+    # Candidates
+    # ==========================================
+
+    def _scanned_tables(self, sql: str) -> Dict[str, str]:
+        """alias -> table for every full table scan in the statement's plan."""
+        aliases = table_aliases(sql)
+        scanned = {}
+        for _, _, _, detail in self._whatif.execute(f"EXPLAIN QUERY PLAN {sql}"):
+            match = _SCAN.match(detail)
+            if not match:
+                continue
+            name = match.group(1)
+            table = aliases.get(name, name)
+            if table in self._columns:
+                scanned[name] = table
+        return scanned
+
+    def _candidates(self, sql: str) -> List[Tuple[str, List[str], bool]]:
+        """(table, key + covered columns, covering) for each scanned table of a statement."""
+        scanned = self._scanned_tables(sql)
+        if not scanned:
+            return []
+
+        # Which query tables own an unqualified column name
+        tables_in_query = set(table_aliases(sql).values()) | set(scanned.values())
+        tables_in_query |= {word for word in _WORD.findall(sql) if word in self._columns}
+        owners: Dict[str, Set[str]] = {}
+        for table in tables_in_query:
+            for column in self._columns.get(table, []):
+                owners.setdefault(column, set()).add(table)
+
+        def resolve(qualifier: Optional[str], column: str, alias: str, table: str) -> bool:
+            if column not in self._columns[table]:
+                return False
+            if qualifier:
+                return qualifier in (alias, table)
+            return owners.get(column) == {table}
+
+        candidates = []
+        for alias, table in scanned.items():
+            equalities: List[str] = []
+            ranges: List[str] = []
+            for qualifier, column, op in _LEFT.findall(sql):
+                if resolve(qualifier, column, alias, table):
+                    target = equalities if op.upper() in ("=", "==", "IN", "IS") else ranges
+                    if column not in target:
+                        target.append(column)
+            for op, qualifier, column in _RIGHT.findall(sql):
+                if resolve(qualifier, column, alias, table):
+                    target = equalities if op == "=" else ranges
+                    if column not in target:
+                        target.append(column)
+
+            key = equalities + [c for c in ranges if c not in equalities][:1]
+            if not key:
+                continue
+            key = key[:self.max_columns]
+
+            # Cover the statement when the table's other referenced columns fit
+            referenced = {
+                column for qualifier, column in _QUALIFIED.findall(sql) if qualifier in (alias, table)
+            } | {word for word in _WORD.findall(sql) if owners.get(word) == {table}}
+            selects_all = re.search(rf"(?:SELECT\s+\*|\b{re.escape(alias)}\.\*)", sql, re.IGNORECASE) is not None
+            extra = [c for c in self._columns[table] if c in referenced and c not in key]
+            if not selects_all and "*" not in referenced and len(key) + len(extra) <= self.max_columns:
+                candidates.append((table, key + extra, bool(extra)))
+            candidates.append((table, key, False))
+        return candidates
+
+    def _existing(self) -> Set[Tuple[str, Tuple[str, ...]]]:
+        existing = set()
+        for table in self._columns:
+            for _, index, *_ in self.conn.execute(f"PRAGMA index_list({quote_identifier(table)})"):
+                columns = tuple(row[2] for row in self.conn.execute(f"PRAGMA index_info({quote_identifier(index)})"))
+                existing.add((table, columns))
+        return existing
+
+    # ==========================================
+    # Advice
+    # ==========================================
+
+    def advise(self, workload: List[WorkloadEntry], limit: int = 10) -> List[IndexRecommendation]:
+        """Best indexes for the workload, highest saved cost first."""
+        baseline = {entry.sql: self._cost(entry.sql) for entry in workload}
+        existing = self._existing()
+
+        seen: Set[Tuple[str, Tuple[str, ...]]] = set()
+        candidates: List[IndexRecommendation] = []
+        for entry in workload:
+            if baseline.get(entry.sql) is None:
+                continue
+            for table, columns, covering in self._candidates(entry.sql):
+                key = (table, tuple(columns))
+                if key in seen or any(index[:len(columns)] == key[1] for t, index in existing if t == table):
+                    continue
+                seen.add(key)
+                candidate = IndexRecommendation(table=table, columns=columns, covering=covering,
+                                                statements=0, runs=0, cost_before=0.0, cost_after=0.0)
+                self._try(candidate, workload, baseline)
+                if candidate.benefit >= self.min_benefit:
+                    candidates.append(candidate)
+
+        # Keep the best candidate per key; a wider index with the same leading key serves both
+        candidates.sort(key=lambda c: (-c.benefit, len(c.columns)))
+        chosen: List[IndexRecommendation] = []
+        for candidate in candidates:
+            lead = candidate.columns[0]
+            if any(c.table == candidate.table and c.columns[0] == lead for c in chosen):
+                continue
+            chosen.append(candidate)
+        return chosen[:limit]
+
+    def foreign_key_workload(self) -> List[WorkloadEntry]:
+        """
+        Synthetic workload for a database that has not served queries yet:
+        one lookup join per foreign key (child rows of a given parent).
+        """
+        entries = []
+        for table in self._columns:
+            # row format: (id, seq, table, from, to, on_update, on_delete, match)
+            for row in self.conn.execute(f"PRAGMA foreign_key_list({quote_identifier(table)})"):
+                parent, column, ref_column = row[2], row[3], row[4] or "rowid"
+                sql = f"SELECT c.* FROM {parent} p JOIN {table} c ON c.{column} = p.{ref_column} WHERE p.{ref_column} = 1"
+                entries.append(WorkloadEntry(sql=sql, runs=1, total_seconds=0.0, last_run=0.0))
+        return entries
+
+    def close(self):
+        self._whatif.close()
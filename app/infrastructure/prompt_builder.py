@@ -0,0 +1,110 @@
+# Infrastructure Layer
+import math
+import re
+import threading
+from typing import Any, Dict, List, Tuple
+from app.domain.models import SchemaInfo
+
+# Column names whose sample values must never reach the LLM
+_SENSITIVE_NAME = re.compile(r"(password|passwd|hash|secret|token|api_?key|salt|ssn|cvv|card_?number|iban)", re.IGNORECASE)
+_URL = re.compile(r"^[a-z][a-z0-9+.-]*://", re.IGNORECASE)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text) / 4)
+
+def sanitize_text(text: Any) -> str:
+    """Removes surrogate characters that are not allowed in UTF-8 encoding."""
+    if not isinstance(text, str):
+        text = str(text)
+    return text.encode('utf-8', 'ignore').decode('utf-8')
+
+def is_high_entropy(value: Any) -> bool:
+    """URLs, hashes, UUIDs, tokens: long strings without spaces that tell the LLM nothing."""
+    if not isinstance(value, str):
+        return False
+    if _URL.match(value):
+        return True
+    return len(value) >= 16 and " " not in value and len(set(value)) >= 10
+
+class SchemaPromptBuilder:
+    """
+    Turns SchemaInfo into compact prompt fragments, once per table.
+
+    A fragment lists "name TYPE" columns and a few sample rows as tuples.
+    Sample values are truncated to `max_value_chars`; sensitive columns
+    (password_hash, tokens, ...) and columns whose samples are all
+    high-entropy (URLs, hashes) are left out of the samples. Fragments are
+    cached until the table's columns or sample rows change.
+
+    build() assembles fragments in context order (most relevant first) under
+    `token_budget`; tables that do not fit fall back to a columns-only
+    fragment, then are skipped. The first table is always included.
+    """
+
+    def __init__(self, token_budget: int = 2000, max_value_chars: int = 40, max_samples: int = 3):
+        self.token_budget = token_budget
+        self.max_value_chars = max_value_chars
+        self.max_samples = max_samples
+
+        self._lock = threading.Lock()
+        # table -> (columns, sample_rows list object, full fragment, columns-only fragment)
+        self._fragments: Dict[str, Tuple[List[str], List[Dict[str, Any]], str, str]] = {}
+
+    def _value(self, value: Any) -> str:
+        if isinstance(value, str):
+            if len(value) > self.max_value_chars:
+                value = value[:self.max_value_chars - 3] + "..."
+            return repr(value)
+        return "NULL" if value is None else str(value)
+
+    def _compile(self, info: SchemaInfo) -> Tuple[str, str]:
+        # "price (DECIMAL(10, 2))" -> "price DECIMAL(10, 2)"
+        columns = ", ".join(
+            f"{name} {kind[:-1]}" if kind else name
+            for name, _, kind in (column.partition(" (") for column in info.columns)
+        )
+        header = f"Table {info.table_name}: {columns}"
+
+        rows = info.sample_rows[:self.max_samples]
+        names = [
+            name for name in (rows[0].keys() if rows else [])
+            if not _SENSITIVE_NAME.search(name)
+            and not all(is_high_entropy(row.get(name)) for row in rows)
+        ]
+        if not names:
+            return sanitize_text(header), sanitize_text(header)
+
+        samples = "; ".join(f"({', '.join(self._value(row.get(name)) for name in names)})" for row in rows)
+        full = f"{header}\nSample rows ({', '.join(names)}): {samples}"
+        return sanitize_text(full), sanitize_text(header)
+
+    def fragments(self, info: SchemaInfo) -> Tuple[str, str]:
+        """(full, columns-only) fragment for a table, without the join line."""
+        with self._lock:
+            cached = self._fragments.get(info.table_name)
+        # SchemaInfo copies share the catalog's sample_rows list until the data changes
+        if cached and cached[0] == info.columns and cached[1] is info.sample_rows:
+            return cached[2], cached[3]
+
+        full, compact = self._compile(info)
+        with self._lock:
+            self._fragments[info.table_name] = (info.columns, info.sample_rows, full, compact)
+        return full, compact
+
+    def build(self, context: List[SchemaInfo]) -> Tuple[str, int]:
+        """Returns (schema text, estimated tokens) for the tables that fit the budget."""
+        parts = []
+        used = 0
+        for info in context:
+            full, compact = self.fragments(info)
+            joins = f"\nJoins: {'; '.join(info.joins)}" if info.joins else ""
+            for fragment in (full + joins, compact + joins):
+                tokens = estimate_tokens(fragment)
+                if not parts or used + tokens <= self.token_budget:
+                    parts.append(fragment)
+                    used += tokens
+                    break
+            else:
+                print(f"[Log] Prompt budget: skipped table {info.table_name}")
+        return "\n\n".join(parts), used
@@ -0,0 +1,167 @@
+# Infrastructure Layer
+import math
+import re
+import sqlite3
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+from app.domain.models import QueryPlan
+from app.infrastructure.schema_catalog import quote_identifier
+
+# "SCAN t", "SCAN t USING COVERING INDEX i", "SEARCH t USING INDEX i (a=? AND b>?)"
+_LOOP = re.compile(r"^(SCAN|SEARCH) (CONSTANT ROW|\S+)(?: USING (.*?))?(?: \((.*)\))?$")
+# "FROM orders o", "JOIN order_items AS i"
+_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+("[^"]+"|\w+)(?:\s+AS)?\s+(?!ON\b|USING\b|WHERE\b|JOIN\b|LEFT\b|RIGHT\b|INNER\b|'
+                    r'CROSS\b|FULL\b|NATURAL\b|GROUP\b|ORDER\b|LIMIT\b|HAVING\b|UNION\b|EXCEPT\b|INTERSECT\b|WINDOW\b)(\w+)', re.IGNORECASE)
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """alias -> table for the FROM/JOIN items of a statement."""
+    return {alias: table.strip('"') for table, alias in _ALIAS.findall(sql)}
+
+class TableStats:
+    """
+    Row counts per table and rows-per-key per index, loaded once per database
+    version. Counts come from `sqlite_stat1` (written by ANALYZE); tables it
+    does not cover fall back to MAX(rowid), an O(log n) estimate.
+    """
+
+    def __init__(self, tables: Dict[str, float], indexes: Dict[str, List[float]]):
+        self.tables = tables
+        self.indexes = indexes
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "TableStats":
+        tables: Dict[str, float] = {}
+        indexes: Dict[str, List[float]] = {}
+        has_stat1 = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        if has_stat1:
+            # stat: "<rows> <rows per value of col 1> <rows per value of cols 1-2> ..."
+            for table, index, stat in conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+                numbers = [float(n) for n in (stat or "").split() if n.isdigit()]
+                if not numbers:
+                    continue
+                tables[table] = numbers[0]
+                if index:
+                    indexes[index] = numbers
+
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        for name in names:
+            if name in tables:
+                continue
+            try:
+                tables[name] = float(conn.execute(f"SELECT MAX(rowid) FROM {quote_identifier(name)}").fetchone()[0] or 0)
+            except sqlite3.Error:
+                pass  # WITHOUT ROWID table: unknown size
+        return cls(tables, indexes)
+
+class QueryPlanner:
+    """
+    Estimates the cost of a statement from its EXPLAIN QUERY PLAN.
+
+    Each SCAN/SEARCH step is a loop nested inside the previous ones at the
+    same level, so it costs its rows times the rows of the outer loops:
+    a full scan of order_items inside a scan of orders is rows(orders) *
+    rows(order_items). Searches cost the rows per key (from the index
+    statistics, 1 for primary keys) plus a B-tree descent, and a table lookup
+    per row unless the index is covering; temp B-trees for
+    ORDER BY / GROUP BY / DISTINCT add n log n. Subqueries add their own cost,
+    multiplied by the outer rows when correlated.
+    """
+
+    def __init__(self, default_rows: float = 1000.0):
+        # Row estimate for tables without statistics
+        self.default_rows = default_rows
+        self._lock = threading.Lock()
+        self._stats: Optional[TableStats] = None
+        self._version: Optional[Hashable] = None
+
+    def stats(self, conn: sqlite3.Connection, version: Hashable) -> TableStats:
+        """Table statistics, reloaded when the database version changes."""
+        with self._lock:
+            if self._stats is None or version != self._version:
+                self._stats = TableStats.load(conn)
+                self._version = version
+            return self._stats
+
+    def plan(self, conn: sqlite3.Connection, sql: str, version: Hashable = None) -> QueryPlan:
+        stats = self.stats(conn, version)
+        # row format: (id, parent, notused, detail)
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        children: Dict[int, List[Tuple[int, str]]] = {}
+        for node, parent, _, detail in rows:
+            children.setdefault(parent, []).append((node, detail))
+
+        steps: List[str] = []
+
+        def describe(parent: int, depth: int):
+            for node, detail in children.get(parent, []):
+                steps.append("  " * depth + detail)
+                describe(node, depth + 1)
+
+        describe(0, 0)
+        cost, out_rows = self._cost(children, 0, stats, table_aliases(sql), {})
+        return QueryPlan(steps=steps, cost=round(cost), rows=round(out_rows))
+
+    def _loop(self, match: "re.Match", stats: TableStats, aliases: Dict[str, str],
+              named: Dict[str, float]) -> Tuple[float, float]:
+        """(rows per iteration, cost per iteration) of a SCAN/SEARCH step."""
+        kind, name, using, condition = match.groups()
+        if name == "CONSTANT ROW":
+            return 1.0, 1.0
+        table = aliases.get(name, name)
+        total = named.get(table, stats.tables.get(table, self.default_rows))
+        if kind == "SCAN":
+            return total, max(total, 1.0)
+
+        descent = math.log2(max(total, 2.0))
+        condition = condition or ""
+        equalities = condition.count("=?") - condition.count(">=?") - condition.count("<=?")
+        if "PRIMARY KEY" in (using or "") and equalities:
+            return 1.0, descent
+        index = (using or "").rsplit(" ", 1)[-1]
+        numbers = stats.indexes.get(index)
+        if equalities and numbers and len(numbers) > equalities:
+            per_key = numbers[equalities]
+        elif equalities:
+            per_key = max(min(10.0, total), 1.0)
+        else:
+            # Range condition only: assume a quarter of the table
+            per_key = max(total / 4, 1.0)
+        if "AUTOMATIC" in (using or ""):
+            # The index is built for this statement first
+            descent += total * math.log2(max(total, 2.0)) / max(total, 1.0)
+        elif "COVERING" not in (using or ""):
+            # Each index entry is followed by a rowid lookup in the table
+            descent += per_key * math.log2(max(total, 2.0))
+        return per_key, per_key + descent
+
+    def _cost(self, children: Dict[int, List[Tuple[int, str]]], parent: int, stats: TableStats,
+              aliases: Dict[str, str], named: Dict[str, float]) -> Tuple[float, float]:
+        """(cost, output rows) of the steps under `parent`."""
+        cost = 0.0
+        loop_rows = 1.0
+        compound_rows = 0.0
+        for node, detail in children.get(parent, []):
+            match = _LOOP.match(detail)
+            if match:
+                rows, per_iteration = self._loop(match, stats, aliases, named)
+                cost += loop_rows * per_iteration
+                loop_rows *= rows
+            elif detail.startswith("USE TEMP B-TREE"):
+                cost += loop_rows * math.log2(max(loop_rows, 2.0))
+            elif node in children:
+                sub_cost, sub_rows = self._cost(children, node, stats, aliases, named)
+                if detail.startswith("CORRELATED"):
+                    cost += loop_rows * sub_cost
+                else:
+                    cost += sub_cost
+                if detail.startswith(("MATERIALIZE ", "CO-ROUTINE ")):
+                    named[detail.split(" ", 1)[1]] = sub_rows
+                elif detail.startswith(("LEFT-MOST SUBQUERY", "UNION", "EXCEPT", "INTERSECT")):
+                    compound_rows += sub_rows
+                elif detail == "COMPOUND QUERY":
+                    loop_rows *= sub_rows
+        if compound_rows:
+            loop_rows = compound_rows
+        return cost, loop_rows
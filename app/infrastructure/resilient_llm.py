@@ -0,0 +1,418 @@
+# Infrastructure Layer
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.domain.interfaces import ILLMService
+from app.domain.exceptions import LLMServiceError, CircuitOpenError
+from app.domain.models import SQLGeneration, SchemaInfo, FusedGeneration
+from app.infrastructure.prompt_builder import estimate_tokens
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` per second up to `capacity`.
+    reserve() takes tokens immediately (the balance may go negative) and
+    returns how long the caller has to wait for them, so it works the same
+    for threads (time.sleep) and coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+class ConcurrencyLimit:
+    """
+    At most `limit` holders at a time, shared by threads (`with`) and
+    coroutines (`async with`), so mixing both kinds of caller cannot exceed
+    it. Threads wait on a condition; a coroutine waits on a future that the
+    next release() resolves, without occupying a thread.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._waiters: deque = deque()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_use >= self.limit:
+                self._cond.wait()
+            self._in_use += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._in_use < self.limit:
+                    self._in_use += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # The wake-up may have been meant for us: pass it on
+                self._wake_coroutine()
+                raise
+
+    def release(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+        # Both a thread and a coroutine may wake for one slot; the loser waits again
+        self._wake_coroutine()
+
+    def _wake_coroutine(self):
+        with self._cond:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(_resolve, waiter)
+                    return
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+def _resolve(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive provider failures; while open,
+    calls are rejected without touching the network. After `reset_timeout`
+    one probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            # A probe that never reported back (e.g. cancelled) is replaced after another reset_timeout
+            if self.state != self.CLOSED and now - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._opened_at = now
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_response(self):
+        """
+        The provider answered, but not usefully (e.g. unparsable JSON): a
+        half-open probe has proven it reachable, so the circuit closes. A
+        closed circuit keeps its failure streak.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"WARNING: LLM circuit breaker opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+class ResilientLLMService(ILLMService):
+    """
+    ILLMService decorator that protects the provider and the app from each other:
+
+    - at most `max_concurrency` calls in flight
+    - token buckets for requests per second and prompt tokens per minute
+    - retries of retryable LLMServiceErrors with exponential backoff + full jitter
+    - a deadline of `timeout` seconds per call, retries included
+    - a circuit breaker that fails fast while the provider is down
+
+    When a call finally fails, the error is logged and the usual empty result
+    is returned (SQLGeneration with error_message, [] or None), so callers
+    keep their existing contract.
+    """
+
+    def __init__(self, inner: ILLMService, max_concurrency: int = 8,
+                 requests_per_second: Optional[float] = None, burst: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0,
+                 timeout: float = 30.0, breaker: Optional[CircuitBreaker] = None):
+        self.inner = inner
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        self.max_concurrency = max_concurrency
+        # One limit for blocking and async callers together
+        self._slots = ConcurrencyLimit(max_concurrency)
+        self._requests = TokenBucket(requests_per_second, burst or max(requests_per_second, 1.0)) if requests_per_second else None
+        self._tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+
+    # ==========================================
+    # Policy helpers
+    # ==========================================
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _throttle_delay(self) -> float:
+        """Seconds to wait for a request slot and for the token budget to recover."""
+        delay = self._requests.reserve(1) if self._requests else 0.0
+        if self._tokens:
+            delay = max(delay, self._tokens.reserve(0))
+        if delay:
+            self._count("throttled_seconds", delay)
+        return delay
+
+    def _charge(self, tokens: int):
+        if self._tokens and tokens:
+            self._tokens.reserve(tokens)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _should_retry(self, error: LLMServiceError, attempt: int, deadline: float) -> Optional[float]:
+        """Returns the backoff delay if another attempt fits before the deadline, else None."""
+        if not error.retryable or attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _before_attempt(self, name: str):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"LLM circuit breaker is open, {name} not attempted")
+
+    def _after_failure(self, error: LLMServiceError):
+        # Only provider trouble counts against the breaker. Other errors (e.g. a
+        # bad JSON answer) must not reset a failure streak, but they do prove
+        # the provider reachable, which closes a half-open circuit.
+        if error.retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_response()
+
+    def _as_llm_error(self, e: Exception) -> LLMServiceError:
+        return e if isinstance(e, LLMServiceError) else LLMServiceError(str(e), retryable=False)
+
+    # ==========================================
+    # Call wrappers
+    # ==========================================
+
+    def _call(self, name: str, fn: Callable[[], Any], cost: Callable[[Any], int]) -> Any:
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        self._count("calls")
+        while True:
+            self._before_attempt(name)
+            time.sleep(self._throttle_delay())
+            if time.monotonic() >= deadline:
+                self._count("timeouts")
+                raise LLMServiceError(f"{name} exceeded its {self.timeout}s deadline", retryable=True)
+
+            # A blocking call cannot be interrupted: the deadline is checked between attempts
+            with self._slots:
+                self._count("in_flight")
+                try:
+                    result = fn()
+                except Exception as e:
+                    error = self._as_llm_error(e)
+                else:
+                    self.breaker.record_success()
+                    self._charge(cost(result))
+                    return result
+                finally:
+                    self._count("in_flight", -1)
+
+            self._after_failure(error)
+            delay = self._should_retry(error, attempt, deadline)
+            if delay is None:
+                raise error
+            print(f"[Log] LLM {name} failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+            self._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    async def _call_async(self, name: str, fn: Callable[[], Awaitable[Any]], cost: Callable[[Any], int]) -> Any:
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        self._count("calls")
+        while True:
+            self._before_attempt(name)
+            await asyncio.sleep(self._throttle_delay())
+
+            async with self._slots:
+                self._count("in_flight")
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    result = await asyncio.wait_for(fn(), remaining)
+                except asyncio.TimeoutError:
+                    self._count("timeouts")
+                    error = LLMServiceError(f"{name} exceeded its {self.timeout}s deadline", retryable=True)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = self._as_llm_error(e)
+                else:
+                    self.breaker.record_success()
+                    self._charge(cost(result))
+                    return result
+                finally:
+                    self._count("in_flight", -1)
+
+            self._after_failure(error)
+            delay = self._should_retry(error, attempt, deadline)
+            if delay is None:
+                raise error
+            print(f"[Log] LLM {name} failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+            self._count("retries")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _failed(self, name: str, error: LLMServiceError):
+        self._count("failures")
+        print(f"WARNING: LLM {name} failed: {error}")
+
+    # ==========================================
+    # ILLMService
+    # ==========================================
+
+    def _sql_failure(self, error: LLMServiceError) -> SQLGeneration:
+        return SQLGeneration(sql="", error_message=str(error), is_safe=False)
+
+    def generate_sql(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        try:
+            return self._call("generate_sql", lambda: self.inner.generate_sql(query, context),
+                              lambda r: r.prompt_tokens)
+        except LLMServiceError as e:
+            self._failed("generate_sql", e)
+            return self._sql_failure(e)
+
+    def guess_intent(self, query: str, available_tables: List[str]) -> List[str]:
+        try:
+            return self._call("guess_intent", lambda: self.inner.guess_intent(query, available_tables),
+                              lambda r: estimate_tokens(query + " ".join(available_tables)))
+        except LLMServiceError as e:
+            self._failed("guess_intent", e)
+            return []
+
+    def suggest_chart(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        try:
+            return self._call("suggest_chart", lambda: self.inner.suggest_chart(query, columns),
+                              lambda r: estimate_tokens(query + " ".join(columns)))
+        except LLMServiceError as e:
+            self._failed("suggest_chart", e)
+            return None
+
+    def generate_fused(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        try:
+            return self._call("generate_fused", lambda: self.inner.generate_fused(query, context),
+                              lambda r: r.generation.prompt_tokens)
+        except LLMServiceError as e:
+            self._failed("generate_fused", e)
+            return FusedGeneration(tables=[], generation=self._sql_failure(e))
+
+    async def generate_sql_async(self, query: str, context: List[SchemaInfo]) -> SQLGeneration:
+        try:
+            return await self._call_async("generate_sql", lambda: self.inner.generate_sql_async(query, context),
+                                          lambda r: r.prompt_tokens)
+        except LLMServiceError as e:
+            self._failed("generate_sql", e)
+            return self._sql_failure(e)
+
+    async def guess_intent_async(self, query: str, available_tables: List[str]) -> List[str]:
+        try:
+            return await self._call_async("guess_intent", lambda: self.inner.guess_intent_async(query, available_tables),
+                                          lambda r: estimate_tokens(query + " ".join(available_tables)))
+        except LLMServiceError as e:
+            self._failed("guess_intent", e)
+            return []
+
+    async def suggest_chart_async(self, query: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        try:
+            return await self._call_async("suggest_chart", lambda: self.inner.suggest_chart_async(query, columns),
+                                          lambda r: estimate_tokens(query + " ".join(columns)))
+        except LLMServiceError as e:
+            self._failed("suggest_chart", e)
+            return None
+
+    async def generate_fused_async(self, query: str, context: List[SchemaInfo]) -> FusedGeneration:
+        try:
+            return await self._call_async("generate_fused", lambda: self.inner.generate_fused_async(query, context),
+                                          lambda r: r.generation.prompt_tokens)
+        except LLMServiceError as e:
+            self._failed("generate_fused", e)
+            return FusedGeneration(tables=[], generation=self._sql_failure(e))
+
+    def record_success(self, query: str, context: List[SchemaInfo], generation: SQLGeneration):
+        self.inner.record_success(query, context, generation)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "circuit": self.breaker.state
+            }
@@ -0,0 +1,96 @@
+# Infrastructure Layer
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered then
+    brotli = None
+
+# Column type tags of the columnar format
+_TYPE_TAGS = {int: "int", float: "float", str: "str", bool: "bool"}
+# Distinct values are counted on this many rows first, so mostly-unique columns are rejected cheaply
+_DICTIONARY_SAMPLE = 1024
+
+def encode_columnar(columns: List[str], rows: Sequence[Sequence[Any]],
+                    dictionary_ratio: float = 0.5, dictionary_min_rows: int = 16) -> Dict[str, Any]:
+    """
+    Column-major encoding of a result:
+
+        {"format": "columnar", "row_count": N, "columns": [
+            {"name": "total", "type": "float", "data": [...]},
+            {"name": "status", "type": "dict", "values": ["paid", ...], "codes": [0, 0, 1, ...]},
+            ...]}
+
+    `type` is int, float, str, bool or mixed (SQLite allows several types in
+    one column); nulls stay null in `data` and get their own entry in
+    `values`. String columns with few distinct values (at most
+    `dictionary_ratio` of the rows) are dictionary-encoded.
+    """
+    encoded = []
+    # Transposed with zip() (C speed); the column tuples are serialized as-is
+    data_columns = list(zip(*rows)) if rows else [() for _ in columns]
+    for name, data in zip(columns, data_columns):
+        types = set(map(type, data))
+        types.discard(type(None))
+        tag = _TYPE_TAGS.get(types.pop(), "mixed") if len(types) == 1 else ("mixed" if types else "null")
+
+        if tag == "str" and len(data) >= dictionary_min_rows:
+            sample = data[:_DICTIONARY_SAMPLE]
+            if len(set(sample)) <= len(sample) * dictionary_ratio:
+                index = {value: code for code, value in enumerate(dict.fromkeys(data))}
+                if len(index) <= len(data) * dictionary_ratio:
+                    encoded.append({"name": name, "type": "dict", "values": list(index),
+                                    "codes": list(map(index.__getitem__, data))})
+                    continue
+        encoded.append({"name": name, "type": tag, "data": data})
+    return {"format": "columnar", "row_count": len(rows), "columns": encoded}
+
+def decode_columnar(payload: Dict[str, Any]) -> Tuple[List[str], List[tuple]]:
+    """Inverse of encode_columnar: (column names, row tuples)."""
+    columns = [column["name"] for column in payload["columns"]]
+    data = []
+    for column in payload["columns"]:
+        if column["type"] == "dict":
+            data.append([column["values"][code] for code in column["codes"]])
+        else:
+            data.append(column["data"])
+    rows = list(zip(*data)) if data else [()] * payload["row_count"]
+    return columns, rows
+
+def json_bytes(payload: Any) -> bytes:
+    """Compact JSON, with orjson when it is installed. Unknown types are converted with str()."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=str)
+    return json.dumps(payload, default=str, separators=(",", ":")).encode()
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported content coding from an Accept-Encoding header: "br", "gzip" or None."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def compress(body: bytes, coding: Optional[str], gzip_level: int = 1, brotli_quality: int = 4) -> bytes:
+    """Compresses `body` with the negotiated coding (None: unchanged)."""
+    if coding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=gzip_level)
+    return body
@@ -0,0 +1,117 @@
+# Infrastructure Layer
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from app.domain.models import ExecutionResult
+
+# String literals / quoted identifiers are kept verbatim, comments are
+# dropped and everything else has its whitespace collapsed. Case is preserved
+# because SQLite echoes column names exactly as written in the SELECT list.
+_SQL_CHUNKS = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])|(?:\s+|--[^\n]*|/\*.*?(?:\*/|\Z))+""",
+    re.DOTALL
+)
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Single-line form of a statement, without comments or trailing semicolons.
+    Safe to embed in a larger statement (e.g. as a subquery).
+    """
+    def _sub(match):
+        return match.group(1) if match.group(1) is not None else " "
+    return _SQL_CHUNKS.sub(_sub, sql).strip().rstrip(";").strip()
+
+def estimate_size(result: ExecutionResult) -> int:
+    """Rough in-memory footprint of a result (bytes)."""
+    size = sys.getsizeof(result.rows) + sum(sys.getsizeof(c) for c in result.columns)
+    for row in result.rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+class ResultCache:
+    """
+    Memory-bounded LRU cache of executed SELECT results.
+
+    Entries are keyed on canonicalized SQL and tagged with the database version
+    that was current *before* the query ran. A lookup only hits when the version
+    is unchanged, so a commit anywhere in the database makes every older entry
+    unreachable (it is dropped on access or evicted by LRU).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Hashable, ExecutionResult, int]]" = OrderedDict()
+        self._bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, sql: str, version: Hashable) -> Optional[ExecutionResult]:
+        key = canonicalize_sql(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry_version, result, size = entry
+            if entry_version != version:
+                del self._entries[key]
+                self._bytes -= size
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return ExecutionResult(columns=result.columns, rows=result.rows, success=True,
+                               cached=True, truncated=result.truncated)
+
+    def put(self, sql: str, version: Hashable, result: ExecutionResult):
+        if not result.success:
+            return
+        size = estimate_size(result)
+        if size > self.max_entry_bytes:
+            return
+
+        key = canonicalize_sql(sql)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._entries[key] = (version, result, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,160 @@
+# Infrastructure Layer
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Tuple
+from app.domain.models import SchemaInfo, ForeignKey
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+class SchemaCatalog:
+    """
+    In-process cache of table metadata (columns, types, foreign keys, sample rows).
+
+    The catalog owns one dedicated read-only connection and uses it to watch:
+    - `PRAGMA schema_version`: bumped on any DDL -> reload everything.
+    - `PRAGMA data_version`: changes when another connection commits -> reload samples.
+
+    `data_version` is only meaningful when read from the same connection, which is
+    why the probe connection is not taken from the pool. Versions are re-checked at
+    most once per `max_staleness` seconds, so lookups are pure memory reads.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], sample_size: int = 3,
+                 max_staleness: float = 1.0):
+        self._connect = connect
+        self.sample_size = sample_size
+        self.max_staleness = max_staleness
+
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tables: Dict[str, SchemaInfo] = {}
+        self._schema_version: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self._checked_at = 0.0
+        # While > 0 (see pinned()), lookups skip the version checks entirely
+        self._pins = 0
+
+        # Metrics
+        self.schema_loads = 0
+        self.sample_loads = 0
+
+    # ==========================================
+    # Loading
+    # ==========================================
+
+    def _probe(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def versions(self) -> Tuple[int, int]:
+        """Returns (schema_version, data_version) as seen by the probe connection."""
+        with self._lock:
+            conn = self._probe()
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            return schema_version, data_version
+
+    def _load_samples(self, conn: sqlite3.Connection, table: str) -> List[dict]:
+        cursor = conn.execute(f"SELECT * FROM {quote_identifier(table)} LIMIT {int(self.sample_size)}")
+        headers = [d[0] for d in cursor.description]
+        return [dict(zip(headers, row)) for row in cursor.fetchall()]
+
+    def _load_all(self, conn: sqlite3.Connection) -> Dict[str, SchemaInfo]:
+        names = [
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+            )
+        ]
+
+        tables = {}
+        for name in names:
+            # row format: (cid, name, type, notnull, dflt_value, pk)
+            columns = [f"{row[1]} ({row[2]})" for row in conn.execute(f"PRAGMA table_info({quote_identifier(name)})")]
+            # row format: (id, seq, table, from, to, on_update, on_delete, match)
+            foreign_keys = [
+                ForeignKey(column=row[3], ref_table=row[2], ref_column=row[4])
+                for row in conn.execute(f"PRAGMA foreign_key_list({quote_identifier(name)})")
+            ]
+            tables[name] = SchemaInfo(
+                table_name=name,
+                columns=columns,
+                sample_rows=self._load_samples(conn, name),
+                foreign_keys=foreign_keys
+            )
+        return tables
+
+    def refresh(self, force: bool = False):
+        """Reloads whatever changed since the last check."""
+        with self._lock:
+            if not force and self.is_fresh():
+                return
+            self._checked_at = time.monotonic()
+
+            try:
+                schema_version, data_version = self.versions()
+                conn = self._probe()
+                if force or schema_version != self._schema_version:
+                    self._tables = self._load_all(conn)
+                    self.schema_loads += 1
+                elif data_version != self._data_version:
+                    # Swap in new objects so callers holding the old ones see a stable snapshot
+                    self._tables = {
+                        name: replace(info, sample_rows=self._load_samples(conn, name))
+                        for name, info in self._tables.items()
+                    }
+                    self.sample_loads += 1
+                self._schema_version, self._data_version = schema_version, data_version
+            except sqlite3.Error as e:
+                # Keep serving the last good snapshot; retry on next check
+                print(f"WARNING: Schema catalog refresh failed: {e}")
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+    # ==========================================
+    # Lookups
+    # ==========================================
+
+    def is_fresh(self) -> bool:
+        """True when a lookup will be served from memory without a version check."""
+        if self._schema_version is None:
+            return False
+        return self._pins > 0 or time.monotonic() - self._checked_at < self.max_staleness
+
+    @contextmanager
+    def pinned(self):
+        """Refreshes once, then serves that snapshot without version checks until exit."""
+        self.refresh()
+        with self._lock:
+            self._pins += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins -= 1
+
+    @property
+    def schema_version(self) -> int:
+        self.refresh()
+        return self._schema_version or 0
+
+    def table_names(self) -> List[str]:
+        self.refresh()
+        return list(self._tables.keys())
+
+    def get(self, table_names: List[str]) -> List[SchemaInfo]:
+        """Returns cached SchemaInfo for known tables. Treat the objects as read-only."""
+        self.refresh()
+        tables = self._tables
+        return [tables[name] for name in table_names if name in tables]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
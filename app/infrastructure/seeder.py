@@ -14,8 +14,8 @@ class DataSeeder:
         self.fake = Faker()
     
     def _execute(self, sql: str):
-        """Helper to execute SQL silently"""
-        self.db_repo.execute_query(sql)
+        """Helper to execute SQL silently (on the writer connection)"""
+        self.db_repo.execute_write(sql)
 
     def _get_ids(self, table_name: str, id_col: str) -> list:
         """Helper to fetch all IDs from a table"""
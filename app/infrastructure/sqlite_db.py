@@ -1,62 +1,358 @@
+import asyncio
+import os
 import sqlite3
-from typing import List, Any
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Optional, Iterator, AsyncIterator
 from app.domain.interfaces import IDatabase
-from app.domain.models import ExecutionResult, SchemaInfo
+from app.domain.exceptions import DatabaseBusyError
+from app.domain.models import ExecutionResult, SchemaInfo, QueryPlan
+from app.infrastructure.sqlite_pool import SqliteConnectionPool, SqliteWriter, PoolStats
+from app.infrastructure.schema_catalog import SchemaCatalog
+from app.infrastructure.result_cache import ResultCache, canonicalize_sql
+from app.infrastructure.query_planner import QueryPlanner
+from app.infrastructure.workload_log import WorkloadLog
+
+def _close_generator(gen):
+    try:
+        gen.close()
+    except ValueError:
+        # Still running in another worker (consumer was cancelled mid-fetch);
+        # it is closed by garbage collection once that fetch returns.
+        pass
+
+class QueryBudget:
+    """
+    Time and cancellation budget for one statement, enforced by the SQLite
+    progress handler (called every N virtual machine instructions). Returning
+    non-zero from the handler aborts the statement with "interrupted".
+    """
+
+    def __init__(self, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        self.timeout = timeout
+        self.cancel_event = cancel_event
+        self.deadline: Optional[float] = None
+        self.timed_out = False
+
+    def restart(self):
+        self.deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def __call__(self) -> int:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.timed_out = True
+            return 1
+        return 0
+
+    def error_result(self, error: Exception) -> ExecutionResult:
+        if self.timed_out:
+            return ExecutionResult(columns=[], rows=[], success=False, timed_out=True,
+                                   error=f"Query timed out after {self.timeout:g}s (execution budget exceeded)")
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return ExecutionResult(columns=[], rows=[], success=False, error="Query cancelled")
+        return ExecutionResult(columns=[], rows=[], success=False, error=str(error))
+
+def _cache_key(sql: str, max_rows: Optional[int], offset: int) -> str:
+    # The row window is part of the key: each page is cached separately
+    return f"{canonicalize_sql(sql)} /* rows={max_rows} offset={offset} */"
 
 class SqliteRepository(IDatabase):
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, max_workers: int = 4, pool_size: Optional[int] = None,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size_kib: int = 16 * 1024,
+                 catalog_staleness: float = 1.0, result_cache: Optional[ResultCache] = None,
+                 query_timeout: Optional[float] = None, progress_steps: int = 4000,
+                 planner: Optional[QueryPlanner] = None, max_plan_cost: Optional[float] = None,
+                 plan_action: str = "reject", capped_timeout: float = 2.0,
+                 workload: Optional[WorkloadLog] = None, acquire_timeout: Optional[float] = 10.0,
+                 max_streams: int = 8):
         self.db_path = db_path
+        # Per-statement wall-clock budget (seconds) for read queries
+        self.query_timeout = query_timeout
+        self.progress_steps = progress_steps
+        # Cost gate: statements whose estimated plan cost exceeds max_plan_cost
+        # are rejected, or run with the tighter capped_timeout ("cap")
+        self.planner = planner
+        self.max_plan_cost = max_plan_cost
+        self.plan_action = plan_action
+        self.capped_timeout = capped_timeout
+        # Executed statements are counted here for the index advisor
+        self.workload = workload
+        # Bounded pool for the async API. sqlite3 releases the GIL while
+        # stepping, so a few threads let queries overlap with the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite")
+
+        # Writes (seeding) go through one dedicated connection; reads are
+        # served from a read-only pool sized to the worker count by default.
+        self.writer = SqliteWriter(db_path)
+        if os.path.exists(db_path):
+            self.writer.enable_wal()
+        self.pool = SqliteConnectionPool(
+            db_path,
+            size=pool_size or max_workers,
+            mmap_size=mmap_size,
+            cache_size_kib=cache_size_kib,
+            acquire_timeout=acquire_timeout,
+            max_streams=max_streams
+        )
+        self.catalog = SchemaCatalog(self.pool.open_connection, max_staleness=catalog_staleness)
+        self.result_cache = result_cache
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        return self.pool.connection()
+
+    def _stream_connection(self):
+        # Suspended streams holding pooled connections would starve the pool
+        # and park the executor threads they need to resume
+        return self.pool.stream_connection()
 
-    def execute_query(self, sql: str) -> ExecutionResult:
+    @contextmanager
+    def _budgeted(self, conn: sqlite3.Connection, budget: QueryBudget):
+        """Installs the budget as progress handler for the duration of the block."""
+        budget.restart()
+        conn.set_progress_handler(budget, self.progress_steps)
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(sql)
-                
-                # Fetch headers if available
-                columns = []
-                if cursor.description:
-                    columns = [description[0] for description in cursor.description]
-                
-                rows = cursor.fetchall()
-                return ExecutionResult(columns=columns, rows=rows, success=True)
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def _plan(self, conn: sqlite3.Connection, sql: str, budget: QueryBudget) -> Optional[QueryPlan]:
+        """
+        Estimates the statement's cost and applies the gate: returns the plan
+        with action "rejected" when it must not run, or tightens the budget
+        ("capped"). Planning problems never block the query.
+        """
+        if self.planner is None:
+            return None
+        try:
+            plan = self.planner.plan(conn, sql, self.catalog.versions())
+        except sqlite3.Error as e:
+            print(f"WARNING: Query planning failed: {e}")
+            return None
+
+        if self.max_plan_cost and plan.cost > self.max_plan_cost:
+            if self.plan_action == "cap":
+                plan.action = "capped"
+                budget.timeout = min(budget.timeout or self.capped_timeout, self.capped_timeout)
+            else:
+                plan.action = "rejected"
+            print(f"[Log] Query plan cost {plan.cost:,.0f} over limit {self.max_plan_cost:,.0f}: {plan.action}")
+        return plan
+
+    def _rejected(self, plan: QueryPlan) -> ExecutionResult:
+        return ExecutionResult(
+            columns=[], rows=[], success=False, plan=plan,
+            error=(f"Query rejected: estimated cost {plan.cost:,.0f} exceeds the limit of {self.max_plan_cost:,.0f} "
+                   f"(plan: {'; '.join(step.strip() for step in plan.steps)})")
+        )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def close(self):
+        """Stops the worker threads and closes all connections."""
+        self._executor.shutdown(wait=False)
+        self.catalog.close()
+        self.pool.close()
+        self.writer.close()
+
+    def pool_stats(self) -> PoolStats:
+        return self.pool.stats()
+
+    def execute_write(self, sql: str, params: tuple = ()) -> ExecutionResult:
+        """Runs a modifying statement on the writer connection and commits it."""
+        try:
+            with self.writer.connection() as conn:
+                with conn:
+                    conn.execute(sql, params)
+                return ExecutionResult(columns=[], rows=[], success=True)
         except Exception as e:
             return ExecutionResult(columns=[], rows=[], success=False, error=str(e))
 
+    def execute_query(self, sql: str, max_rows: Optional[int] = None, offset: int = 0) -> ExecutionResult:
+        return self._query(sql, max_rows, offset, None)
+
+    def _query(self, sql: str, max_rows: Optional[int], offset: int,
+               cancel_event: Optional[threading.Event]) -> ExecutionResult:
+        if self.result_cache is None:
+            return self._execute_logged(sql, max_rows, offset, cancel_event)
+
+        # Read the version *before* running, so a concurrent commit can only
+        # make the stored entry look older (a miss), never newer (stale hit).
+        try:
+            version = self.catalog.versions()
+        except Exception as e:
+            print(f"WARNING: Could not read database version, bypassing result cache: {e}")
+            return self._execute_logged(sql, max_rows, offset, cancel_event)
+
+        cache_key = _cache_key(sql, max_rows, offset)
+        cached = self.result_cache.get(cache_key, version)
+        if cached:
+            return cached
+
+        result = self._execute_logged(sql, max_rows, offset, cancel_event)
+        self.result_cache.put(cache_key, version, result)
+        return result
+
+    def _log_workload(self, sql: str, result: ExecutionResult, started: float):
+        # Statements that ran (or were too expensive to run), not SQL errors
+        rejected = result.plan is not None and result.plan.action == "rejected"
+        if self.workload is not None and (result.success or result.timed_out or rejected):
+            self.workload.record(sql, time.perf_counter() - started)
+
+    def _execute_logged(self, sql: str, max_rows: Optional[int], offset: int,
+                        cancel_event: Optional[threading.Event]) -> ExecutionResult:
+        started = time.perf_counter()
+        result = self._execute(sql, max_rows, offset, cancel_event)
+        # Later pages of a statement are not separate workload
+        if not offset:
+            self._log_workload(sql, result, started)
+        return result
+
+    def _execute(self, sql: str, max_rows: Optional[int] = None, offset: int = 0,
+                 cancel_event: Optional[threading.Event] = None) -> ExecutionResult:
+        budget = QueryBudget(self.query_timeout, cancel_event)
+        if offset:
+            # Let SQLite skip the rows instead of stepping them through Python
+            limit = -1 if max_rows is None else max_rows + 1
+            sql = f"SELECT * FROM ({canonicalize_sql(sql)}) LIMIT {int(limit)} OFFSET {int(offset)}"
+
+        plan = None
+        try:
+            with self._get_connection() as conn:
+                plan = self._plan(conn, sql, budget)
+                if plan and plan.action == "rejected":
+                    return self._rejected(plan)
+
+                with self._budgeted(conn, budget):
+                    cursor = conn.cursor()
+                    cursor.execute(sql)
+
+                    # Fetch headers if available
+                    columns = []
+                    if cursor.description:
+                        columns = [description[0] for description in cursor.description]
+
+                    if max_rows is None:
+                        return ExecutionResult(columns=columns, rows=cursor.fetchall(), success=True, plan=plan)
+
+                    # Fetch one extra row to know whether the cap cut anything off;
+                    # the statement stops stepping there, the rest is never read.
+                    rows = cursor.fetchmany(max_rows + 1)
+                    truncated = len(rows) > max_rows
+                    return ExecutionResult(columns=columns, rows=rows[:max_rows], success=True,
+                                           truncated=truncated, plan=plan)
+        except DatabaseBusyError:
+            # Overload, not a property of the statement: surfaced as 503, never cached
+            raise
+        except Exception as e:
+            return replace(budget.error_result(e), plan=plan)
+
+    def iter_query(self, sql: str, chunk_size: int = 500,
+                   cancel_event: Optional[threading.Event] = None) -> Iterator[ExecutionResult]:
+        """
+        Generator version of execute_query: rows are pulled with fetchmany, so
+        memory stays flat no matter how large the result is. The stream runs on
+        a dedicated connection (not a pooled one), held until the generator is
+        exhausted or closed. DatabaseBusyError is raised when too many streams
+        are open.
+
+        The time budget applies per chunk, so a slow consumer does not count
+        against it, but a statement that stalls producing rows is interrupted.
+        Streams always run the statement: the result cache only holds capped
+        results (execute_query), never the full row set a stream returns.
+        """
+        budget = QueryBudget(self.query_timeout, cancel_event)
+        plan = None
+        started = time.perf_counter()
+        try:
+            with self._stream_connection() as conn:
+                plan = self._plan(conn, sql, budget)
+                if plan and plan.action == "rejected":
+                    rejected = self._rejected(plan)
+                    self._log_workload(sql, rejected, started)
+                    yield rejected
+                    return
+
+                with self._budgeted(conn, budget):
+                    cursor = conn.cursor()
+                    cursor.execute(sql)
+                    columns = [d[0] for d in cursor.description] if cursor.description else []
+
+                    rows = cursor.fetchmany(chunk_size)
+                    # Always yield at least one chunk so callers learn the columns (and the plan)
+                    yield ExecutionResult(columns=columns, rows=rows, success=True, plan=plan)
+                    while len(rows) == chunk_size:
+                        budget.restart()
+                        rows = cursor.fetchmany(chunk_size)
+                        if rows:
+                            yield ExecutionResult(columns=columns, rows=rows, success=True)
+            self._log_workload(sql, ExecutionResult(columns=[], rows=[], success=True), started)
+        except DatabaseBusyError:
+            raise
+        except Exception as e:
+            failed = replace(budget.error_result(e), plan=plan)
+            self._log_workload(sql, failed, started)
+            yield failed
+
     def get_all_table_names(self) -> List[str]:
-        query = "SELECT name FROM sqlite_master WHERE type='table';"
-        result = self.execute_query(query)
-        if result.success:
-            return [row[0] for row in result.rows if row[0] != "sqlite_sequence"]
-        return []
+        return self.catalog.table_names()
 
     def get_schema_info(self, table_names: List[str]) -> List[SchemaInfo]:
-        schema_infos = []
-        for table in table_names:
-            # Get Columns
-            pragma_query = f"PRAGMA table_info({table});"
-            result = self.execute_query(pragma_query)
-            if not result.success:
-                continue
-            
-            # row format: (cid, name, type, notnull, dflt_value, pk)
-            columns = [f"{row[1]} ({row[2]})" for row in result.rows]
-
-            # Get Sample Rows (Limit 3)
-            sample_query = f"SELECT * FROM {table} LIMIT 3;"
-            sample_result = self.execute_query(sample_query)
-            sample_rows = []
-            if sample_result.success:
-                headers = sample_result.columns
-                for row in sample_result.rows:
-                    sample_rows.append(dict(zip(headers, row)))
-
-            schema_infos.append(SchemaInfo(
-                table_name=table,
-                columns=columns,
-                sample_rows=sample_rows
-            ))
-        return schema_infos
+        # Served from the in-process catalog; no round trips unless the
+        # schema_version / data_version changed since the last check.
+        return self.catalog.get(table_names)
+
+    def get_schema_version(self) -> int:
+        return self.catalog.schema_version
+
+    def schema_snapshot(self):
+        return self.catalog.pinned()
+
+    # ==========================================
+    # Async API (bounded thread pool)
+    # ==========================================
+
+    async def execute_query_async(self, sql: str, max_rows: Optional[int] = None, offset: int = 0) -> ExecutionResult:
+        # If the awaiting task is cancelled (e.g. the client went away), the
+        # event makes the progress handler abort the statement in its thread.
+        cancel_event = threading.Event()
+        try:
+            return await self._run(self._query, sql, max_rows, offset, cancel_event)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+
+    async def iter_query_async(self, sql: str, chunk_size: int = 500) -> AsyncIterator[ExecutionResult]:
+        cancel_event = threading.Event()
+        chunks = self.iter_query(sql, chunk_size, cancel_event)
+        try:
+            while True:
+                chunk = await self._run(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Interrupt a fetch that may still be running, then release the connection
+            cancel_event.set()
+            await self._run(_close_generator, chunks)
+
+    async def get_schema_info_async(self, table_names: List[str]) -> List[SchemaInfo]:
+        # Skip the thread hop when the catalog can answer from memory
+        if self.catalog.is_fresh():
+            return self.catalog.get(table_names)
+        return await self._run(self.get_schema_info, table_names)
+
+    async def get_all_table_names_async(self) -> List[str]:
+        if self.catalog.is_fresh():
+            return self.catalog.table_names()
+        return await self._run(self.get_all_table_names)
+
+    async def get_schema_version_async(self) -> int:
+        if self.catalog.is_fresh():
+            return self.catalog.schema_version
+        return await self._run(self.get_schema_version)
@@ -0,0 +1,226 @@
+# Infrastructure Layer
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import quote
+from app.domain.exceptions import DatabaseBusyError
+
+@dataclass
+class PoolStats:
+    """Counters used to size the pool for the expected concurrency."""
+    size: int
+    open_connections: int
+    in_use: int
+    checkouts: int
+    waits: int
+    wait_seconds: float
+    timeouts: int = 0
+    # Dedicated stream connections (outside the pool), open now / refused when full
+    streams: int = 0
+    stream_rejections: int = 0
+
+class SqliteConnectionPool:
+    """
+    Bounded pool of read-only SQLite connections.
+
+    - Connections are opened with a `mode=ro` URI and `query_only`, so the
+      serving path can never write.
+    - Each thread gets its previous connection back when it is idle, which keeps
+      the page cache / mmap of that connection warm.
+    - At most `size` connections are open; extra callers wait for a free one,
+      for at most `acquire_timeout` seconds (then DatabaseBusyError).
+    - Result streams get dedicated connections (stream_connection()), at most
+      `max_streams` at a time; beyond that DatabaseBusyError is raised at once.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, mmap_size: int = 256 * 1024 * 1024,
+                 cache_size_kib: int = 16 * 1024, busy_timeout: float = 5.0,
+                 acquire_timeout: Optional[float] = 10.0, max_streams: int = 8):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout = busy_timeout
+        self.acquire_timeout = acquire_timeout
+        self.max_streams = max(1, max_streams)
+
+        self._cond = threading.Condition()
+        self._idle: List[sqlite3.Connection] = []
+        self._all: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._timeouts = 0
+        self._streams = 0
+        self._stream_rejections = 0
+
+    def open_connection(self) -> sqlite3.Connection:
+        """Opens a tuned read-only connection that is not managed by the pool."""
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        # Negative cache_size is in KiB rather than pages
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            self._checkouts += 1
+
+            # 1. Same thread, same connection (warm cache)
+            own = getattr(self._local, "conn", None)
+            if own is not None and own in self._idle:
+                self._idle.remove(own)
+                return own
+
+            # 2. Any idle connection
+            if self._idle:
+                conn = self._idle.pop()
+            # 3. Room to open a new one
+            elif len(self._all) < self.size:
+                conn = self.open_connection()
+                self._all.append(conn)
+            # 4. Wait for a connection to be returned
+            else:
+                self._waits += 1
+                started = time.perf_counter()
+                deadline = started + self.acquire_timeout if self.acquire_timeout is not None else None
+                while not self._idle:
+                    remaining = deadline - time.perf_counter() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        self._wait_seconds += time.perf_counter() - started
+                        self._timeouts += 1
+                        raise DatabaseBusyError(
+                            f"No database connection became free within {self.acquire_timeout:g}s"
+                        )
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("Connection pool is closed")
+                self._wait_seconds += time.perf_counter() - started
+                conn = self._idle.pop()
+
+            self._local.conn = conn
+            return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._cond:
+            if self._closed:
+                conn.close()
+                return
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Checks out a read-only connection for the duration of the block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def stream_connection(self):
+        """
+        A connection of its own for one result stream, closed after the block.
+        A stream is suspended between chunks, so it must not hold a pooled
+        connection; the stream count is capped instead, without waiting.
+        """
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            if self._streams >= self.max_streams:
+                self._stream_rejections += 1
+                raise DatabaseBusyError(f"Too many open result streams (max {self.max_streams})")
+            self._streams += 1
+        try:
+            conn = self.open_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+        finally:
+            with self._cond:
+                self._streams -= 1
+
+    def stream_capacity(self) -> int:
+        """Streams that can still be opened right now."""
+        with self._cond:
+            return self.max_streams - self._streams
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            return PoolStats(
+                size=self.size,
+                open_connections=len(self._all),
+                in_use=len(self._all) - len(self._idle),
+                checkouts=self._checkouts,
+                waits=self._waits,
+                wait_seconds=round(self._wait_seconds, 6),
+                timeouts=self._timeouts,
+                streams=self._streams,
+                stream_rejections=self._stream_rejections
+            )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+            self._all.clear()
+            self._cond.notify_all()
+
+class SqliteWriter:
+    """
+    Single shared read-write connection, kept separate from the serving pool.
+    Used by seeding and maintenance tasks. Access is serialized by a lock
+    because SQLite only allows one writer at a time anyway.
+    """
+
+    def __init__(self, db_path: str, busy_timeout: float = 30.0):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _get(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        return self._conn
+
+    @contextmanager
+    def connection(self):
+        """Holds the writer lock for the duration of the block."""
+        with self._lock:
+            yield self._get()
+
+    def enable_wal(self) -> bool:
+        """Switches the database to WAL so readers never block on the writer."""
+        try:
+            with self.connection() as conn:
+                mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+                return str(mode).lower() == "wal"
+        except sqlite3.Error as e:
+            print(f"WARNING: Could not enable WAL on {self.db_path}: {e}")
+            return False
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
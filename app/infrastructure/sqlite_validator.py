@@ -0,0 +1,145 @@
+# Infrastructure Layer
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from app.domain.interfaces import IValidator, IDatabase
+from app.domain.models import ValidationResult
+from app.infrastructure.result_cache import canonicalize_sql
+
+# Scalar, aggregate, window and date functions a reporting query may call.
+# Anything else (load_extension, randomblob, zeroblob, sqlite_*, ...) is refused.
+ALLOWED_FUNCTIONS: FrozenSet[str] = frozenset({
+    "abs", "avg", "char", "coalesce", "count", "cume_dist", "date", "datetime", "dense_rank",
+    "first_value", "format", "glob", "group_concat", "ifnull", "iif", "instr", "julianday",
+    "lag", "last_value", "lead", "length", "like", "lower", "ltrim", "max", "min", "nth_value",
+    "ntile", "nullif", "percent_rank", "printf", "random", "rank", "replace", "round",
+    "row_number", "rtrim", "sign", "strftime", "string_agg", "substr", "substring", "sum",
+    "time", "total", "trim", "typeof", "unicode", "unixepoch", "upper",
+    "json_extract", "json_array_length", "json_type", "json_valid"
+})
+
+# Authorizer action codes -> readable names for error messages
+_ACTION_NAMES = {
+    getattr(sqlite3, f"SQLITE_{name}"): name
+    for name in (
+        "CREATE_INDEX", "CREATE_TABLE", "CREATE_TEMP_INDEX", "CREATE_TEMP_TABLE", "CREATE_TEMP_TRIGGER",
+        "CREATE_TEMP_VIEW", "CREATE_TRIGGER", "CREATE_VIEW", "DELETE", "DROP_INDEX", "DROP_TABLE",
+        "DROP_TEMP_INDEX", "DROP_TEMP_TABLE", "DROP_TEMP_TRIGGER", "DROP_TEMP_VIEW", "DROP_TRIGGER",
+        "DROP_VIEW", "INSERT", "PRAGMA", "READ", "SELECT", "TRANSACTION", "UPDATE", "ATTACH", "DETACH",
+        "ALTER_TABLE", "REINDEX", "ANALYZE", "CREATE_VTABLE", "DROP_VTABLE", "FUNCTION", "SAVEPOINT",
+        "RECURSIVE"
+    )
+    if hasattr(sqlite3, f"SQLITE_{name}")
+}
+
+# Primary result codes that describe the statement itself: SQLITE_ERROR (syntax,
+# unknown table/column) and SQLITE_AUTH (denied by the authorizer). Anything
+# else (busy, locked, schema changed, I/O) says nothing about the SQL.
+_STATEMENT_ERROR_CODES = frozenset({1, 23})
+
+def _is_statement_error(error: sqlite3.DatabaseError) -> bool:
+    code = getattr(error, "sqlite_errorcode", None)
+    # Extended result codes keep the primary code in their low byte
+    return code is None or (code & 0xFF) in _STATEMENT_ERROR_CODES
+
+class SqliteAuthorizerValidator(IValidator):
+    """
+    Validates SQL by letting SQLite itself compile it.
+
+    The statement is prepared (as EXPLAIN, so nothing is executed) on a
+    dedicated read-only connection with an authorizer that only allows
+    SELECT, reads of the database's own tables and whitelisted functions.
+    Anything else (writes, PRAGMA, ATTACH, sqlite_master, unknown functions)
+    is denied, and so are syntax errors, unknown columns and multiple
+    statements. Results are cached per canonical SQL and schema version.
+    Transient failures to prepare (database locked, I/O errors) are raised
+    and not cached, as they say nothing about the statement.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], db: IDatabase,
+                 allowed_functions: Iterable[str] = ALLOWED_FUNCTIONS, max_entries: int = 4096):
+        self._connect = connect
+        self.db = db
+        self.allowed_functions = frozenset(f.lower() for f in allowed_functions)
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tables: FrozenSet[str] = frozenset()
+        self._tables_version: Optional[int] = None
+        self._denied: List[str] = []
+        self._cache: "OrderedDict[Tuple[str, int], ValidationResult]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def _authorize(self, action: int, arg1: Optional[str], arg2: Optional[str], db_name: Optional[str],
+                   source: Optional[str]) -> int:
+        if action == sqlite3.SQLITE_SELECT or action == sqlite3.SQLITE_RECURSIVE:
+            return sqlite3.SQLITE_OK
+        # count(*) reads the table without naming a column or database
+        if action == sqlite3.SQLITE_READ and arg1 in self._tables and db_name in ("main", None):
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_FUNCTION and (arg2 or "").lower() in self.allowed_functions:
+            return sqlite3.SQLITE_OK
+
+        name = _ACTION_NAMES.get(action, str(action))
+        target = arg2 if action == sqlite3.SQLITE_FUNCTION else arg1
+        self._denied.append(f"{name} {target}" if target else name)
+        return sqlite3.SQLITE_DENY
+
+    def _prepare(self, sql: str) -> ValidationResult:
+        if self._conn is None:
+            self._conn = self._connect()
+            self._conn.set_authorizer(self._authorize)
+
+        self._denied = []
+        try:
+            self._conn.execute(f"EXPLAIN {sql}").fetchall()
+        except sqlite3.ProgrammingError as e:
+            # e.g. "You can only execute one statement at a time."
+            return ValidationResult(is_valid=False, error=f"Safety Error: {e}")
+        except sqlite3.DatabaseError as e:
+            if self._denied:
+                return ValidationResult(is_valid=False, error=f"Safety Error: Not allowed: {', '.join(self._denied)}")
+            if not _is_statement_error(e):
+                raise
+            return ValidationResult(is_valid=False, error=f"Invalid SQL: {e}")
+        return ValidationResult(is_valid=True, sql=sql)
+
+    def validate(self, sql: str) -> ValidationResult:
+        if not sql or not sql.strip():
+            return ValidationResult(is_valid=False, error="Empty SQL query")
+
+        version = self.db.get_schema_version()
+        key = (canonicalize_sql(sql), version)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return ValidationResult(is_valid=cached.is_valid, sql=sql if cached.is_valid else None,
+                                        error=cached.error)
+            self.misses += 1
+
+            if version != self._tables_version:
+                self._tables = frozenset(self.db.get_all_table_names())
+                self._tables_version = version
+
+            result = self._prepare(sql)
+            self._cache[key] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            return result
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,325 @@
+# Infrastructure Layer
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, type, help, labels, value): one sample read from a component's stats() at scrape time
+CollectedSample = Tuple[str, str, str, Dict[str, str], float]
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, Any]) -> str:
+    return json.dumps([str(labels.get(name, "")) for name in labelnames])
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = list(labelnames)
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Any] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"type": self.type, "help": self.help, "labelnames": self.labelnames,
+                    "samples": json.loads(json.dumps(self._samples))}
+
+class Counter(_Metric):
+    """Monotonic counter, one value per label combination."""
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0.0) + amount
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (Prometheus semantics), one per label combination."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = list(buckets)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            # [count per bucket (non-cumulative, last is +Inf), sum, count]
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = self.buckets
+        return data
+
+class MetricsRegistry:
+    """
+    Counters and histograms rendered in the Prometheus text format.
+
+    Components that already keep counters (caches, pool, LLM wrapper) are
+    registered with add_collector() and read at scrape time instead of being
+    instrumented twice. With share(), each process periodically writes its
+    snapshot to a directory and render() merges them, so one scrape covers
+    every uvicorn worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[CollectedSample]]] = []
+        self._share_dir: Optional[str] = None
+        self._share_interval = 5.0
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def _get_or_create(self, cls, name: str, help: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[CollectedSample]]):
+        self._collectors.append(collect)
+
+    def add_stats(self, prefix: str, stats: Callable[[], Dict[str, Any]], counters: Sequence[str] = (),
+                  gauges: Sequence[str] = (), help: str = ""):
+        """Exposes numeric keys of a stats() dict as `<prefix>_<key>_total` counters and `<prefix>_<key>` gauges."""
+        def collect() -> Iterator[CollectedSample]:
+            values = stats()
+            for key in counters:
+                yield f"{prefix}_{key}_total", "counter", f"{help} ({key})", {}, float(values[key])
+            for key in gauges:
+                yield f"{prefix}_{key}", "gauge", f"{help} ({key})", {}, float(values[key])
+        self.add_collector(collect)
+
+    # ==========================================
+    # Snapshots
+    # ==========================================
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly state of every metric, collected samples included."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families = {metric.name: metric.snapshot() for metric in metrics}
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"WARNING: Metrics collector failed: {e}")
+                continue
+            for name, kind, help, labels, value in samples:
+                family = families.setdefault(name, {"type": kind, "help": help, "labelnames": sorted(labels),
+                                                    "samples": {}})
+                key = _label_key(family["labelnames"], labels)
+                family["samples"][key] = family["samples"].get(key, 0.0) + value
+        return families
+
+    @staticmethod
+    def _merge(into: Dict[str, Any], other: Dict[str, Any], gauges: bool = True):
+        for name, family in other.items():
+            if family["type"] == "gauge" and not gauges:
+                continue
+            target = into.setdefault(name, {**family, "samples": {}})
+            for key, value in family["samples"].items():
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif family["type"] == "histogram":
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                else:
+                    target["samples"][key] = current + value
+
+    def share(self, directory: str, interval: float = 5.0):
+        """Writes this process's snapshot to `directory` every `interval` seconds (daemon thread)."""
+        os.makedirs(directory, exist_ok=True)
+        self._share_dir = directory
+        self._share_interval = interval
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.dump()
+
+        threading.Thread(target=loop, name="metrics-share", daemon=True).start()
+
+    def dump(self):
+        if self._share_dir is None:
+            return
+        path = os.path.join(self._share_dir, f"{os.getpid()}.json")
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump({"time": time.time(), "metrics": self.snapshot()}, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"WARNING: Metrics snapshot write failed: {e}")
+
+    def _merged_snapshot(self) -> Dict[str, Any]:
+        families = self.snapshot()
+        if self._share_dir is None:
+            return families
+        own = os.path.join(self._share_dir, f"{os.getpid()}.json")
+        for path in glob.glob(os.path.join(self._share_dir, "*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # Counters of exited workers still count towards the totals; their gauges do not
+            fresh = time.time() - data.get("time", 0) < 3 * self._share_interval
+            self._merge(families, data.get("metrics", {}), gauges=fresh)
+        return families
+
+    # ==========================================
+    # Exposition
+    # ==========================================
+
+    def render(self) -> str:
+        """All metrics (of all sharing processes) in the Prometheus text exposition format."""
+        lines = []
+        for name, family in sorted(self._merged_snapshot().items()):
+            lines.append(f"# HELP {name} {_escape(family['help'])}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, value in sorted(family["samples"].items()):
+                pairs = list(zip(family["labelnames"], json.loads(key)))
+                if family["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(family["buckets"] + ["+Inf"], counts):
+                    cumulative += bucket_count
+                    le = bound if bound == "+Inf" else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {count}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry, like prometheus_client's default one
+metrics = MetricsRegistry()
+
+SPAN_SECONDS = metrics.histogram(
+    "texttosql_span_duration_seconds", "Duration of traced pipeline stages and LLM calls", ["span"]
+)
+SPAN_ERRORS = metrics.counter(
+    "texttosql_span_errors_total", "Traced spans that ended with an exception", ["span", "error"]
+)
+
+# ==========================================
+# Tracing
+# ==========================================
+
+@dataclass
+class Span:
+    """One timed operation of a request; `start` is relative to the trace start."""
+    name: str
+    start: float
+    duration: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+class Trace:
+    """The spans of one request, in the order they finished."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": s.name,
+                "start_ms": round(s.start * 1000, 3),
+                "duration_ms": round(s.duration * 1000, 3),
+                **({"error": s.error} if s.error else {}),
+                **s.attributes
+            }
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+
+# Trace of the current request; tasks and to_thread() calls inherit it
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+def start_trace() -> Trace:
+    """Starts a new trace for the current task (and the tasks it creates)."""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Times the block with the monotonic clock. The duration always goes to the
+    span histogram; the span is added to the current trace, if there is one.
+    """
+    trace = _current_trace.get()
+    t0 = time.perf_counter()
+    s = Span(name=name, start=t0 - trace.started if trace else 0.0, attributes=dict(attributes))
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.duration = time.perf_counter() - t0
+        _finish(trace, s)
+
+def record_span(name: str, duration: float, started: float, error: Optional[str] = None, **attributes) -> Span:
+    """
+    Records a span measured by the caller, for work that is not one block:
+    e.g. the fetches of a stream, without the time spent between them.
+    `started` is the time.perf_counter() value at which the work began.
+    """
+    trace = _current_trace.get()
+    s = Span(name=name, start=started - trace.started if trace else 0.0, duration=duration,
+             attributes=dict(attributes), error=error)
+    _finish(trace, s)
+    return s
+
+def _finish(trace: Optional[Trace], s: Span):
+    if trace is not None:
+        trace.spans.append(s)
+    SPAN_SECONDS.observe(s.duration, span=s.name)
+    if s.error:
+        SPAN_ERRORS.inc(span=s.name, error=s.error)
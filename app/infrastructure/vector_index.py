@@ -0,0 +1,292 @@
+# Infrastructure Layer
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.domain.models import SchemaInfo
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+class HashedEmbedder:
+    """
+    Network-free text embedding: word unigrams/bigrams and character n-grams
+    hashed into a fixed number of signed buckets, then L2-normalized.
+    Similar spellings ("customer" / "customers" / "customer_id") share most
+    n-grams, so cosine similarity behaves like a fuzzy lexical match.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower().replace("_", " "))
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        low, high = self.ngram_range
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features += [f"c:{padded[i:i + n]}" for i in range(max(len(padded) - n + 1, 1))]
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 matrix of unit vectors (all-zero rows for empty text)."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                # Low bits pick the bucket, the top bit picks the sign
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+@dataclass
+class VectorEntry:
+    kind: str          # "table", "column" or "question"
+    text: str
+    tables: List[str] = field(default_factory=list)
+
+@dataclass
+class VectorHit:
+    entry: VectorEntry
+    score: float
+
+class VectorIndex:
+    """
+    NumPy cosine-similarity index over schema elements (tables, columns) and
+    previously successful questions.
+
+    Vectors live in `<path>.npy` and are opened with mmap on startup, so
+    loading does not parse or copy the matrix; entry metadata lives in
+    `<path>.json`. Schema entries are replaced when the schema version
+    changes; question entries are kept. New rows are held in memory and
+    written back by a background writer thread (after a schema sync, every
+    `save_every` additions) and by close(), so callers never wait on disk.
+    """
+
+    def __init__(self, path: Optional[str] = None, embedder: Optional[HashedEmbedder] = None,
+                 max_questions: int = 10000, save_every: int = 20):
+        self.path = path
+        self.embedder = embedder or HashedEmbedder()
+        self.max_questions = max_questions
+        self.save_every = save_every
+
+        self._lock = threading.Lock()
+        self._entries: List[VectorEntry] = []
+        self._matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.schema_version: Optional[int] = None
+        self._unsaved = 0
+
+        # One writer at a time (background thread or close())
+        self._save_lock = threading.Lock()
+        self._save_requested = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+        if path:
+            self._load()
+
+    # ==========================================
+    # Persistence
+    # ==========================================
+
+    def _load(self):
+        try:
+            with open(f"{self.path}.json") as f:
+                meta = json.load(f)
+            matrix = np.load(f"{self.path}.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return
+        if meta.get("dim") != self.embedder.dim or matrix.shape[0] != len(meta.get("entries", [])):
+            print("WARNING: Vector index files do not match, starting empty.")
+            return
+        self._entries = [VectorEntry(**entry) for entry in meta["entries"]]
+        self._matrix = matrix
+        self.schema_version = meta.get("schema_version")
+        print(f"[Log] Vector index loaded: {len(self._entries)} entries")
+
+    def save(self) -> bool:
+        """Writes the index now. Failures are logged and leave the rows unsaved; returns success."""
+        if not self.path:
+            return True
+        with self._save_lock:
+            # Updates replace the matrix instead of modifying it, so the snapshot stays valid
+            with self._lock:
+                matrix = np.ascontiguousarray(self._matrix)
+                meta = {
+                    "dim": self.embedder.dim,
+                    "schema_version": self.schema_version,
+                    "entries": [entry.__dict__ for entry in self._entries]
+                }
+                pending, self._unsaved = self._unsaved, 0
+
+            try:
+                self._write(matrix, meta)
+                return True
+            except (OSError, ValueError) as e:
+                with self._lock:
+                    self._unsaved += pending
+                print(f"WARNING: Vector index save failed: {e}")
+                return False
+
+    def _write(self, matrix: np.ndarray, meta: Dict[str, Any]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.basename(self.path) + "."
+        # Write both files next to the old ones under unique names, then swap them in
+        temp_files = []
+        try:
+            fd, npy_temp = tempfile.mkstemp(suffix=".tmp.npy", prefix=prefix, dir=directory)
+            temp_files.append(npy_temp)
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, matrix)
+            fd, json_temp = tempfile.mkstemp(suffix=".tmp.json", prefix=prefix, dir=directory)
+            temp_files.append(json_temp)
+            with os.fdopen(fd, "w") as f:
+                json.dump(meta, f)
+            os.replace(npy_temp, f"{self.path}.npy")
+            os.replace(json_temp, f"{self.path}.json")
+        finally:
+            for temp in temp_files:
+                if os.path.exists(temp):
+                    os.remove(temp)
+
+    def _request_save(self):
+        """Wakes the background writer (started on first use); returns immediately."""
+        if not self.path:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="vector-index-writer", daemon=True)
+                self._writer.start()
+        self._save_requested.set()
+
+    def _write_loop(self):
+        while True:
+            self._save_requested.wait()
+            self._save_requested.clear()
+            if self._closed:
+                return
+            self.save()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            writer = self._writer
+        if writer is not None:
+            self._save_requested.set()
+            writer.join()
+        if self._unsaved:
+            self.save()
+
+    # ==========================================
+    # Updates
+    # ==========================================
+
+    def _append_locked(self, entries: List[VectorEntry], vectors: np.ndarray):
+        # Caller holds _lock. vstack copies, so a memory-mapped matrix becomes a regular array here
+        self._matrix = np.vstack([self._matrix, vectors])
+        self._entries.extend(entries)
+        self._unsaved += len(entries)
+
+    def sync_schema(self, version: int, infos: List[SchemaInfo], synonyms: Optional[Dict[str, List[str]]] = None):
+        """
+        Re-indexes tables and columns unless `version` is already indexed.
+        Synonyms pointing at a table are added to its text, so business words
+        ("customer") land close to the table they mean ("users").
+        """
+        if version == self.schema_version:
+            return
+
+        aliases: Dict[str, List[str]] = {}
+        for word, targets in (synonyms or {}).items():
+            for target in targets:
+                aliases.setdefault(target, []).append(word)
+
+        entries = []
+        for info in infos:
+            names = [column.split(" (")[0] for column in info.columns]
+            text = " ".join([info.table_name] + aliases.get(info.table_name, []) + names)
+            entries.append(VectorEntry("table", text, [info.table_name]))
+            for name in names:
+                entries.append(VectorEntry("column", " ".join([name] + aliases.get(name, [])), [info.table_name]))
+
+        # Embedding is the slow part: done before taking the lock
+        vectors = self.embedder.embed([entry.text for entry in entries])
+        with self._lock:
+            if version == self.schema_version:
+                return
+            keep = [i for i, entry in enumerate(self._entries) if entry.kind == "question"]
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = np.asarray(self._matrix[keep], dtype=np.float32)
+            self.schema_version = version
+            self._append_locked(entries, vectors)
+        print(f"[Log] Vector index synced: {len(entries)} schema entries (schema_version={version})")
+        self._request_save()
+
+    def add_question(self, question: str, tables: List[str]):
+        """Remembers a question that was answered successfully from `tables`."""
+        question = question.strip()
+        if not question or not tables:
+            return
+        entry = VectorEntry("question", question, list(tables))
+        vector = self.embedder.embed([question])
+        # Duplicate check, eviction and append in one critical section, so
+        # concurrent calls can neither add a question twice nor exceed the cap
+        with self._lock:
+            if any(e.kind == "question" and e.text == question for e in self._entries):
+                return
+            questions = [i for i, e in enumerate(self._entries) if e.kind == "question"]
+            if len(questions) >= self.max_questions:
+                # Drop the oldest question
+                drop = questions[0]
+                del self._entries[drop]
+                self._matrix = np.delete(self._matrix, drop, axis=0)
+            self._append_locked([entry], vector)
+            save = self._unsaved >= self.save_every
+        if save:
+            self._request_save()
+
+    # ==========================================
+    # Search
+    # ==========================================
+
+    def search_batch(self, texts: List[str], k: int = 10) -> List[List[VectorHit]]:
+        """Top-k entries by cosine similarity for each text (one matrix product for the batch)."""
+        queries = self.embedder.embed(texts)
+        with self._lock:
+            matrix, entries = self._matrix, list(self._entries)
+        if not entries:
+            return [[] for _ in texts]
+
+        scores = queries @ np.asarray(matrix).T
+        k = min(k, len(entries))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([VectorHit(entries[i], float(scores[row, i])) for i in ordered])
+        return results
+
+    def search(self, text: str, k: int = 10) -> List[VectorHit]:
+        return self.search_batch([text], k)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            questions = sum(1 for entry in self._entries if entry.kind == "question")
+            return {
+                "entries": len(self._entries),
+                "questions": questions,
+                "schema_version": self.schema_version,
+                "unsaved": self._unsaved
+            }
@@ -0,0 +1,113 @@
+# Infrastructure Layer
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.infrastructure.result_cache import canonicalize_sql
+
+@dataclass
+class WorkloadEntry:
+    """One distinct statement and how often / how long it ran."""
+    sql: str
+    runs: int
+    total_seconds: float
+    last_run: float
+
+class WorkloadLog:
+    """
+    Records executed SELECTs in a SQLite side-file, for the index advisor.
+
+    Statements are keyed on canonical SQL and counted (runs, total time), so
+    the file stays small however many times a question is asked. The least
+    recently run statements are pruned beyond `max_entries`. Like the
+    generation cache, the file can be shared by several server workers.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 2000):
+        self.path = path
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._since_prune = 0
+
+        # Process-local counters
+        self.recorded = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS statements (
+                    sql_key TEXT PRIMARY KEY,
+                    runs INTEGER NOT NULL,
+                    total_seconds REAL NOT NULL,
+                    last_run REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_statements_last_run ON statements(last_run)")
+            self._conn = conn
+        return self._conn
+
+    def record(self, sql: str, seconds: float):
+        """Counts one execution of `sql`. Errors are logged, never raised."""
+        key = canonicalize_sql(sql)
+        if not key:
+            return
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                conn.execute(
+                    """
+                    INSERT INTO statements (sql_key, runs, total_seconds, last_run) VALUES (?, 1, ?, ?)
+                    ON CONFLICT(sql_key) DO UPDATE SET
+                        runs = runs + 1,
+                        total_seconds = total_seconds + excluded.total_seconds,
+                        last_run = excluded.last_run
+                    """,
+                    (key, seconds, time.time())
+                )
+                self.recorded += 1
+                self._since_prune += 1
+                if self._since_prune >= self.PRUNE_EVERY:
+                    self._since_prune = 0
+                    conn.execute(
+                        "DELETE FROM statements WHERE sql_key NOT IN "
+                        "(SELECT sql_key FROM statements ORDER BY last_run DESC LIMIT ?)",
+                        (self.max_entries,)
+                    )
+        except sqlite3.Error as e:
+            print(f"WARNING: Workload log write failed: {e}")
+
+    def entries(self, min_runs: int = 1) -> List[WorkloadEntry]:
+        """Recorded statements, most frequently run first."""
+        with self._lock:
+            rows = self._get_connection().execute(
+                "SELECT sql_key, runs, total_seconds, last_run FROM statements WHERE runs >= ? "
+                "ORDER BY runs DESC, total_seconds DESC",
+                (min_runs,)
+            ).fetchall()
+        return [WorkloadEntry(*row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            try:
+                size = self._get_connection().execute("SELECT COUNT(*) FROM statements").fetchone()[0]
+            except sqlite3.Error:
+                size = -1
+            return {"statements": size, "recorded": self.recorded}
@@ -0,0 +1,154 @@
+# Service Layer
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+NUMERIC = "numeric"
+TEMPORAL = "temporal"
+CATEGORICAL = "categorical"
+IDENTIFIER = "identifier"
+EMPTY = "empty"
+
+_TEMPORAL_NAME = re.compile(r"(date|time|day|week|month|year|quarter|period|_at$)", re.IGNORECASE)
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}(-\d{2})?([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+_SHARE_WORDS = re.compile(r"\b(share|proportion|percent|percentage|distribution|breakdown|split|ratio)\b", re.IGNORECASE)
+
+CHART_TYPES = {"bar", "line", "pie", "doughnut", "scatter"}
+
+def chart_matches_columns(config: Dict[str, Any], columns: List[str]) -> bool:
+    """True when a chart config (e.g. one proposed before execution) fits the actual result columns."""
+    ys = config.get("y_columns")
+    return (
+        config.get("chart_type") in CHART_TYPES
+        and config.get("x_column") in columns
+        and isinstance(ys, list) and bool(ys)
+        and all(y in columns for y in ys)
+    )
+
+@dataclass
+class ColumnProfile:
+    name: str
+    kind: str
+    distinct: int
+    non_null: int
+
+@dataclass
+class ChartRecommendation:
+    """Chart config (None = table is better) plus how sure the heuristic is (0..1)."""
+    config: Optional[Dict[str, Any]]
+    confidence: float
+    reason: str
+
+class ChartRecommender:
+    """
+    Picks a chart locally from the shape of the result instead of asking the LLM.
+
+    Each column is profiled on up to `sample_size` rows (numeric / temporal /
+    categorical / identifier, distinct count). Common shapes map to a chart
+    with high confidence; unusual ones get a low score so the caller can fall
+    back to the LLM.
+    """
+
+    def __init__(self, sample_size: int = 1000, max_categories: int = 50):
+        self.sample_size = sample_size
+        self.max_categories = max_categories
+
+    # ==========================================
+    # Profiling
+    # ==========================================
+
+    def _is_temporal_value(self, value: Any) -> bool:
+        if isinstance(value, datetime):
+            return True
+        return isinstance(value, str) and bool(_ISO_DATE.match(value))
+
+    def _profile_column(self, name: str, values: Sequence[Any]) -> ColumnProfile:
+        present = [v for v in values if v is not None]
+        distinct = len(set(present))
+        if not present:
+            return ColumnProfile(name, EMPTY, 0, 0)
+
+        lowered = name.lower()
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+            if lowered == "id" or lowered.endswith("_id"):
+                kind = IDENTIFIER
+            elif _TEMPORAL_NAME.search(lowered) and all(isinstance(v, int) for v in present) and distinct <= self.max_categories:
+                # e.g. "year" = 2024, "month" = 7
+                kind = TEMPORAL
+            else:
+                kind = NUMERIC
+        elif all(self._is_temporal_value(v) for v in present):
+            kind = TEMPORAL
+        else:
+            kind = CATEGORICAL
+        return ColumnProfile(name, kind, distinct, len(present))
+
+    def profile(self, columns: List[str], rows: List[Sequence[Any]]) -> List[ColumnProfile]:
+        sample = rows[:self.sample_size]
+        return [
+            self._profile_column(name, [row[i] for row in sample])
+            for i, name in enumerate(columns)
+        ]
+
+    # ==========================================
+    # Recommendation
+    # ==========================================
+
+    def _title(self, query: str) -> str:
+        title = query.strip().rstrip("?.!")
+        title = title[:1].upper() + title[1:]
+        return title if len(title) <= 80 else title[:77] + "..."
+
+    def _config(self, chart_type: str, query: str, x: str, ys: List[str]) -> Dict[str, Any]:
+        return {
+            "chart_type": chart_type,
+            "title": self._title(query),
+            "x_column": x,
+            "y_columns": ys,
+            "labels": [y.replace("_", " ").title() for y in ys]
+        }
+
+    def recommend(self, query: str, columns: List[str], rows: List[Sequence[Any]]) -> ChartRecommendation:
+        if not rows or not columns:
+            return ChartRecommendation(None, 1.0, "no data")
+
+        profiles = self.profile(columns, rows)
+        numeric = [p for p in profiles if p.kind == NUMERIC]
+        temporal = [p for p in profiles if p.kind == TEMPORAL]
+        categorical = [p for p in profiles if p.kind == CATEGORICAL]
+        row_count = len(rows)
+
+        if len(columns) == 1 or row_count == 1:
+            return ChartRecommendation(None, 0.9, "single value or single column")
+        if not numeric:
+            return ChartRecommendation(None, 0.8, "no measure column")
+
+        ys = [p.name for p in numeric]
+
+        # Time series: one time axis + measures
+        if len(temporal) == 1 and not categorical:
+            return ChartRecommendation(self._config("line", query, temporal[0].name, ys), 0.9, "time series")
+
+        # Category + measures
+        if len(categorical) == 1 and not temporal:
+            category = categorical[0]
+            if category.distinct > self.max_categories:
+                return ChartRecommendation(self._config("bar", query, category.name, ys), 0.4, "too many categories")
+            if category.distinct < row_count:
+                # Repeated labels: probably needs a pivot the heuristic cannot do
+                return ChartRecommendation(self._config("bar", query, category.name, ys), 0.5, "repeated categories")
+
+            if len(ys) == 1 and category.distinct <= 8 and _SHARE_WORDS.search(query):
+                values = [row[columns.index(ys[0])] for row in rows[:self.sample_size]]
+                if all(v is None or v >= 0 for v in values):
+                    return ChartRecommendation(self._config("pie", query, category.name, ys), 0.85, "share of total")
+            return ChartRecommendation(self._config("bar", query, category.name, ys), 0.85, "category comparison")
+
+        # Two plain measures, nothing to group by
+        if len(numeric) == 2 and not categorical and not temporal:
+            return ChartRecommendation(
+                self._config("scatter", query, numeric[0].name, [numeric[1].name]), 0.6, "two measures"
+            )
+
+        return ChartRecommendation(None, 0.3, "ambiguous shape")
@@ -0,0 +1,88 @@
+# Service Layer
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from app.domain.models import SchemaInfo
+
+class JoinGraph:
+    """
+    Undirected graph of tables linked by foreign keys, with the shortest join
+    path between every pair of tables precomputed (one BFS per table).
+
+    Used to pull bridging tables into the LLM context (users + products ->
+    users, reviews, products) and to spell out the exact join conditions.
+    """
+
+    def __init__(self, infos: List[SchemaInfo], max_hops: int = 3):
+        # Paths longer than this are not worth bridging; the tables are unrelated
+        self.max_hops = max_hops
+
+        # table -> neighbour -> FK-owning tables and "a.x = b.y" conditions
+        # (several FKs may link the same pair)
+        self._edges: Dict[str, Dict[str, List[Tuple[str, str]]]] = {info.table_name: {} for info in infos}
+        for info in infos:
+            for fk in info.foreign_keys:
+                if fk.ref_table == info.table_name or fk.ref_table not in self._edges:
+                    # Self references (categories.parent_id) never bridge anything
+                    continue
+                condition = f"{info.table_name}.{fk.column} = {fk.ref_table}.{fk.ref_column}"
+                self._edges[info.table_name].setdefault(fk.ref_table, []).append((info.table_name, condition))
+                self._edges[fk.ref_table].setdefault(info.table_name, []).append((info.table_name, condition))
+
+        # (source, target) -> [source, ..., target]
+        self._paths: Dict[Tuple[str, str], List[str]] = {}
+        for source in self._edges:
+            self._bfs(source)
+
+    def _bfs(self, source: str):
+        parents: Dict[str, Optional[str]] = {source: None}
+        queue = deque([source])
+        while queue:
+            table = queue.popleft()
+            for neighbour in sorted(self._edges[table]):
+                if neighbour not in parents:
+                    parents[neighbour] = table
+                    queue.append(neighbour)
+
+        for target in parents:
+            path = [target]
+            while parents[path[-1]] is not None:
+                path.append(parents[path[-1]])
+            self._paths[(source, target)] = path[::-1]
+
+    def path(self, source: str, target: str) -> Optional[List[str]]:
+        """Shortest chain of tables from source to target (inclusive), or None."""
+        return self._paths.get((source, target))
+
+    def connect(self, tables: List[str]) -> List[str]:
+        """
+        Returns `tables` plus the bridging tables needed to join them, in order.
+        Greedy: each table is attached to the closest already-connected one.
+        Tables the graph does not know, or that are too far away, are kept as is.
+        """
+        result = list(dict.fromkeys(tables))
+        connected = [t for t in result[:1] if t in self._edges]
+        for table in result[1:]:
+            if table not in self._edges or table in connected:
+                continue
+            best = None
+            for anchor in connected:
+                path = self.path(anchor, table)
+                if path and len(path) - 1 <= self.max_hops and (best is None or len(path) < len(best)):
+                    best = path
+            for bridge in (best or [table]):
+                if bridge not in connected:
+                    connected.append(bridge)
+                if bridge not in result:
+                    result.append(bridge)
+        return result
+
+    def join_conditions(self, table: str, tables: List[str]) -> List[str]:
+        """
+        Join conditions from the foreign keys declared on `table` to the other
+        tables in `tables` (so each condition is listed once, on the FK side).
+        """
+        neighbours = self._edges.get(table, {})
+        return [
+            condition for other in tables if other != table
+            for owner, condition in neighbours.get(other, []) if owner == table
+        ]
@@ -0,0 +1,427 @@
+# Service Layer
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.domain.interfaces import IRagEngine, ILLMService, IValidator, IDatabase
+from app.domain.models import QueryOutcome, SchemaInfo, SQLGeneration, ExecutionResult, BatchItem
+from app.services.statement_store import StatementStore
+from app.infrastructure.generation_cache import normalize_question
+from app.services.chart_recommender import ChartRecommender, chart_matches_columns
+from app.services.single_flight import SingleFlight
+from app.infrastructure.telemetry import metrics, span, start_trace, record_span
+
+QUERIES = metrics.counter("texttosql_queries_total", "Questions answered, by entry point and outcome", ["mode", "outcome"])
+RESULT_ROWS = metrics.histogram(
+    "texttosql_result_rows", "Rows returned per executed query",
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+)
+
+# Per-task stage limits ({"llm": Semaphore, "db": Semaphore}), set by run_batch()
+_stage_limits: ContextVar[Optional[Dict[str, asyncio.Semaphore]]] = ContextVar("stage_limits", default=None)
+
+@asynccontextmanager
+async def stage_slot(stage: str):
+    """Holds a slot of the current batch's semaphore for `stage`; no-op outside a batch."""
+    limits = _stage_limits.get()
+    semaphore = limits.get(stage) if limits else None
+    if semaphore is None:
+        yield
+        return
+    async with semaphore:
+        yield
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Runs the block in a tracing span and stores its duration in timings[stage] (seconds)."""
+    current = None
+    try:
+        with span(stage) as current:
+            yield current
+    finally:
+        if current is not None:
+            timings[stage] = round(current.duration, 6)
+
+async def fetch_timed(chunks: AsyncIterator[ExecutionResult], elapsed: List[float]) -> AsyncIterator[ExecutionResult]:
+    """Passes the chunks through, adding the time spent fetching each one to elapsed[0]."""
+    while True:
+        t0 = time.perf_counter()
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            elapsed[0] += time.perf_counter() - t0
+        yield chunk
+
+def referenced_tables(sql: str, context: List[SchemaInfo]) -> List[str]:
+    """Context tables whose name appears as a word in the SQL."""
+    return [
+        info.table_name for info in context
+        if re.search(rf"(?<![\w]){re.escape(info.table_name)}(?![\w])", sql, re.IGNORECASE)
+    ]
+
+class QueryPipeline:
+    """
+    Async orchestration of the full flow:
+    RAG -> SQL Generation -> Validation -> Execution -> Chart Suggestion.
+
+    Every slow stage is awaited (LLM via the async client, SQLite via the
+    repository's thread pool), so concurrent questions overlap instead of
+    queueing behind each other on the event loop.
+    """
+
+    def __init__(self, rag: IRagEngine, llm: ILLMService, validator: IValidator, db: IDatabase,
+                 max_rows: Optional[int] = None, statements: Optional[StatementStore] = None,
+                 chart_recommender: Optional[ChartRecommender] = None, chart_min_confidence: float = 0.7,
+                 fused: bool = False, single_flight: Optional[SingleFlight] = None):
+        self.rag = rag
+        self.llm = llm
+        self.validator = validator
+        self.db = db
+        # Row cap for run(); truncated results are kept in `statements` for paging
+        self.max_rows = max_rows
+        self.statements = statements
+        # Local chart heuristic; the LLM is only asked when it is not confident
+        self.chart_recommender = chart_recommender
+        self.chart_min_confidence = chart_min_confidence
+        # Fused mode: one LLM call picks tables, writes SQL and proposes the chart
+        self.fused = fused
+        # Identical questions asked concurrently share one run()
+        self.single_flight = single_flight
+
+    # ==========================================
+    # Stages
+    # ==========================================
+
+    async def _retrieve(self, user_query: str) -> List[SchemaInfo]:
+        t0 = time.perf_counter()
+        # In fused mode the generation call chooses tables itself, so no guess_intent round trip
+        context_infos = await self.rag.get_context_async(user_query, llm_fallback=not self.fused)
+        print(f"[Log] RAG Context: {time.perf_counter() - t0:.2f}s")
+        return context_infos
+
+    async def _generate(self, user_query: str,
+                        context_infos: List[SchemaInfo]) -> Tuple[SQLGeneration, Optional[Dict[str, Any]]]:
+        """Returns (sql_result, chart_hint); the hint only comes from fused mode."""
+        t1 = time.perf_counter()
+        chart_hint = None
+        async with stage_slot("llm"):
+            if self.fused:
+                fused = await self.llm.generate_fused_async(user_query, context_infos)
+                sql_result, chart_hint = fused.generation, fused.chart_hint
+            else:
+                sql_result = await self.llm.generate_sql_async(user_query, context_infos)
+        print(f"[Log] SQL Gen: {time.perf_counter() - t1:.2f}s{' (cached)' if sql_result.cached else f' ({sql_result.prompt_tokens} prompt tokens)'}")
+        return sql_result, chart_hint
+
+    async def _check(self, sql_result: SQLGeneration) -> Optional[str]:
+        """Returns an error message if the generated SQL must not be executed."""
+        if not sql_result.sql:
+            return f"Failed to generate SQL: {sql_result.error_message}"
+
+        validation = await self.validator.validate_async(sql_result.sql)
+        if not validation.is_valid:
+            return f"Validation Failed: {validation.error}"
+
+        if not sql_result.is_safe:
+            return "Query identified as unsafe (Modification detected)."
+        return None
+
+    async def _suggest_chart(self, user_query: str, columns: List[str], rows: List[Any],
+                             chart_hint: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Returns (chart_config, source) where source is "fused", "heuristic" or "llm"."""
+        t3 = time.perf_counter()
+        if chart_hint is not None:
+            # Proposed before execution: only trusted if it names real result columns
+            if chart_hint.get("chart_type") == "none":
+                return None, "fused"
+            if chart_matches_columns(chart_hint, columns):
+                return chart_hint, "fused"
+            print("[Log] Fused chart hint does not match the result columns, ignoring it")
+
+        if self.chart_recommender is not None:
+            recommendation = self.chart_recommender.recommend(user_query, columns, rows)
+            if recommendation.confidence >= self.chart_min_confidence:
+                print(f"[Log] Chart Gen: {time.perf_counter() - t3:.2f}s (heuristic: {recommendation.reason})")
+                return recommendation.config, "heuristic"
+
+        async with stage_slot("llm"):
+            chart_config = await self.llm.suggest_chart_async(user_query, columns)
+        print(f"[Log] Chart Gen: {time.perf_counter() - t3:.2f}s")
+        return chart_config, "llm"
+
+    async def _record_success(self, user_query: str, sql_result: SQLGeneration, context_infos: List[SchemaInfo]):
+        """
+        Called once the SQL validated and executed: only then is the generation
+        worth remembering. Best effort: a failure here must not fail the query.
+        """
+        try:
+            # Lets the generation cache replay this SQL for the same question
+            await asyncio.to_thread(self.llm.record_success, user_query, context_infos, sql_result)
+            # Lets the retriever answer similar questions without the LLM next time
+            tables = referenced_tables(sql_result.sql, context_infos)
+            if tables:
+                await asyncio.to_thread(self.rag.record_success, user_query, tables)
+        except Exception as e:
+            print(f"WARNING: Could not record successful query: {e}")
+
+    # ==========================================
+    # Entry Points
+    # ==========================================
+
+    async def run(self, user_query: str) -> QueryOutcome:
+        if self.single_flight is None:
+            return await self._run(user_query)
+
+        outcome, shared = await self.single_flight.do(
+            normalize_question(user_query), lambda: self._run(user_query)
+        )
+        if shared:
+            # The outcome object is shared between callers: tag a copy
+            outcome = replace(outcome, metadata={**outcome.metadata, "coalesced": True})
+        return outcome
+
+    async def _run(self, user_query: str) -> QueryOutcome:
+        trace = start_trace()
+        start_time = time.perf_counter()
+        outcome = await self._run_stages(user_query)
+        print(f"[Log] Total Process: {time.perf_counter() - start_time:.2f}s")
+
+        if outcome.error:
+            QUERIES.inc(mode="run", outcome="timeout" if outcome.metadata.get("timed_out") else "error")
+        else:
+            QUERIES.inc(mode="run", outcome="ok")
+        outcome.spans = trace.breakdown()
+        return outcome
+
+    async def _run_stages(self, user_query: str) -> QueryOutcome:
+        # Per-stage seconds, reported in metadata["timings"]
+        timings: Dict[str, float] = {}
+
+        # A. RAG - Get Context
+        with timed(timings, "rag") as stage:
+            context_infos = await self._retrieve(user_query)
+            stage.set(tables=len(context_infos))
+
+        # B. LLM - Generate SQL
+        with timed(timings, "generation") as stage:
+            sql_result, chart_hint = await self._generate(user_query, context_infos)
+            stage.set(cached=sql_result.cached, prompt_tokens=sql_result.prompt_tokens)
+        metadata = {"sql_cached": sql_result.cached, "prompt_tokens": sql_result.prompt_tokens, "timings": timings}
+
+        # C. Validation
+        with timed(timings, "validation") as stage:
+            error = await self._check(sql_result)
+            stage.set(valid=error is None)
+        if error:
+            return QueryOutcome(
+                context=context_infos,
+                sql=sql_result.sql or None,
+                error=error,
+                metadata=metadata
+            )
+
+        # D. Execution
+        with timed(timings, "execution") as stage:
+            async with stage_slot("db"):
+                exec_result = await self.db.execute_query_async(sql_result.sql, self.max_rows)
+            stage.set(rows=len(exec_result.rows), cached=exec_result.cached, timed_out=exec_result.timed_out)
+        print(f"[Log] DB Exec: {stage.duration:.2f}s{' (cached)' if exec_result.cached else ''}")
+        metadata["result_cached"] = exec_result.cached
+
+        query_id = None
+        if exec_result.truncated and self.statements is not None:
+            query_id = self.statements.add(sql_result.sql, exec_result.columns)
+
+        if not exec_result.success:
+            if exec_result.timed_out:
+                metadata["timed_out"] = True
+            return QueryOutcome(
+                context=context_infos,
+                sql=sql_result.sql,
+                explanation=sql_result.explanation,
+                error=exec_result.error,
+                metadata=metadata,
+                plan=exec_result.plan
+            )
+        RESULT_ROWS.observe(len(exec_result.rows))
+
+        await self._record_success(user_query, sql_result, context_infos)
+
+        # E. Chart Suggestion
+        chart_config = None
+        metadata["chart_source"] = "none"
+        if exec_result.columns and exec_result.rows:
+            # Only ask for chart if we have data
+            with timed(timings, "chart") as stage:
+                chart_config, metadata["chart_source"] = await self._suggest_chart(
+                    user_query, exec_result.columns, exec_result.rows, chart_hint
+                )
+                stage.set(source=metadata["chart_source"])
+
+        return QueryOutcome(
+            context=context_infos,
+            sql=sql_result.sql,
+            explanation=sql_result.explanation,
+            execution=exec_result,
+            chart_config=chart_config,
+            metadata=metadata,
+            query_id=query_id,
+            plan=exec_result.plan
+        )
+
+    async def run_batch(self, questions: List[str], llm_concurrency: int = 8,
+                        db_concurrency: int = 4) -> AsyncIterator[BatchItem]:
+        """
+        Runs many questions and yields a BatchItem for each as soon as it is done
+        (completion order, not input order).
+
+        Questions are deduplicated on their normalized text; repeats get the first
+        run's outcome. All runs share one schema catalog snapshot. LLM calls
+        (generation, chart) and DB executions are limited by separate semaphores,
+        so throughput follows the LLM concurrency rather than the batch size.
+        """
+        batch_start = time.perf_counter()
+        limits = {"llm": asyncio.Semaphore(llm_concurrency), "db": asyncio.Semaphore(db_concurrency)}
+
+        # normalized question -> indexes of every occurrence
+        groups: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            groups.setdefault(normalize_question(question), []).append(index)
+
+        async def run_one(indexes: List[int]) -> Tuple[List[int], QueryOutcome, float]:
+            _stage_limits.set(limits)
+            t0 = time.perf_counter()
+            try:
+                outcome = await self._run(questions[indexes[0]])
+            except Exception as e:
+                outcome = QueryOutcome(context=[], error=str(e))
+            return indexes, outcome, time.perf_counter() - t0
+
+        # Refresh the catalog off the event loop, then pin it for the whole batch
+        await self.db.get_schema_version_async()
+        with self.db.schema_snapshot():
+            tasks = [asyncio.create_task(run_one(indexes)) for indexes in groups.values()]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    indexes, outcome, seconds = await finished
+                    finished_at = time.perf_counter() - batch_start
+                    for position, index in enumerate(indexes):
+                        yield BatchItem(
+                            index=index,
+                            question=questions[index],
+                            outcome=outcome,
+                            seconds=seconds,
+                            finished_at=finished_at,
+                            duplicate=position > 0
+                        )
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def fetch_page(self, query_id: str, offset: int, limit: int) -> Optional[ExecutionResult]:
+        """
+        Re-executes a stored statement for rows [offset, offset + limit).
+        Returns None when the query id is unknown or expired. No LLM call is made.
+        """
+        if self.statements is None:
+            return None
+        statement = self.statements.get(query_id)
+        if statement is None:
+            return None
+
+        page = await self.db.execute_query_async(statement.sql, limit, offset)
+        if page.success:
+            # Keep the original headers (a wrapped OFFSET query may rename duplicates)
+            page = replace(page, columns=statement.columns)
+        return page
+
+    async def stream(self, user_query: str, chunk_size: int = 500) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Same flow as run(), but yields (event, payload) pairs as soon as each
+        stage is ready:
+
+            ("context", List[SchemaInfo])
+            ("sql", SQLGeneration)
+            ("plan", QueryPlan)            -- when the database estimated the cost
+            ("columns", List[str])
+            ("rows", List[tuple])          -- repeated, one per fetched chunk
+            ("chart", Optional[dict])
+            ("error", str)                 -- ends the stream
+            ("done", dict)                 -- row count + metadata
+
+        Rows are never accumulated, so memory does not grow with the result size.
+        """
+        start_trace()
+        timings: Dict[str, float] = {}
+        with timed(timings, "rag"):
+            context_infos = await self._retrieve(user_query)
+        yield "context", context_infos
+
+        with timed(timings, "generation") as stage:
+            sql_result, chart_hint = await self._generate(user_query, context_infos)
+            stage.set(cached=sql_result.cached, prompt_tokens=sql_result.prompt_tokens)
+        metadata = {"sql_cached": sql_result.cached, "prompt_tokens": sql_result.prompt_tokens, "timings": timings}
+        yield "sql", sql_result
+
+        with timed(timings, "validation"):
+            error = await self._check(sql_result)
+        if error:
+            QUERIES.inc(mode="stream", outcome="error")
+            yield "error", error
+            return
+
+        chart_task = None
+        columns_sent = False
+        row_count = 0
+        try:
+            # Only the fetches are timed: the client's read speed between chunks is not SQL time
+            fetch_seconds = [0.0]
+            fetch_started = time.perf_counter()
+            fetch_error = None
+            try:
+                chunks = fetch_timed(self.db.iter_query_async(sql_result.sql, chunk_size), fetch_seconds)
+                async for chunk in chunks:
+                    if chunk.plan:
+                        yield "plan", chunk.plan
+                    if not chunk.success:
+                        QUERIES.inc(mode="stream", outcome="timeout" if chunk.timed_out else "error")
+                        yield "error", chunk.error
+                        return
+
+                    if not columns_sent:
+                        columns_sent = True
+                        metadata["result_cached"] = chunk.cached
+                        yield "columns", chunk.columns
+                        # Columns are known: let the chart call run while rows stream out
+                        # (the heuristic profiles the first chunk only)
+                        if chunk.columns and chunk.rows:
+                            chart_task = asyncio.create_task(
+                                self._suggest_chart(user_query, chunk.columns, chunk.rows, chart_hint)
+                            )
+
+                    if chunk.rows:
+                        row_count += len(chunk.rows)
+                        yield "rows", chunk.rows
+            except Exception as e:
+                fetch_error = type(e).__name__
+                raise
+            finally:
+                timings["execution"] = round(fetch_seconds[0], 6)
+                record_span("execution", fetch_seconds[0], fetch_started, fetch_error, rows=row_count)
+            RESULT_ROWS.observe(row_count)
+
+            await self._record_success(user_query, sql_result, context_infos)
+            with timed(timings, "chart"):
+                # Mostly overlapped with the rows above: this is the time still left to wait
+                chart_config, metadata["chart_source"] = (await chart_task) if chart_task else (None, "none")
+            QUERIES.inc(mode="stream", outcome="ok")
+            yield "chart", chart_config
+            yield "done", {"row_count": row_count, "metadata": metadata}
+        finally:
+            if chart_task and not chart_task.done():
+                chart_task.cancel()
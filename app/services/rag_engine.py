@@ -1,39 +1,146 @@
-from typing import List
+# Service Layer
+import asyncio
+import threading
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
 from app.domain.interfaces import IRagEngine, IDatabase, ILLMService
 from app.domain.models import SchemaInfo
+from app.infrastructure.vector_index import VectorIndex
+from app.services.schema_index import SchemaIndex, DEFAULT_SYNONYMS
+from app.services.join_graph import JoinGraph
 
 class RagEngine(IRagEngine):
-    def __init__(self, db: IDatabase, llm: ILLMService):
+    # Tables scoring below this fraction of the best match are left out of the prompt
+    RELATIVE_CUTOFF = 0.3
+
+    def __init__(self, db: IDatabase, llm: ILLMService, synonyms: Optional[Dict[str, List[str]]] = None,
+                 top_k: int = 5, min_score: float = 2.0, vector_index: Optional[VectorIndex] = None,
+                 vector_min_similarity: float = 0.3):
         self.db = db
         self.llm = llm
+        self.synonyms = synonyms
+        self.top_k = top_k
+        # Below this BM25 score the lexical match is not trusted and the LLM guesses
+        self.min_score = min_score
+        # Optional second tier: embeddings of tables, columns and past questions
+        self.vector_index = vector_index
+        self.vector_min_similarity = vector_min_similarity
+
+        # Both derived from the full schema, rebuilt when schema_version changes
+        self._index: Optional[SchemaIndex] = None
+        self._graph: Optional[JoinGraph] = None
+        self._index_version: Optional[int] = None
+        self._index_lock = threading.Lock()
+
+    def _index_is_current(self, version: int) -> bool:
+        return self._index is not None and self._index_version == version
+
+    def _set_index(self, version: int, infos: List[SchemaInfo]) -> Tuple[SchemaIndex, JoinGraph]:
+        index = SchemaIndex(infos, self.synonyms)
+        graph = JoinGraph(infos)
+        if self.vector_index is not None:
+            self.vector_index.sync_schema(version, infos, DEFAULT_SYNONYMS if self.synonyms is None else self.synonyms)
+        with self._index_lock:
+            self._index, self._graph, self._index_version = index, graph, version
+        print(f"[Log] Schema index built: {len(infos)} tables (schema_version={version})")
+        return index, graph
+
+    def _with_joins(self, infos: List[SchemaInfo], graph: JoinGraph) -> List[SchemaInfo]:
+        # Catalog objects are shared: attach the joins to copies
+        tables = [info.table_name for info in infos]
+        return [replace(info, joins=graph.join_conditions(info.table_name, tables)) for info in infos]
+
+    def _short_list(self, query: str, index: SchemaIndex) -> List[str]:
+        # 1. Short List Strategy (BM25 over table/column names, stems, sample values, synonyms)
+        hits = index.search(query, self.top_k, self.min_score)
+        if not hits:
+            return []
+        best = hits[0][1]
+        return [table for table, score in hits if score >= best * self.RELATIVE_CUTOFF]
 
-    def get_context(self, query: str) -> List[SchemaInfo]:
+    def _vector_list(self, query: str, all_tables: List[str]) -> List[str]:
+        # 2. Vector Strategy (hashed n-gram embeddings, no network)
+        if self.vector_index is None:
+            return []
+        scores: Dict[str, float] = {}
+        for hit in self.vector_index.search(query, self.top_k * 4):
+            if hit.score < self.vector_min_similarity:
+                break
+            for table in hit.entry.tables:
+                if table in all_tables:
+                    scores[table] = max(scores.get(table, 0.0), hit.score)
+        if not scores:
+            return []
+        best = max(scores.values())
+        ranked = sorted(scores, key=scores.get, reverse=True)[:self.top_k]
+        return [table for table in ranked if scores[table] >= best * (1 - self.RELATIVE_CUTOFF)]
+
+    def record_success(self, query: str, tables: List[str]):
+        if self.vector_index is not None:
+            self.vector_index.add_question(query, tables)
+
+    def get_context(self, query: str, llm_fallback: bool = True) -> List[SchemaInfo]:
         """
         Retrieves context using a tiered approach:
-        1. Short List (Keyword Match)
-        2. LLM Guess (Fallback)
+        1. Short List (BM25 schema index)
+        2. Vector search over schema elements and past questions
+        3. LLM Guess (Fallback when neither tier is confident)
+           With llm_fallback=False the whole catalog is returned instead, for
+           callers whose next LLM call chooses the tables itself (fused mode).
+        The selected tables are then completed with the bridging tables and
+        join conditions from the foreign-key graph.
         """
         all_tables = self.db.get_all_table_names()
-        
-        # 1. Short List Strategy (Naive keyword matching)
-        # Check if table names appear directly in the query
-        short_list = [table for table in all_tables if table.lower() in query.lower()]
-        
-        # If we found robust matches (e.g. > 1 table or specific ones), we might verify them.
-        # But for MVP, if short_list is empty, we fall back.
-        
+
+        version = self.db.get_schema_version()
+        index, graph = self._index, self._graph
+        if not self._index_is_current(version):
+            index, graph = self._set_index(version, self.db.get_schema_info(all_tables))
+
+        short_list = self._short_list(query, index) or self._vector_list(query, all_tables)
+
+        if not short_list and not llm_fallback:
+            return self._with_joins(self.db.get_schema_info(all_tables), graph)
+
         if not short_list:
-             # 2. LLM Guess Strategy (Fallback)
+             # 3. LLM Guess Strategy (Fallback)
              print(f"DEBUG: Short list empty for '{query}'. Using LLM Guess.")
              guessed_tables = self.llm.guess_intent(query, all_tables)
-             
+
              # Filter valid tables only
              short_list = [t for t in guessed_tables if t in all_tables]
 
         # Get Schema Info for selected tables
         if short_list:
-            return self.db.get_schema_info(short_list)
-        
+            return self._with_joins(self.db.get_schema_info(graph.connect(short_list)), graph)
+
         # If logic fails completely, return all (risky for large DBs, safe for MVP)
         print("DEBUG: Fallback to ALL tables.")
-        return self.db.get_schema_info(all_tables[:5]) # Limit to 5 strictly for MVP safety
+        return self._with_joins(self.db.get_schema_info(all_tables[:5]), graph) # Limit to 5 strictly for MVP safety
+
+    async def get_context_async(self, query: str, llm_fallback: bool = True) -> List[SchemaInfo]:
+        """Same tiers as get_context, but awaits the DB and LLM instead of blocking."""
+        all_tables = await self.db.get_all_table_names_async()
+
+        version = await self.db.get_schema_version_async()
+        index, graph = self._index, self._graph
+        if not self._index_is_current(version):
+            infos = await self.db.get_schema_info_async(all_tables)
+            # BM25, FK graph and vector embeddings of the whole schema: CPU work, off the event loop
+            index, graph = await asyncio.to_thread(self._set_index, version, infos)
+
+        short_list = self._short_list(query, index) or self._vector_list(query, all_tables)
+
+        if not short_list and not llm_fallback:
+            return self._with_joins(await self.db.get_schema_info_async(all_tables), graph)
+
+        if not short_list:
+            print(f"DEBUG: Short list empty for '{query}'. Using LLM Guess.")
+            guessed_tables = await self.llm.guess_intent_async(query, all_tables)
+            short_list = [t for t in guessed_tables if t in all_tables]
+
+        if short_list:
+            return self._with_joins(await self.db.get_schema_info_async(graph.connect(short_list)), graph)
+
+        print("DEBUG: Fallback to ALL tables.")
+        return self._with_joins(await self.db.get_schema_info_async(all_tables[:5]), graph)
@@ -0,0 +1,143 @@
+# Service Layer
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from app.domain.models import SchemaInfo
+
+# Business words that never appear in the schema itself -> schema words.
+DEFAULT_SYNONYMS: Dict[str, List[str]] = {
+    "customer": ["users"],
+    "customers": ["users"],
+    "buyer": ["users"],
+    "client": ["users"],
+    "account": ["users"],
+    "revenue": ["orders", "total_amount", "payments", "amount"],
+    "sales": ["orders", "order_items"],
+    "sold": ["order_items", "quantity"],
+    "income": ["payments", "amount"],
+    "purchase": ["orders", "order_items"],
+    "bought": ["orders", "order_items"],
+    "spend": ["orders", "total_amount"],
+    "spent": ["orders", "total_amount"],
+    "stock": ["inventory", "quantity_in_stock"],
+    "item": ["products"],
+    "catalog": ["products", "categories"],
+    "rating": ["reviews"],
+    "rated": ["reviews", "rating"],
+    "feedback": ["reviews", "comment"],
+    "delivery": ["shipments", "carriers"],
+    "shipping": ["shipments", "carriers"],
+    "courier": ["carriers"],
+    "discount": ["coupons", "discount_percent"],
+    "promo": ["coupons"],
+    "favorite": ["wishlists", "wishlist_items"],
+    "favourite": ["wishlists", "wishlist_items"],
+    "bill": ["invoices"],
+    "address": ["user_addresses"],
+    "city": ["user_addresses"],
+    "country": ["user_addresses"],
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "and", "or", "with", "from", "at",
+    "is", "are", "was", "were", "be", "me", "my", "our", "we", "you", "show", "list", "give",
+    "get", "find", "what", "which", "who", "how", "many", "much", "all", "each", "per", "top",
+    "most", "least", "last", "first", "this", "that", "do", "does", "did", "have", "has",
+}
+
+def stem(token: str) -> str:
+    """Tiny plural stemmer: categories -> category, boxes -> box, orders -> order."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ses", "xes", "zes", "ches", "shes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (identifiers are split on "_"); stopwords and bare numbers dropped, stemmed."""
+    return [
+        stem(t) for t in _TOKEN.findall(text.lower().replace("_", " "))
+        if t not in _STOPWORDS and not t.isdigit()
+    ]
+
+class SchemaIndex:
+    """
+    BM25 inverted index with one document per table.
+
+    A table document has three fields scored separately and summed with a
+    weight (a light BM25F): the table name, the column names and short sample
+    values. Scoring the name field on its own keeps "products" ahead of every
+    table that merely has a product_id column. Query terms are expanded with
+    the synonym map first. Built once per schema version; a search is a few
+    dictionary lookups.
+    """
+
+    FIELD_WEIGHTS = {"name": 3.0, "columns": 1.5, "values": 0.5}
+
+    def __init__(self, infos: List[SchemaInfo], synonyms: Optional[Dict[str, List[str]]] = None,
+                 k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.synonyms = {
+            stem(word.lower()): [t for target in targets for t in tokenize(target)]
+            for word, targets in (DEFAULT_SYNONYMS if synonyms is None else synonyms).items()
+        }
+
+        self.tables: List[str] = [info.table_name for info in infos]
+        # field -> term -> [(doc_id, tf)], plus per-field document lengths
+        self._postings: Dict[str, Dict[str, List[Tuple[int, int]]]] = {f: defaultdict(list) for f in self.FIELD_WEIGHTS}
+        self._lengths: Dict[str, List[int]] = {f: [] for f in self.FIELD_WEIGHTS}
+
+        for doc_id, info in enumerate(infos):
+            fields = {
+                "name": tokenize(info.table_name),
+                # columns look like "user_id (INTEGER)"
+                "columns": [t for column in info.columns for t in tokenize(column.split(" (")[0])],
+                "values": [
+                    t for row in info.sample_rows for value in row.values()
+                    if isinstance(value, str) and len(value) <= 40 for t in tokenize(value)
+                ],
+            }
+            for field, tokens in fields.items():
+                self._lengths[field].append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    self._postings[field][term].append((doc_id, tf))
+
+        count = len(self.tables)
+        self._avg_length = {f: (sum(lengths) / count if count else 0.0) or 1.0 for f, lengths in self._lengths.items()}
+        self._idf = {
+            field: {
+                term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for term, postings in postings_by_term.items()
+            }
+            for field, postings_by_term in self._postings.items()
+        }
+
+    def _expand(self, query: str) -> Counter:
+        terms = Counter()
+        for token in tokenize(query):
+            terms[token] += 1
+            for synonym in self.synonyms.get(token, []):
+                terms[synonym] += 1
+        return terms
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Returns up to k (table, score) pairs, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, query_tf in self._expand(query).items():
+            for field, weight in self.FIELD_WEIGHTS.items():
+                postings = self._postings[field].get(term)
+                if not postings:
+                    continue
+                idf = self._idf[field][term]
+                lengths, avg_length = self._lengths[field], self._avg_length[field]
+                for doc_id, tf in postings:
+                    norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / avg_length)
+                    scores[doc_id] += weight * query_tf * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.tables[doc_id], score) for doc_id, score in ranked[:k] if score >= min_score]
@@ -0,0 +1,59 @@
+# Service Layer
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller (leader) starts the work as a separate task; callers that
+    arrive while it runs await the same task and get the same result (or
+    exception). A caller that is cancelled (e.g. its client disconnected) only
+    stops waiting; the shared work is cancelled when nobody is waiting for it
+    anymore. Nothing is kept once the work finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+        # Metrics
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared) where shared is True if another caller's run was reused."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights)
+        }
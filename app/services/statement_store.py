@@ -0,0 +1,47 @@
+# Service Layer
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+@dataclass
+class StoredStatement:
+    """A validated query kept around so later pages can be fetched without the LLM."""
+    query_id: str
+    sql: str
+    columns: List[str]
+    created_at: float
+
+class StatementStore:
+    """
+    In-memory LRU of validated statements, addressed by an opaque query id.
+    Entries expire after `ttl_seconds`. Only SQL that already passed validation
+    is stored, so page requests can execute it directly.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 1800):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, StoredStatement]" = OrderedDict()
+
+    def add(self, sql: str, columns: List[str]) -> str:
+        statement = StoredStatement(query_id=uuid.uuid4().hex, sql=sql, columns=columns, created_at=time.time())
+        with self._lock:
+            self._entries[statement.query_id] = statement
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return statement.query_id
+
+    def get(self, query_id: str) -> Optional[StoredStatement]:
+        with self._lock:
+            statement = self._entries.get(query_id)
+            if statement is None:
+                return None
+            if time.time() - statement.created_at > self.ttl_seconds:
+                del self._entries[query_id]
+                return None
+            self._entries.move_to_end(query_id)
+            return statement
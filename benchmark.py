@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from tabulate import tabulate
+
+# Add current dir to path to find 'app'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ["rag", "generation", "validation", "execution", "chart"]
+
+# One request: question -> (stage timings in seconds, error or None)
+Call = Callable[[str], Awaitable[Tuple[Dict[str, float], Optional[str]]]]
+
+def percentile(values: List[float], p: float) -> float:
+    """Linear interpolation between closest ranks; `values` must be sorted."""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """count, mean, p50/p95/p99 and max, in milliseconds."""
+    values = sorted(s * 1000 for s in seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3)
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_server(args):
+    """
+    Imports server.py configured for an offline run: fake LLM, no API key,
+    and no on-disk side files (generation cache, vector index, workload log)
+    so runs do not influence each other. The result cache is off unless
+    --with-caches is given.
+    """
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "offline",
+        "DB_PATH": args.db,
+        "FAKE_LLM_LATENCY": args.latency,
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_LLM_ANSWERS": args.corpus,
+        "VECTOR_INDEX_PATH": "",
+        "WORKLOAD_LOG_PATH": "",
+    })
+    if not args.with_caches:
+        os.environ.update({"GENERATION_CACHE_PATH": "", "RESULT_CACHE_MB": "0"})
+    import server
+    return server
+
+def pipeline_driver(server) -> Call:
+    async def call(question: str):
+        outcome = await server.pipeline.run(question)
+        return outcome.metadata.get("timings", {}), outcome.error
+    return call
+
+def http_driver(client, result_format: str) -> Call:
+    async def call(question: str):
+        response = await client.post(f"/api/query?format={result_format}", json={"query": question})
+        if response.status_code != 200:
+            return {}, f"HTTP {response.status_code}"
+        data = response.json()
+        return (data.get("metadata") or {}).get("timings", {}), data.get("error")
+    return call
+
+async def drive(call: Call, questions: List[str], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Sends `requests` questions (cycling through the corpus) from `concurrency` workers."""
+    stage_samples: Dict[str, List[float]] = {stage: [] for stage in ["total"] + STAGES}
+    errors: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            question = questions[next_index % len(questions)]
+            next_index += 1
+            t0 = time.perf_counter()
+            try:
+                timings, error = await call(question)
+            except Exception as e:
+                timings, error = {}, f"{type(e).__name__}: {e}"
+            stage_samples["total"].append(time.perf_counter() - t0)
+            for stage in STAGES:
+                if stage in timings:
+                    stage_samples[stage].append(timings[stage])
+            if error:
+                # Group errors by their first line so the report stays short
+                key = error.splitlines()[0][:120]
+                errors[key] = errors.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(requests / seconds, 3) if seconds else None,
+        "latency_ms": {stage: summarize(samples) for stage, samples in stage_samples.items()}
+    }
+
+async def run(args, questions: List[str]) -> Dict[str, Any]:
+    if args.driver == "http" and args.url:
+        # A server started separately, e.g. LLM_BACKEND=fake uvicorn server:server --workers 4
+        server = None
+    else:
+        server = load_server(args)
+
+    if args.driver == "pipeline":
+        call = pipeline_driver(server)
+        client = None
+    else:
+        try:
+            import httpx
+        except ImportError:
+            raise SystemExit("ERROR: the http driver needs httpx (pip install httpx).")
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        else:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.server),
+                                       base_url="http://benchmark", timeout=args.timeout)
+        call = http_driver(client, args.format)
+
+    try:
+        if args.warmup:
+            print(f"[*] Warm-up: {args.warmup} requests")
+            await drive(call, questions, args.warmup, args.concurrency)
+        print(f"[*] Measuring: {args.requests} requests, concurrency {args.concurrency}, driver {args.driver}")
+        return await drive(call, questions, args.requests, args.concurrency)
+    finally:
+        if client is not None:
+            await client.aclose()
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    rows = []
+    for stage, summary in report["latency_ms"].items():
+        if not summary.get("count"):
+            continue
+        row = [stage, summary["count"]] + [f"{summary[p]:.1f}" for p in ("p50", "p95", "p99", "max")]
+        if baseline:
+            before = baseline.get("latency_ms", {}).get(stage, {})
+            row += [f"{(summary[p] / before[p] - 1) * 100:+.1f}%" if before.get(p) else "" for p in ("p50", "p95", "p99")]
+        rows.append(row)
+    headers = ["Stage", "Samples", "p50 ms", "p95 ms", "p99 ms", "max ms"]
+    if baseline:
+        headers += ["Δ p50", "Δ p95", "Δ p99"]
+    print(tabulate(rows, headers=headers, tablefmt="grid"))
+
+    throughput = f"{report['throughput_rps']:.2f} req/s"
+    if baseline and baseline.get("throughput_rps"):
+        throughput += f" ({(report['throughput_rps'] / baseline['throughput_rps'] - 1) * 100:+.1f}%)"
+    print(f"Throughput: {throughput}, {report['errors']} errors in {report['requests']} requests")
+    for kind, count in report["error_kinds"].items():
+        print(f"  {count} x {kind}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark: fake LLM, seeded database, per-stage latency percentiles."
+    )
+    parser.add_argument("--driver", choices=["pipeline", "http"], default="pipeline",
+                        help="call QueryPipeline.run() directly, or POST /api/query")
+    parser.add_argument("--url", default="", help="http driver: base URL of a running server (default: in-process app)")
+    parser.add_argument("--format", choices=["rows", "columnar"], default="rows",
+                        help="http driver: result encoding requested from /api/query")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "data/sqlite.db"), help="seeded database (init_db.py)")
+    parser.add_argument("--corpus", default="benchmarks/questions.json", help="questions with their canned SQL")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--latency", default="lognormal:0.8:0.3",
+                        help="fake LLM latency per call in seconds: 0.8, uniform:A:B, normal:MEAN:SD, "
+                             "lognormal:MEDIAN:SIGMA or exp:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake LLM retryable failure probability")
+    parser.add_argument("--with-caches", action="store_true", help="keep the generation and result caches on")
+    parser.add_argument("--timeout", type=float, default=120.0, help="http driver: per-request timeout (s)")
+    parser.add_argument("--output", default="", help="write the JSON report here")
+    parser.add_argument("--compare", default="", help="previous JSON report to show deltas against")
+    args = parser.parse_args()
+
+    if not (args.driver == "http" and args.url) and not os.path.exists(args.db):
+        print(f"ERROR: Database '{args.db}' not found. Run init_db.py first.")
+        return 1
+    with open(args.corpus) as f:
+        questions = [item["question"] for item in json.load(f)]
+
+    result = asyncio.run(run(args, questions))
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            "driver": args.driver,
+            "url": args.url or None,
+            "format": args.format,
+            "db": args.db,
+            "corpus": args.corpus,
+            "questions": len(questions),
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "with_caches": args.with_caches
+        },
+        **result
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[*] Report written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
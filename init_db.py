@@ -1,10 +1,25 @@
 import sqlite3
 import os
+import argparse
+from dotenv import load_dotenv
 
-DB_PATH = "data/sqlite.db"
+load_dotenv()
+
+# Same setting (and default) as the server
+DB_PATH = os.getenv("DB_PATH", "data/sqlite.db")
+
+parser = argparse.ArgumentParser(description="Create the database from schema.sql and seed it with mock data.")
+parser.add_argument("--scale", type=float, default=1.0,
+                    help="data volume multiplier (1 = 100 users, 100 products, 500 orders)")
+parser.add_argument("--seed", type=int, default=42, help="random seed; the same seed gives the same data")
+parser.add_argument("--workers", type=int, default=None,
+                    help="processes generating rows (default: CPU count; 1 = generate in this process)")
+parser.add_argument("--legacy", action="store_true", help="use the original row-by-row seeder")
+args = parser.parse_args()
 
 # Ensure data directory exists
-os.makedirs("data", exist_ok=True)
+if os.path.dirname(DB_PATH):
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 if os.path.exists(DB_PATH):
     os.remove(DB_PATH)
@@ -20,13 +35,19 @@ try:
 
     # --- Seeding ---
     from app.infrastructure.sqlite_db import SqliteRepository
-    from app.infrastructure.seeder import DataSeeder
 
     print("[*] Starting Database Seeding...")
     repo = SqliteRepository(DB_PATH)
-    seeder = DataSeeder(repo)
-    # Increase seed data significantly as requested
-    seeder.seed_all(num_users=100, num_products=100, num_orders=500)
+    if args.legacy:
+        from app.infrastructure.seeder import DataSeeder
+        seeder = DataSeeder(repo)
+        # Increase seed data significantly as requested
+        seeder.seed_all(num_users=int(100 * args.scale), num_products=int(100 * args.scale),
+                        num_orders=int(500 * args.scale))
+    else:
+        from app.infrastructure.bulk_seeder import BulkSeeder
+        BulkSeeder(repo, seed=args.seed, workers=args.workers).seed_all(scale=args.scale)
+    repo.close()
 
 except Exception as e:
     print(f"Error initializing database: {e}")
@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.infrastructure.sqlite_db import SqliteRepository
 from app.infrastructure.gemini_llm import GeminiService
+from app.infrastructure.resilient_llm import ResilientLLMService
 from app.services.rag_engine import RagEngine
 from app.services.validator import SqlValidator
 from app.domain.models import ExecutionResult
@@ -39,7 +40,8 @@ def main():
     db_repo = SqliteRepository(db_path)
     
     print("[*] Initializing Gemini Service...")
-    llm_service = GeminiService(api_key=api_key)
+    # Retries transient Gemini errors and turns failures into empty results
+    llm_service = ResilientLLMService(GeminiService(api_key=api_key))
     
     print("[*] Initializing Services...")
     rag_engine = RagEngine(db=db_repo, llm=llm_service)
@@ -1,11 +1,14 @@
 import os
 import sys
-import time
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional, Any
 
@@ -14,35 +17,216 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.infrastructure.sqlite_db import SqliteRepository
 from app.infrastructure.gemini_llm import GeminiService
+from app.infrastructure.fake_llm import FakeLLMService, latency_distribution, load_answers
+from app.infrastructure.prompt_builder import SchemaPromptBuilder
+from app.infrastructure.resilient_llm import ResilientLLMService, CircuitBreaker
+from app.infrastructure.generation_cache import GenerationCache, CachingLLMService
+from app.infrastructure.result_cache import ResultCache
+from app.infrastructure.vector_index import VectorIndex
+from app.infrastructure.sqlite_validator import SqliteAuthorizerValidator
+from app.infrastructure.query_planner import QueryPlanner
+from app.infrastructure.workload_log import WorkloadLog
+from app.infrastructure.telemetry import metrics
+from app.infrastructure.response_encoding import encode_columnar, json_bytes, negotiate_encoding, compress
 from app.services.rag_engine import RagEngine
+from app.services.schema_index import DEFAULT_SYNONYMS
 from app.services.validator import SqlValidator
+from app.services.query_pipeline import QueryPipeline
+from app.services.statement_store import StatementStore
+from app.services.chart_recommender import ChartRecommender
+from app.services.single_flight import SingleFlight
+from app.domain.models import QueryOutcome
+from app.domain.exceptions import DatabaseBusyError
 
 load_dotenv()
 
 # --- Config & Dependencies ---
 API_KEY = os.getenv("GOOGLE_API_KEY")
 DB_PATH = os.getenv("DB_PATH", "data/sqlite.db")
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_WORKERS)))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(16 * 1024)))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+DB_MAX_STREAMS = int(os.getenv("DB_MAX_STREAMS", "8"))
+CATALOG_STALENESS = float(os.getenv("CATALOG_STALENESS", "1.0"))
+GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", "data/generation_cache.db")
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "5000"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "500"))
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "1000"))
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "10"))
+CHART_MIN_CONFIDENCE = float(os.getenv("CHART_MIN_CONFIDENCE", "0.7"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "2.0"))
+SCHEMA_SYNONYMS_PATH = os.getenv("SCHEMA_SYNONYMS_PATH", "")
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "data/vector_index")
+VECTOR_MIN_SIMILARITY = float(os.getenv("VECTOR_MIN_SIMILARITY", "0.3"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+PROMPT_MAX_VALUE_CHARS = int(os.getenv("PROMPT_MAX_VALUE_CHARS", "40"))
+LLM_FUSED_MODE = os.getenv("LLM_FUSED_MODE", "0").lower() in ("1", "true", "yes")
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "1").lower() in ("1", "true", "yes")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+BATCH_DB_CONCURRENCY = int(os.getenv("BATCH_DB_CONCURRENCY", str(DB_WORKERS)))
+VALIDATOR_MODE = os.getenv("VALIDATOR_MODE", "sqlparse").lower()
+PLAN_MAX_COST = float(os.getenv("PLAN_MAX_COST", "10000000"))
+PLAN_COST_ACTION = os.getenv("PLAN_COST_ACTION", "cap").lower()
+PLAN_CAPPED_TIMEOUT = float(os.getenv("PLAN_CAPPED_TIMEOUT", "2"))
+WORKLOAD_LOG_PATH = os.getenv("WORKLOAD_LOG_PATH", "data/workload.db")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:0.8:0.3")
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_ANSWERS = os.getenv("FAKE_LLM_ANSWERS", "benchmarks/questions.json")
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_SHARE_INTERVAL = float(os.getenv("METRICS_SHARE_INTERVAL", "5"))
+RESPONSE_TIMINGS = os.getenv("RESPONSE_TIMINGS", "0").lower() in ("1", "true", "yes")
+RESULT_FORMAT = os.getenv("RESULT_FORMAT", "rows").lower()
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "1").lower() in ("1", "true", "yes")
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "1"))
+DISCONNECT_POLL_INTERVAL = 0.5
+# Bodies above this size are compressed off the event loop
+COMPRESS_IN_THREAD_BYTES = 256 * 1024
+RESULT_FORMATS = ("rows", "columnar")
 
-if not API_KEY:
+if LLM_BACKEND != "fake" and not API_KEY:
     print("ERROR: GOOGLE_API_KEY not set.")
     sys.exit(1)
 
-server = FastAPI(title="Text-to-SQL API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Questions remembered since the last save (waits for the background writer)
+    if vector_index:
+        await asyncio.to_thread(vector_index.close)
+
+server = FastAPI(title="Text-to-SQL API", lifespan=lifespan)
 
 # Mount Static Files
 server.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 # Initialize Services
-db_repo = SqliteRepository(DB_PATH)
-llm_service = GeminiService(api_key=API_KEY)
-rag_engine = RagEngine(db=db_repo, llm=llm_service)
-validator = SqlValidator()
+workload_log = WorkloadLog(WORKLOAD_LOG_PATH) if WORKLOAD_LOG_PATH else None
+result_cache = ResultCache(max_bytes=int(RESULT_CACHE_MB * 1024 * 1024)) if RESULT_CACHE_MB > 0 else None
+db_repo = SqliteRepository(
+    DB_PATH,
+    max_workers=DB_WORKERS,
+    pool_size=DB_POOL_SIZE,
+    mmap_size=DB_MMAP_SIZE,
+    cache_size_kib=DB_CACHE_SIZE_KB,
+    acquire_timeout=DB_ACQUIRE_TIMEOUT or None,
+    max_streams=DB_MAX_STREAMS,
+    catalog_staleness=CATALOG_STALENESS,
+    result_cache=result_cache,
+    query_timeout=QUERY_TIMEOUT or None,
+    planner=QueryPlanner(),
+    max_plan_cost=PLAN_MAX_COST or None,
+    plan_action=PLAN_COST_ACTION,
+    capped_timeout=PLAN_CAPPED_TIMEOUT,
+    workload=workload_log
+)
+if LLM_BACKEND == "fake":
+    # Offline runs (benchmark.py): canned SQL and sampled latencies, no network
+    print(f"WARNING: LLM_BACKEND=fake, answers are canned (latency {FAKE_LLM_LATENCY}s)")
+    llm_service = FakeLLMService(
+        latency=latency_distribution(FAKE_LLM_LATENCY, seed=0),
+        error_rate=FAKE_LLM_ERROR_RATE,
+        seed=0,
+        answers=load_answers(FAKE_LLM_ANSWERS) if FAKE_LLM_ANSWERS and os.path.exists(FAKE_LLM_ANSWERS) else None
+    )
+else:
+    llm_service = GeminiService(
+        api_key=API_KEY,
+        prompt_builder=SchemaPromptBuilder(token_budget=PROMPT_TOKEN_BUDGET, max_value_chars=PROMPT_MAX_VALUE_CHARS)
+    )
+resilient_llm = ResilientLLMService(
+    llm_service,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    requests_per_second=LLM_REQUESTS_PER_SECOND or None,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE or None,
+    max_retries=LLM_MAX_RETRIES,
+    timeout=LLM_TIMEOUT,
+    breaker=CircuitBreaker(failure_threshold=LLM_BREAKER_THRESHOLD, reset_timeout=LLM_BREAKER_RESET)
+)
+llm_service = resilient_llm
+generation_cache = None
+if GENERATION_CACHE_PATH:
+    generation_cache = GenerationCache(
+        GENERATION_CACHE_PATH,
+        max_entries=GENERATION_CACHE_MAX_ENTRIES,
+        ttl_seconds=GENERATION_CACHE_TTL
+    )
+    llm_service = CachingLLMService(llm_service, generation_cache)
+synonyms = dict(DEFAULT_SYNONYMS)
+if SCHEMA_SYNONYMS_PATH:
+    with open(SCHEMA_SYNONYMS_PATH) as f:
+        synonyms.update(json.load(f))
+vector_index = VectorIndex(VECTOR_INDEX_PATH) if VECTOR_INDEX_PATH else None
+rag_engine = RagEngine(
+    db=db_repo,
+    llm=llm_service,
+    synonyms=synonyms,
+    top_k=RAG_TOP_K,
+    min_score=RAG_MIN_SCORE,
+    vector_index=vector_index,
+    vector_min_similarity=VECTOR_MIN_SIMILARITY
+)
+if VALIDATOR_MODE == "authorizer":
+    validator = SqliteAuthorizerValidator(db_repo.pool.open_connection, db_repo)
+else:
+    validator = SqlValidator()
+statement_store = StatementStore()
+single_flight = SingleFlight() if QUERY_COALESCING else None
+pipeline = QueryPipeline(
+    rag=rag_engine,
+    llm=llm_service,
+    validator=validator,
+    db=db_repo,
+    max_rows=MAX_RESULT_ROWS or None,
+    statements=statement_store,
+    chart_recommender=ChartRecommender(),
+    chart_min_confidence=CHART_MIN_CONFIDENCE,
+    fused=LLM_FUSED_MODE,
+    single_flight=single_flight
+)
+
+# Counters the components already keep, read when /metrics is scraped
+metrics.add_stats("texttosql_db_pool", lambda: asdict(db_repo.pool_stats()), counters=["checkouts", "waits", "wait_seconds", "timeouts", "stream_rejections"],
+                  gauges=["size", "open_connections", "in_use", "streams"], help="SQLite read pool")
+metrics.add_stats("texttosql_llm", resilient_llm.stats,
+                  counters=["calls", "retries", "timeouts", "failures", "rejected"], gauges=["in_flight"],
+                  help="LLM calls through the resilience layer")
+if generation_cache:
+    metrics.add_stats("texttosql_generation_cache", generation_cache.stats, counters=["hits", "misses"],
+                      help="SQL generation cache")
+if result_cache:
+    metrics.add_stats("texttosql_result_cache", result_cache.stats,
+                      counters=["hits", "misses", "evictions", "invalidations"], gauges=["entries", "bytes"],
+                      help="Query result cache")
+if single_flight:
+    metrics.add_stats("texttosql_single_flight", single_flight.stats, counters=["executions", "coalesced"],
+                      help="Coalesced identical questions")
+if METRICS_DIR:
+    # Several uvicorn workers: each shares its snapshot, any of them answers /metrics for all
+    metrics.share(METRICS_DIR, METRICS_SHARE_INTERVAL)
 
 # --- Pydantic Models ---
 class QueryRequest(BaseModel):
     query: str
 
+class BatchRequest(BaseModel):
+    questions: List[str]
+
 class QueryResponse(BaseModel):
     context: List[dict]
     sql: Optional[str] = None
@@ -50,6 +234,85 @@ class QueryResponse(BaseModel):
     results: Optional[dict] = None
     chart_config: Optional[dict] = None
     error: Optional[str] = None
+    metadata: Optional[dict] = None
+    truncated: bool = False
+    query_id: Optional[str] = None
+    plan: Optional[dict] = None
+    timings: Optional[List[dict]] = None
+
+class PageResponse(BaseModel):
+    query_id: str
+    columns: List[str]
+    rows: Optional[List[Any]] = None
+    offset: int
+    limit: int
+    has_more: bool
+    results: Optional[dict] = None
+
+def response_metadata(outcome: QueryOutcome) -> dict:
+    return {**outcome.metadata, **cache_counters()}
+
+def cache_counters() -> dict:
+    metadata = {}
+    if generation_cache:
+        metadata["generation_cache"] = generation_cache.stats()
+    if result_cache:
+        cache_stats = result_cache.stats()
+        metadata["result_cache"] = {"hits": cache_stats["hits"], "misses": cache_stats["misses"]}
+    return metadata
+
+def context_payload(context_infos) -> List[dict]:
+    return [
+        {"table": info.table_name, "columns": info.columns}
+        for info in context_infos
+    ]
+
+def results_payload(columns: List[str], rows: List[Any], result_format: str = "rows") -> dict:
+    """Row-major {"columns", "rows"}, or the columnar encoding (type tags, dictionary-encoded strings)."""
+    if result_format == "columnar":
+        return encode_columnar(columns, rows)
+    return {"columns": columns, "rows": rows}
+
+def check_format(result_format: str):
+    if result_format not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(RESULT_FORMATS)}")
+
+async def json_response(payload: dict, http_request: Request) -> Response:
+    """
+    Serializes with the fast JSON encoder and compresses with the best coding
+    the client accepts (brotli, gzip). Bypasses Pydantic's serializer, which
+    dominates the response time of large results.
+    """
+    body = json_bytes(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if RESPONSE_COMPRESSION and len(body) >= RESPONSE_COMPRESSION_MIN_BYTES:
+        coding = negotiate_encoding(http_request.headers.get("accept-encoding", ""))
+        if coding:
+            if len(body) >= COMPRESS_IN_THREAD_BYTES:
+                body = await asyncio.to_thread(compress, body, coding, RESPONSE_GZIP_LEVEL)
+            else:
+                body = compress(body, coding, RESPONSE_GZIP_LEVEL)
+            headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def to_response(outcome: QueryOutcome, timings: bool = False, include_results: bool = True) -> QueryResponse:
+    results = None
+    if include_results and outcome.execution and outcome.execution.success:
+        results = results_payload(outcome.execution.columns, outcome.execution.rows)
+
+    return QueryResponse(
+        context=context_payload(outcome.context),
+        sql=outcome.sql,
+        explanation=outcome.explanation,
+        results=results,
+        chart_config=outcome.chart_config,
+        error=outcome.error,
+        metadata=response_metadata(outcome),
+        truncated=bool(outcome.execution and outcome.execution.truncated),
+        query_id=outcome.query_id,
+        plan=asdict(outcome.plan) if outcome.plan else None,
+        timings=outcome.spans if timings else None
+    )
 
 # --- Routes ---
 
@@ -59,97 +322,207 @@ async def read_root(request: Request):
 
 @server.get("/favicon.ico")
 async def favicon():
-    from fastapi import Response
     return Response(status_code=204)  # No Content
 
+@server.get("/api/stats")
+async def stats():
+    """Runtime counters for capacity planning."""
+    return {
+        "db_pool": asdict(db_repo.pool_stats()),
+        "schema_catalog": {
+            "schema_loads": db_repo.catalog.schema_loads,
+            "sample_loads": db_repo.catalog.sample_loads
+        },
+        "generation_cache": generation_cache.stats() if generation_cache else None,
+        "result_cache": result_cache.stats() if result_cache else None,
+        "vector_index": vector_index.stats() if vector_index else None,
+        "single_flight": single_flight.stats() if single_flight else None,
+        "validator": validator.stats() if hasattr(validator, "stats") else None,
+        "workload": workload_log.stats() if workload_log else None,
+        "llm": resilient_llm.stats()
+    }
+
+@server.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def cancel_on_disconnect(http_request: Request, coro):
+    """
+    Runs the coroutine while polling the client connection. If the client goes
+    away, the task is cancelled: pending LLM calls are dropped and running SQL
+    is interrupted through the repository's cancel event.
+    """
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print("[Log] Client disconnected. Cancelling query.")
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
 @server.post("/api/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request, timings: bool = RESPONSE_TIMINGS,
+                        result_format: str = Query(RESULT_FORMAT, alias="format")):
+    """
+    `?timings=true` adds the span breakdown of this request (start and duration
+    of each stage and LLM call). `?format=columnar` returns `results` column by
+    column, with type tags and dictionary-encoded strings.
+    """
     user_query = request.query
     
     if not user_query:
         raise HTTPException(status_code=400, detail="Query is required")
+    check_format(result_format)
 
     try:
-        start_time = time.time()
-        
-        # A. RAG - Get Context
-        t0 = time.time()
-        context_infos = rag_engine.get_context(user_query)
-        print(f"[Log] RAG Context: {time.time() - t0:.2f}s")
-        
-        context_data = [
-            {"table": info.table_name, "columns": info.columns} 
-            for info in context_infos
-        ]
-
-        # B. LLM - Generate SQL
-        t1 = time.time()
-        sql_result = llm_service.generate_sql(user_query, context_infos)
-        print(f"[Log] SQL Gen: {time.time() - t1:.2f}s")
-        
-        if not sql_result.sql:
-            return QueryResponse(
-                context=context_data,
-                sql=None,
-                error=f"Failed to generate SQL: {sql_result.error_message}"
-            )
-
-        # C. Validation
-        validation = validator.validate(sql_result.sql)
-        if not validation.is_valid:
-             return QueryResponse(
-                context=context_data,
-                sql=sql_result.sql,
-                error=f"Validation Failed: {validation.error}"
-            )
-        
-        if not sql_result.is_safe:
-             return QueryResponse(
-                context=context_data,
-                sql=sql_result.sql,
-                error="Query identified as unsafe (Modification detected)."
-            )
-
-        # D. Execution
-        t2 = time.time()
-        exec_result = db_repo.execute_query(sql_result.sql)
-        print(f"[Log] DB Exec: {time.time() - t2:.2f}s")
-        
-        if not exec_result.success:
-            return QueryResponse(
-                context=context_data,
-                sql=sql_result.sql,
-                explanation=sql_result.explanation,
-                error=exec_result.error
-            )
-
-        
-        # E. Chart Suggestion
-        chart_config = None
-        if exec_result.success and exec_result.columns and exec_result.rows:
-            # Only ask for chart if we have data
-            t3 = time.time()
-            chart_config = llm_service.suggest_chart(user_query, exec_result.columns)
-            print(f"[Log] Chart Gen: {time.time() - t3:.2f}s")
-
-        total_time = time.time() - start_time
-        print(f"[Log] Total Process: {total_time:.2f}s")
-        
-        return QueryResponse(
-            context=context_data,
-            sql=sql_result.sql,
-            explanation=sql_result.explanation,
-            results={
-                "columns": exec_result.columns,
-                "rows": exec_result.rows
-            },
-            chart_config=chart_config
-        )
+        outcome = await cancel_on_disconnect(http_request, pipeline.run(user_query))
+        if outcome is None:
+            # Nobody is listening anymore
+            return Response(status_code=499)
+        payload = to_response(outcome, timings, include_results=False).model_dump()
+        if outcome.execution and outcome.execution.success:
+            payload["results"] = results_payload(outcome.execution.columns, outcome.execution.rows, result_format)
+        return await json_response(payload, http_request)
 
+    except DatabaseBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Server Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@server.get("/api/query/{query_id}/page", response_model=PageResponse)
+async def fetch_page(query_id: str, http_request: Request, offset: int = 0, limit: Optional[int] = None,
+                     result_format: str = Query(RESULT_FORMAT, alias="format")):
+    """
+    Next rows of a truncated result. Re-runs the stored SQL; the LLM is not called.
+    With `?format=columnar` the rows come in `results` (columnar) instead of `rows`.
+    """
+    limit = min(limit or MAX_RESULT_ROWS, MAX_RESULT_ROWS) if MAX_RESULT_ROWS else (limit or 1000)
+    if offset < 0 or limit <= 0:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit > 0")
+    check_format(result_format)
+
+    try:
+        page = await pipeline.fetch_page(query_id, offset, limit)
+    except DatabaseBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired query id")
+    if not page.success:
+        raise HTTPException(status_code=500, detail=page.error)
+
+    payload = PageResponse(
+        query_id=query_id,
+        columns=page.columns,
+        offset=offset,
+        limit=limit,
+        has_more=page.truncated
+    ).model_dump()
+    if result_format == "columnar":
+        payload["results"] = results_payload(page.columns, page.rows, result_format)
+    else:
+        payload["rows"] = page.rows
+    return await json_response(payload, http_request)
+
+def stream_payload(event: str, payload: Any) -> Any:
+    """Converts a pipeline event payload into JSON-friendly data."""
+    if event == "context":
+        return context_payload(payload)
+    if event == "sql":
+        return {"sql": payload.sql or None, "explanation": payload.explanation}
+    if event == "plan":
+        return asdict(payload)
+    if event == "done":
+        return {**payload, "metadata": {**payload["metadata"], **cache_counters()}}
+    return payload
+
+def format_event(event: str, data: Any, sse: bool) -> str:
+    if sse:
+        return f"event: {event}\ndata: {json_bytes(data).decode()}\n\n"
+    return json_bytes({"event": event, "data": data}).decode() + "\n"
+
+@server.post("/api/query/stream")
+async def stream_query(request: QueryRequest, http_request: Request):
+    """
+    Streams the pipeline as it progresses: context, sql, columns, rows (in
+    chunks), chart, done. NDJSON by default; Server-Sent Events when the
+    client sends `Accept: text/event-stream`.
+    """
+    user_query = request.query
+
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Query is required")
+    # Refuse up front while the status can still be set; a stream that loses
+    # the last slot to another request ends with an error event instead
+    if db_repo.pool.stream_capacity() <= 0:
+        raise HTTPException(status_code=503, detail="Too many open result streams")
+
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def events():
+        try:
+            async for event, payload in pipeline.stream(user_query, chunk_size=STREAM_CHUNK_SIZE):
+                yield format_event(event, stream_payload(event, payload), sse)
+        except Exception as e:
+            print(f"Server Error: {e}")
+            yield format_event("error", str(e), sse)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+@server.post("/api/query/batch")
+async def batch_query(request: BatchRequest, http_request: Request):
+    """
+    Runs a list of questions and streams one "item" event per question as it
+    finishes (index, question, seconds, result), then a "done" summary.
+    Repeated questions are answered once. NDJSON, or SSE with
+    `Accept: text/event-stream`.
+    """
+    questions = [q for q in request.questions if q and q.strip()]
+    if not questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def events():
+        failed = 0
+        unique = 0
+        seconds = 0.0
+        try:
+            async for item in pipeline.run_batch(questions, BATCH_LLM_CONCURRENCY, BATCH_DB_CONCURRENCY):
+                failed += 1 if item.outcome.error else 0
+                unique += 0 if item.duplicate else 1
+                seconds = item.finished_at
+                yield format_event("item", {
+                    "index": item.index,
+                    "question": item.question,
+                    "duplicate": item.duplicate,
+                    "seconds": round(item.seconds, 3),
+                    "finished_at": round(item.finished_at, 3),
+                    "result": to_response(item.outcome).model_dump()
+                }, sse)
+            yield format_event("done", {
+                "count": len(questions),
+                "unique": unique,
+                "failed": failed,
+                "seconds": round(seconds, 3)
+            }, sse)
+        except Exception as e:
+            print(f"Server Error: {e}")
+            yield format_event("error", str(e), sse)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(server, host="0.0.0.0", port=8000)
@@ -1,4 +1,6 @@
 let currentChart = null;
+let currentQueryId = null;
+let loadedRows = 0;
 
 async function sendQuery() {
     const input = document.getElementById("userQuery");
@@ -17,15 +19,19 @@ async function sendQuery() {
     document.getElementById("tableBody").innerHTML = "";
     document.getElementById("sqlOutput").textContent = "";
     document.getElementById("explanation").textContent = "";
+    document.getElementById("tableFooter").classList.add("hidden");
+    currentQueryId = null;
+    loadedRows = 0;
 
     try {
-        const response = await fetch("/api/query", {
+        const response = await fetch("/api/query?format=columnar", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ query: query })
         });
 
         const data = await response.json();
+        data.results = decodeResults(data.results);
         
         document.getElementById("loading").classList.add("hidden");
         document.getElementById("resultsArea").classList.remove("hidden");
@@ -65,16 +71,11 @@ async function sendQuery() {
             thead.appendChild(headerRow);
 
             // Body
-            const tbody = document.getElementById("tableBody");
-            data.results.rows.forEach(row => {
-                const tr = document.createElement("tr");
-                row.forEach(cell => {
-                    const td = document.createElement("td");
-                    td.textContent = cell;
-                    tr.appendChild(td);
-                });
-                tbody.appendChild(tr);
-            });
+            appendRows(data.results.rows);
+
+            // Server capped the result: offer the next pages
+            currentQueryId = data.truncated ? data.query_id : null;
+            updateTableFooter(data.truncated);
         }
 
         // 5. Render Chart
@@ -91,6 +92,64 @@ async function sendQuery() {
     }
 }
 
+// Columnar results (?format=columnar) back to {columns, rows}
+function decodeResults(results) {
+    if (!results || results.format !== "columnar") return results;
+    const data = results.columns.map(col =>
+        col.type === "dict" ? col.codes.map(code => col.values[code]) : col.data
+    );
+    const rows = new Array(results.row_count);
+    for (let i = 0; i < results.row_count; i++) {
+        rows[i] = data.map(values => values[i]);
+    }
+    return { columns: results.columns.map(col => col.name), rows: rows };
+}
+
+function appendRows(rows) {
+    const tbody = document.getElementById("tableBody");
+    const fragment = document.createDocumentFragment();
+    rows.forEach(row => {
+        const tr = document.createElement("tr");
+        row.forEach(cell => {
+            const td = document.createElement("td");
+            td.textContent = cell;
+            tr.appendChild(td);
+        });
+        fragment.appendChild(tr);
+    });
+    tbody.appendChild(fragment);
+    loadedRows += rows.length;
+}
+
+function updateTableFooter(hasMore) {
+    const footer = document.getElementById("tableFooter");
+    document.getElementById("rowCount").textContent = `Showing ${loadedRows} rows${hasMore ? " (more available)" : ""}`;
+    document.getElementById("loadMoreBtn").classList.toggle("hidden", !hasMore || !currentQueryId);
+    footer.classList.toggle("hidden", !hasMore && loadedRows === 0);
+}
+
+async function loadMoreRows() {
+    if (!currentQueryId) return;
+    const btn = document.getElementById("loadMoreBtn");
+    btn.disabled = true;
+    try {
+        const response = await fetch(`/api/query/${currentQueryId}/page?offset=${loadedRows}&format=columnar`);
+        if (!response.ok) {
+            throw new Error((await response.json()).detail || response.status);
+        }
+        const page = await response.json();
+        appendRows(page.results ? decodeResults(page.results).rows : page.rows);
+        if (!page.has_more) currentQueryId = null;
+        updateTableFooter(page.has_more);
+    } catch (e) {
+        const errEl = document.getElementById("errorMsg");
+        errEl.textContent = "Could not load more rows: " + e.message;
+        errEl.classList.remove("hidden");
+    } finally {
+        btn.disabled = false;
+    }
+}
+
 function formatSQL(sql) {
     if (!sql) return null;
     return sql.replace(/\s+/g, " ").trim();
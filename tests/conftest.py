@@ -0,0 +1,33 @@
+import os
+import sys
+import sqlite3
+from typing import List
+import pytest
+
+# Add the project root to path to find 'app'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from app.domain.interfaces import IRagEngine, IDatabase
+from app.domain.models import SchemaInfo
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """A fresh database built from schema.sql (with its small seed data)."""
+    path = str(tmp_path / "sqlite.db")
+    conn = sqlite3.connect(path)
+    with open(os.path.join(ROOT, "schema.sql")) as f:
+        conn.executescript(f.read())
+    conn.commit()
+    conn.close()
+    return path
+
+class StaticRag(IRagEngine):
+    """Always returns the same tables as context."""
+
+    def __init__(self, db: IDatabase, tables: List[str]):
+        self.db = db
+        self.tables = tables
+
+    def get_context(self, query: str, llm_fallback: bool = True) -> List[SchemaInfo]:
+        return self.db.get_schema_info(self.tables)
@@ -0,0 +1,47 @@
+import asyncio
+from conftest import StaticRag
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.query_pipeline import QueryPipeline
+from app.services.validator import SqlValidator
+
+class SlowQuestionLLM(FakeLLMService):
+    """Fake LLM that takes longer on questions that mention "slow"."""
+
+    async def generate_sql_async(self, query, context):
+        if "slow" in query:
+            await asyncio.sleep(0.1)
+        return await super().generate_sql_async(query, context)
+
+def run_batch(db_path, llm, questions, **limits):
+    db = SqliteRepository(db_path, max_workers=2)
+    pipeline = QueryPipeline(rag=StaticRag(db, ["products"]), llm=llm, validator=SqlValidator(), db=db)
+
+    async def collect():
+        return [item async for item in pipeline.run_batch(questions, **limits)]
+
+    try:
+        return asyncio.run(collect())
+    finally:
+        db.close()
+
+def test_duplicates_reuse_the_first_outcome(db_path):
+    llm = FakeLLMService(latency=0)
+    questions = ["List products", "top products", "  list PRODUCTS", "list products"]
+    items = run_batch(db_path, llm, questions)
+
+    assert sorted(item.index for item in items) == [0, 1, 2, 3]
+    by_index = {item.index: item for item in items}
+    assert [by_index[i].duplicate for i in range(4)] == [False, False, True, True]
+    assert by_index[2].outcome is by_index[0].outcome and by_index[2].question == "  list PRODUCTS"
+    # Two distinct questions: one generation and one chart call each
+    assert llm.calls == 4
+
+def test_items_arrive_in_completion_order(db_path):
+    llm = SlowQuestionLLM(latency=0)
+    items = run_batch(db_path, llm, ["slow products", "fast products", "products again"])
+
+    assert [item.index for item in items][-1] == 0
+    assert all(not item.outcome.error for item in items)
+    assert items[0].finished_at <= items[-1].finished_at
+    assert items[-1].seconds >= 0.1
@@ -0,0 +1,50 @@
+import shutil
+import sqlite3
+from app.infrastructure.bulk_seeder import TABLE_COLUMNS, BulkSeeder
+from app.infrastructure.sqlite_db import SqliteRepository
+
+def seed(db_path, **kwargs):
+    db = SqliteRepository(db_path, max_workers=1)
+    try:
+        BulkSeeder(db, seed=7, chunk_size=20, **kwargs).seed_all(scale=0.5)
+    finally:
+        db.close()
+
+def dump(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall() for table in TABLE_COLUMNS}
+    finally:
+        conn.close()
+
+def copy_of(db_path, tmp_path, name):
+    path = str(tmp_path / name)
+    shutil.copy(db_path, path)
+    return path
+
+def test_seeding_adds_the_scaled_volume_with_valid_keys(db_path):
+    before = dump(db_path)
+    seed(db_path, workers=1)
+    after = dump(db_path)
+
+    assert len(after["users"]) - len(before["users"]) == 50
+    assert len(after["products"]) - len(before["products"]) == 50
+    assert len(after["orders"]) - len(before["orders"]) == 250
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    finally:
+        conn.close()
+
+def test_same_seed_gives_the_same_database(db_path, tmp_path):
+    other = copy_of(db_path, tmp_path, "other.db")
+    seed(db_path, workers=1)
+    seed(other, workers=1)
+    assert dump(db_path) == dump(other)
+
+def test_output_does_not_depend_on_the_worker_count(db_path, tmp_path):
+    parallel = copy_of(db_path, tmp_path, "parallel.db")
+    seed(db_path, workers=1)
+    # A short queue keeps the writer waiting on the workers between shards
+    seed(parallel, workers=3, queue_size=2)
+    assert dump(db_path) == dump(parallel)
@@ -0,0 +1,52 @@
+import asyncio
+from conftest import StaticRag
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.chart_recommender import ChartRecommender
+from app.services.query_pipeline import QueryPipeline
+from app.services.validator import SqlValidator
+
+recommender = ChartRecommender()
+
+def test_time_series_gets_a_line_chart():
+    rows = [("2024-01", 10), ("2024-02", 12), ("2024-03", 9)]
+    pick = recommender.recommend("revenue per month", ["month", "revenue"], rows)
+    assert pick.config["chart_type"] == "line" and pick.config["x_column"] == "month"
+    assert pick.confidence >= 0.9
+
+def test_categories_get_a_bar_chart_or_a_pie_for_shares():
+    rows = [("books", 5), ("toys", 3), ("sports", 2)]
+    bar = recommender.recommend("orders per category", ["category", "orders"], rows)
+    assert bar.config["chart_type"] == "bar" and bar.config["y_columns"] == ["orders"]
+    pie = recommender.recommend("share of orders per category", ["category", "orders"], rows)
+    assert pie.config["chart_type"] == "pie"
+
+def test_unusual_shapes_get_a_low_confidence():
+    rows = [(f"sku {i}", i) for i in range(200)]
+    assert recommender.recommend("price per sku", ["sku", "price"], rows).confidence < 0.7
+    # A single value is better shown as a table, and that is a confident call
+    single = recommender.recommend("how many orders", ["count"], [(42,)])
+    assert single.config is None and single.confidence >= 0.7
+
+def run_pipeline(db_path, sql):
+    db = SqliteRepository(db_path, max_workers=1)
+    llm = FakeLLMService(latency=0, answers={"chart it": sql})
+    pipeline = QueryPipeline(rag=StaticRag(db, ["products"]), llm=llm, validator=SqlValidator(), db=db,
+                             chart_recommender=ChartRecommender(), chart_min_confidence=0.7)
+    try:
+        return asyncio.run(pipeline.run("chart it")), llm
+    finally:
+        db.close()
+
+def test_confident_pick_skips_the_llm(db_path):
+    outcome, llm = run_pipeline(db_path, "SELECT title, price FROM products")
+    assert outcome.metadata["chart_source"] == "heuristic"
+    assert outcome.chart_config["chart_type"] == "bar"
+    # generate_sql only
+    assert llm.calls == 1
+
+def test_unsure_pick_falls_back_to_the_llm(db_path):
+    # Every title repeats: the heuristic cannot tell how to aggregate
+    outcome, llm = run_pipeline(db_path, "SELECT a.title, a.price FROM products a, products b")
+    assert outcome.metadata["chart_source"] == "llm"
+    assert llm.calls == 2
@@ -0,0 +1,58 @@
+import asyncio
+from conftest import StaticRag
+from app.domain.models import FusedGeneration
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.query_pipeline import QueryPipeline
+from app.services.rag_engine import RagEngine
+from app.services.validator import SqlValidator
+
+SQL = "SELECT title, price FROM products"
+
+class HintingFakeLLM(FakeLLMService):
+    """Fake LLM whose fused call also proposes a fixed chart."""
+
+    def __init__(self, hint, **kwargs):
+        super().__init__(latency=0, answers={"chart it": SQL}, **kwargs)
+        self.hint = hint
+
+    async def generate_fused_async(self, query, context):
+        fused = await super().generate_fused_async(query, context)
+        return FusedGeneration(tables=fused.tables, generation=fused.generation, chart_hint=self.hint)
+
+def run_fused(db_path, llm, rag=None):
+    db = SqliteRepository(db_path, max_workers=1)
+    pipeline = QueryPipeline(rag=rag(db) if rag else StaticRag(db, ["products"]), llm=llm,
+                             validator=SqlValidator(), db=db, fused=True)
+    try:
+        return asyncio.run(pipeline.run("chart it"))
+    finally:
+        db.close()
+
+def test_matching_hint_is_used_without_a_chart_call(db_path):
+    hint = {"chart_type": "bar", "title": "Prices", "x_column": "title", "y_columns": ["price"]}
+    llm = HintingFakeLLM(hint)
+    outcome = run_fused(db_path, llm)
+    assert outcome.metadata["chart_source"] == "fused" and outcome.chart_config == hint
+    assert llm.calls == 1
+
+def test_table_hint_means_no_chart(db_path):
+    llm = HintingFakeLLM({"chart_type": "none"})
+    outcome = run_fused(db_path, llm)
+    assert outcome.metadata["chart_source"] == "fused" and outcome.chart_config is None
+    assert llm.calls == 1
+
+def test_hint_on_unknown_columns_falls_back_to_the_chart_call(db_path):
+    llm = HintingFakeLLM({"chart_type": "line", "x_column": "month", "y_columns": ["revenue"]})
+    outcome = run_fused(db_path, llm)
+    assert outcome.metadata["chart_source"] == "llm"
+    assert outcome.chart_config["x_column"] == "title"
+    assert llm.calls == 2
+
+def test_fused_mode_skips_the_table_guess(db_path):
+    # Nothing in the schema matches the question: without fused mode the
+    # RAG engine would ask the LLM to guess tables first
+    llm = FakeLLMService(latency=0, answers={"chart it": SQL})
+    outcome = run_fused(db_path, llm, rag=lambda db: RagEngine(db, llm))
+    assert not outcome.error
+    assert llm.calls == 2  # fused generation + chart, no guess_intent
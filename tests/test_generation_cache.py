@@ -0,0 +1,44 @@
+import asyncio
+from conftest import StaticRag
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.generation_cache import GenerationCache, CachingLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.query_pipeline import QueryPipeline
+from app.services.validator import SqlValidator
+
+QUESTION = "List the products"
+
+def make_pipeline(db_path, tmp_path, sql):
+    db = SqliteRepository(db_path)
+    inner = FakeLLMService(latency=0, answers={QUESTION.lower(): sql})
+    llm = CachingLLMService(inner, GenerationCache(str(tmp_path / "generation_cache.db")))
+    pipeline = QueryPipeline(rag=StaticRag(db, ["products"]), llm=llm, validator=SqlValidator(), db=db)
+    return pipeline, inner, db
+
+def test_sql_failing_in_sqlite_is_not_replayed(db_path, tmp_path):
+    pipeline, inner, db = make_pipeline(db_path, tmp_path, "SELECT no_such_column FROM products")
+    try:
+        first = asyncio.run(pipeline.run(QUESTION))
+        assert first.error
+
+        # The model gets it right on the next attempt: it must be asked again
+        inner.answers[QUESTION.lower()] = "SELECT title FROM products"
+        second = asyncio.run(pipeline.run(QUESTION))
+        assert second.error is None
+        assert not second.metadata["sql_cached"]
+
+        # Only the working SQL is cached
+        third = asyncio.run(pipeline.run(QUESTION))
+        assert third.metadata["sql_cached"]
+        assert third.sql == "SELECT title FROM products"
+    finally:
+        db.close()
+
+def test_sql_rejected_by_validator_is_not_cached(db_path, tmp_path):
+    pipeline, inner, db = make_pipeline(db_path, tmp_path, "DELETE FROM products")
+    try:
+        assert asyncio.run(pipeline.run(QUESTION)).error
+        assert asyncio.run(pipeline.run(QUESTION)).error
+        assert inner.calls == 2
+    finally:
+        db.close()
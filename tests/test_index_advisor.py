@@ -0,0 +1,65 @@
+import sqlite3
+import pytest
+from app.infrastructure.index_advisor import IndexAdvisor
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.infrastructure.workload_log import WorkloadLog
+
+LOOKUP = "SELECT rating FROM reviews WHERE product_id = 3"
+
+@pytest.fixture
+def big_db(db_path):
+    """The seed database with enough reviews for a full scan to hurt."""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO reviews (product_id, user_id, rating, comment) VALUES (?, ?, ?, ?)",
+        [(i % 200 + 1, 1, i % 5 + 1, "ok") for i in range(20000)]
+    )
+    conn.commit()
+    conn.close()
+    return db_path
+
+def recorded_workload(db_path, tmp_path, statements):
+    log = WorkloadLog(str(tmp_path / "workload.db"))
+    db = SqliteRepository(db_path, max_workers=1, workload=log)
+    try:
+        for sql, runs in statements:
+            for _ in range(runs):
+                assert db.execute_query(sql).success
+        return log.entries()
+    finally:
+        db.close()
+        log.close()
+
+def test_workload_is_counted_per_statement(big_db, tmp_path):
+    entries = recorded_workload(big_db, tmp_path, [(LOOKUP, 3), ("SELECT COUNT(*) FROM reviews", 1)])
+    runs = {entry.sql: entry.runs for entry in entries}
+    assert sorted(runs.values()) == [1, 3]
+
+def test_filtered_scan_gets_a_covering_index(big_db, tmp_path):
+    entries = recorded_workload(big_db, tmp_path, [(LOOKUP, 5)])
+    conn = sqlite3.connect(big_db)
+    advisor = IndexAdvisor(conn)
+    try:
+        best = advisor.advise(entries)[0]
+        assert (best.table, best.columns, best.covering) == ("reviews", ["product_id", "rating"], True)
+        assert best.runs == 5 and best.cost_after < best.cost_before / 10
+
+        # Once the index exists it is not recommended again
+        conn.execute(best.create_sql)
+        advisor.close()
+        advisor = IndexAdvisor(conn)
+        assert not [r for r in advisor.advise(entries) if r.table == "reviews"]
+    finally:
+        advisor.close()
+        conn.close()
+
+def test_cheap_workload_gets_no_advice(db_path, tmp_path):
+    entries = recorded_workload(db_path, tmp_path, [(LOOKUP, 5)])
+    conn = sqlite3.connect(db_path)
+    advisor = IndexAdvisor(conn)
+    try:
+        # A handful of seed rows: a scan is as good as any index
+        assert advisor.advise(entries) == []
+    finally:
+        advisor.close()
+        conn.close()
@@ -0,0 +1,48 @@
+import pytest
+from app.domain.models import ForeignKey, SchemaInfo
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.join_graph import JoinGraph
+from app.services.rag_engine import RagEngine
+
+@pytest.fixture
+def graph(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    try:
+        yield JoinGraph(db.get_schema_info(db.get_all_table_names()))
+    finally:
+        db.close()
+
+def test_bridging_table_is_added_between_unlinked_tables(graph):
+    assert graph.connect(["users", "products"]) == ["users", "products", "reviews"]
+    assert graph.path("users", "products") == ["users", "reviews", "products"]
+
+def test_join_conditions_are_listed_once_on_the_fk_side(graph):
+    tables = ["users", "products", "reviews"]
+    assert graph.join_conditions("reviews", tables) == [
+        "reviews.user_id = users.user_id",
+        "reviews.product_id = products.product_id",
+    ]
+    assert graph.join_conditions("users", tables) == []
+
+def test_unknown_and_distant_tables_are_kept_as_is():
+    chain = [
+        SchemaInfo(table_name=f"t{i}", columns=["id (INTEGER)"], sample_rows=[],
+                   foreign_keys=[ForeignKey("next_id", f"t{i + 1}", "id")] if i < 4 else [])
+        for i in range(5)
+    ]
+    graph = JoinGraph(chain, max_hops=2)
+    assert graph.connect(["t0", "t2"]) == ["t0", "t2", "t1"]
+    # t0 -> t4 is four hops: no bridges, both tables kept
+    assert graph.connect(["t0", "t4"]) == ["t0", "t4"]
+    assert graph.connect(["t0", "missing"]) == ["t0", "missing"]
+
+def test_rag_context_carries_the_bridge_and_its_joins(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    rag = RagEngine(db, FakeLLMService(latency=0))
+    try:
+        context = {info.table_name: info for info in rag.get_context("users and products")}
+        assert {"users", "products", "reviews"} <= set(context)
+        assert "reviews.product_id = products.product_id" in context["reviews"].joins
+    finally:
+        db.close()
@@ -0,0 +1,20 @@
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.infrastructure.result_cache import canonicalize_sql
+
+def test_canonicalize_drops_comments_without_joining_lines():
+    assert canonicalize_sql("SELECT id -- the key\nFROM products; -- done\n") == "SELECT id FROM products"
+    assert canonicalize_sql("SELECT '--kept' /* note */ AS x;") == "SELECT '--kept' AS x"
+
+def test_page_of_sql_ending_in_a_comment(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    try:
+        sql = "SELECT product_id -- primary key\nFROM products\nORDER BY product_id; -- newest last"
+        full = db.execute_query(sql)
+        assert full.success and len(full.rows) > 2
+
+        page = db.execute_query(sql, max_rows=1, offset=1)
+        assert page.success, page.error
+        assert page.rows == full.rows[1:2]
+        assert page.truncated
+    finally:
+        db.close()
@@ -0,0 +1,37 @@
+import asyncio
+from app.infrastructure.query_planner import QueryPlanner
+from app.infrastructure.sqlite_db import SqliteRepository
+
+LOOKUP = "SELECT * FROM products WHERE product_id = 1"
+CROSS_JOIN = "SELECT COUNT(*) FROM products, reviews, users, orders"
+
+def test_nested_scans_cost_more_than_a_key_lookup(db_path):
+    db = SqliteRepository(db_path, max_workers=1, planner=QueryPlanner())
+    try:
+        lookup, cross = db.execute_query(LOOKUP).plan, db.execute_query(CROSS_JOIN).plan
+        assert lookup.action == cross.action == "ok"
+        assert lookup.rows == 1
+        assert cross.cost > 10 * lookup.cost
+    finally:
+        db.close()
+
+def test_expensive_statement_is_rejected_before_running(db_path):
+    db = SqliteRepository(db_path, max_workers=1, planner=QueryPlanner(), max_plan_cost=10)
+    try:
+        rejected = asyncio.run(db.execute_query_async(CROSS_JOIN))
+        assert not rejected.success and rejected.rows == []
+        assert rejected.plan.action == "rejected"
+        assert "exceeds the limit of 10" in rejected.error and "SCAN" in rejected.error
+
+        cheap = db.execute_query(LOOKUP)
+        assert cheap.success and cheap.plan.action == "ok"
+    finally:
+        db.close()
+
+def test_cap_action_runs_with_a_tighter_budget(db_path):
+    db = SqliteRepository(db_path, max_workers=1, planner=QueryPlanner(), max_plan_cost=10, plan_action="cap")
+    try:
+        capped = db.execute_query(CROSS_JOIN)
+        assert capped.success and capped.plan.action == "capped"
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from app.domain.exceptions import DatabaseBusyError
+from app.infrastructure.sqlite_db import SqliteRepository
+
+N = 2
+
+def test_open_streams_do_not_starve_queries(db_path):
+    """N suspended streams plus N queries on N workers / N pooled connections must all finish."""
+    db = SqliteRepository(db_path, max_workers=N, pool_size=N)
+
+    async def scenario():
+        streams = [db.iter_query_async("SELECT * FROM products", chunk_size=1) for _ in range(N)]
+        try:
+            # Each stream is now suspended between chunks
+            for stream in streams:
+                first = await stream.__anext__()
+                assert first.success
+            results = await asyncio.wait_for(
+                asyncio.gather(*(db.execute_query_async("SELECT COUNT(*) FROM products") for _ in range(N))),
+                timeout=10
+            )
+            assert all(r.success for r in results)
+        finally:
+            for stream in streams:
+                await asyncio.wait_for(stream.aclose(), timeout=10)
+
+    try:
+        asyncio.run(scenario())
+        assert db.pool_stats().in_use == 0
+    finally:
+        db.close()
+
+def test_stream_count_is_capped_and_counted(db_path):
+    db = SqliteRepository(db_path, max_workers=N, max_streams=1)
+
+    async def scenario():
+        first = db.iter_query_async("SELECT * FROM products", chunk_size=1)
+        try:
+            assert (await first.__anext__()).success
+            assert db.pool_stats().streams == 1
+
+            second = db.iter_query_async("SELECT * FROM products", chunk_size=1)
+            with pytest.raises(DatabaseBusyError):
+                await second.__anext__()
+        finally:
+            await first.aclose()
+
+    try:
+        asyncio.run(scenario())
+        stats = db.pool_stats()
+        assert stats.streams == 0 and stats.stream_rejections == 1
+        # Streams never take pooled connections
+        assert stats.checkouts == 0
+    finally:
+        db.close()
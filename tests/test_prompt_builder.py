@@ -0,0 +1,37 @@
+from app.domain.models import SchemaInfo
+from app.infrastructure.prompt_builder import SchemaPromptBuilder, estimate_tokens
+
+USERS = SchemaInfo(
+    table_name="users",
+    columns=["user_id (INTEGER)", "email (TEXT)", "password_hash (TEXT)", "avatar_url (TEXT)"],
+    sample_rows=[
+        {"user_id": 1, "email": "ann@example.com", "password_hash": "pbkdf2$abc", "avatar_url": "https://cdn.example.com/a.png"},
+        {"user_id": 2, "email": "bob@example.com", "password_hash": "pbkdf2$def", "avatar_url": "https://cdn.example.com/b.png"},
+    ],
+)
+
+def table(name, width):
+    return SchemaInfo(table_name=name, columns=[f"c{i} (TEXT)" for i in range(width)],
+                      sample_rows=[{f"c{i}": "some sample text" for i in range(width)}])
+
+def test_sensitive_and_high_entropy_samples_are_dropped():
+    text, _ = SchemaPromptBuilder().build([USERS])
+    # The columns are still described, only their values are withheld
+    assert "password_hash TEXT" in text and "avatar_url TEXT" in text
+    assert "pbkdf2" not in text and "cdn.example.com" not in text
+    assert "Sample rows (user_id, email): (1, 'ann@example.com')" in text
+
+def test_tables_past_the_budget_are_compacted_then_skipped():
+    context = [table("first", 20), table("second", 20), table("third", 20)]
+    _, compact = SchemaPromptBuilder().fragments(context[1])
+    budget = estimate_tokens(SchemaPromptBuilder().fragments(context[0])[0]) + estimate_tokens(compact)
+
+    text, used = SchemaPromptBuilder(token_budget=budget).build(context)
+    assert used <= budget
+    assert "Table first" in text and "Table second" in text and "Table third" not in text
+    # The second table only fits without its sample rows
+    assert text.count("Sample rows") == 1
+
+def test_first_table_is_kept_even_over_budget():
+    text, used = SchemaPromptBuilder(token_budget=1).build([table("wide", 50)])
+    assert "Table wide" in text and used > 1
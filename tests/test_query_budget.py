@@ -0,0 +1,35 @@
+import asyncio
+import time
+from app.infrastructure.sqlite_db import SqliteRepository
+
+# Never finishes on its own
+RUNAWAY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+def test_runaway_query_is_interrupted_by_the_budget(db_path):
+    db = SqliteRepository(db_path, max_workers=1, query_timeout=0.1)
+    try:
+        t0 = time.perf_counter()
+        result = db.execute_query(RUNAWAY)
+        assert time.perf_counter() - t0 < 2
+        assert not result.success and result.timed_out
+        assert "timed out" in result.error
+
+        # The connection is usable again right away
+        assert db.execute_query("SELECT COUNT(*) FROM products").success
+    finally:
+        db.close()
+
+def test_cancelling_the_caller_interrupts_the_statement(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+
+    async def scenario():
+        task = asyncio.create_task(db.execute_query_async(RUNAWAY))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        # Only one worker: this runs as soon as the runaway statement has stopped
+        return await asyncio.wait_for(db.execute_query_async("SELECT COUNT(*) FROM products"), timeout=5)
+
+    try:
+        assert asyncio.run(scenario()).success
+    finally:
+        db.close()
@@ -0,0 +1,27 @@
+import asyncio
+import threading
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.infrastructure.vector_index import VectorIndex
+from app.services.rag_engine import RagEngine
+
+class ThreadRecordingRag(RagEngine):
+    def _set_index(self, version, infos):
+        self.index_thread = threading.get_ident()
+        return super()._set_index(version, infos)
+
+def test_async_index_rebuild_runs_off_the_event_loop(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    rag = ThreadRecordingRag(db, FakeLLMService(latency=0), vector_index=VectorIndex())
+
+    async def scenario():
+        context = await rag.get_context_async("price of products")
+        return context, threading.get_ident()
+
+    try:
+        context, loop_thread = asyncio.run(scenario())
+        assert "products" in [info.table_name for info in context]
+        assert rag.index_thread != loop_thread
+        assert rag.vector_index.stats()["entries"] > 0
+    finally:
+        db.close()
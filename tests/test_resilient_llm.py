@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from app.domain.models import SchemaInfo
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.resilient_llm import CircuitBreaker, ResilientLLMService
+
+CONTEXT = [SchemaInfo(table_name="orders", columns=["id (INTEGER)"], sample_rows=[])]
+
+class PeakFakeLLM(FakeLLMService):
+    """Fake LLM that also records how many calls were in flight at once."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.peak = 0
+
+    def _enter(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def generate_sql(self, query, context):
+        self._enter()
+        try:
+            return super().generate_sql(query, context)
+        finally:
+            self._exit()
+
+    async def generate_sql_async(self, query, context):
+        self._enter()
+        try:
+            return await super().generate_sql_async(query, context)
+        finally:
+            self._exit()
+
+def test_retryable_errors_are_retried_with_backoff():
+    fake = FakeLLMService(latency=0, error_rate=1.0)
+    llm = ResilientLLMService(fake, max_retries=2, base_delay=0.01, breaker=CircuitBreaker(failure_threshold=10))
+
+    result = llm.generate_sql("how many orders", CONTEXT)
+    assert result.sql == "" and "Injected failure" in result.error_message
+    assert fake.calls == 3
+    assert llm.stats()["retries"] == 2 and llm.stats()["failures"] == 1
+
+    fake.error_rate = 0.0
+    assert llm.generate_sql("how many orders", CONTEXT).sql == "SELECT * FROM orders LIMIT 10"
+
+def test_non_retryable_errors_are_not_retried():
+    fake = FakeLLMService(latency=0, error_rate=1.0, retryable_errors=False)
+    llm = ResilientLLMService(fake, max_retries=2, base_delay=0.01)
+
+    assert asyncio.run(llm.generate_sql_async("how many orders", CONTEXT)).sql == ""
+    assert fake.calls == 1 and llm.stats()["retries"] == 0
+
+def test_slow_call_hits_the_deadline():
+    fake = FakeLLMService(latency=0.5)
+    llm = ResilientLLMService(fake, max_retries=0, timeout=0.05)
+
+    t0 = time.perf_counter()
+    result = asyncio.run(llm.generate_sql_async("how many orders", CONTEXT))
+    assert time.perf_counter() - t0 < 0.4
+    assert "deadline" in result.error_message
+    assert llm.stats()["timeouts"] == 1
+
+def test_breaker_opens_then_closes_after_a_successful_probe():
+    fake = FakeLLMService(latency=0, error_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    llm = ResilientLLMService(fake, max_retries=0, breaker=breaker)
+
+    llm.generate_sql("q", CONTEXT)
+    llm.generate_sql("q", CONTEXT)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Open: rejected without calling the provider
+    assert "circuit breaker is open" in llm.generate_sql("q", CONTEXT).error_message
+    assert fake.calls == 2 and llm.stats()["rejected"] == 1
+
+    # After reset_timeout one probe goes through and closes the circuit
+    fake.error_rate = 0.0
+    time.sleep(0.06)
+    assert llm.generate_sql("q", CONTEXT).sql
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_non_retryable_probe_closes_a_half_open_breaker():
+    fake = FakeLLMService(latency=0, error_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    llm = ResilientLLMService(fake, max_retries=0, breaker=breaker)
+
+    llm.generate_sql("q", CONTEXT)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # The probe reaches the provider but gets an unusable answer
+    fake.retryable_errors = False
+    time.sleep(0.06)
+    assert llm.generate_sql("q", CONTEXT).sql == ""
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_non_retryable_error_keeps_the_failure_streak():
+    fake = FakeLLMService(latency=0, error_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=3)
+    llm = ResilientLLMService(fake, max_retries=0, breaker=breaker)
+
+    llm.generate_sql("q", CONTEXT)
+    llm.generate_sql("q", CONTEXT)
+    fake.retryable_errors = False
+    llm.generate_sql("q", CONTEXT)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    fake.retryable_errors = True
+    llm.generate_sql("q", CONTEXT)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_concurrency_cap_is_shared_by_sync_and_async_callers():
+    fake = PeakFakeLLM(latency=0.05)
+    llm = ResilientLLMService(fake, max_concurrency=2)
+
+    async def scenario():
+        threads = [threading.Thread(target=llm.generate_sql, args=("q", CONTEXT)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        results = await asyncio.gather(*(llm.generate_sql_async("q", CONTEXT) for _ in range(4)))
+        await asyncio.to_thread(lambda: [thread.join() for thread in threads])
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(result.sql for result in results)
+    assert fake.calls == 8
+    assert fake.peak == 2
+    assert llm.stats()["in_flight"] == 0
@@ -0,0 +1,47 @@
+import gzip
+import json
+import pytest
+from app.infrastructure import response_encoding
+from app.infrastructure.response_encoding import (
+    compress, decode_columnar, encode_columnar, json_bytes, negotiate_encoding
+)
+
+COLUMNS = ["id", "status", "total", "note", "mixed"]
+ROWS = [(i, ["paid", "shipped"][i % 2], i * 1.5, None if i % 3 else f"note {i}", i if i % 2 else "x")
+        for i in range(40)]
+
+def test_columnar_round_trip_through_json():
+    payload = encode_columnar(COLUMNS, ROWS)
+    kinds = {column["name"]: column["type"] for column in payload["columns"]}
+    assert kinds == {"id": "int", "status": "dict", "total": "float", "note": "dict", "mixed": "mixed"}
+    assert payload["columns"][1]["values"] == ["paid", "shipped"]
+    # Nulls are a dictionary value like any other
+    assert None in payload["columns"][3]["values"]
+
+    assert decode_columnar(json.loads(json_bytes(payload))) == (COLUMNS, ROWS)
+
+def test_unique_strings_and_empty_results_are_kept_plain():
+    unique = [(f"user {i}",) for i in range(40)]
+    assert encode_columnar(["name"], unique)["columns"][0]["type"] == "str"
+
+    empty = encode_columnar(["a", "b"], [])
+    assert empty["row_count"] == 0 and decode_columnar(empty) == (["a", "b"], [])
+
+def test_encoding_follows_accept_encoding(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("br;q=1.0, gzip;q=0") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+
+def test_brotli_is_preferred_when_installed():
+    pytest.importorskip("brotli")
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+
+def test_compressed_body_round_trips():
+    body = json_bytes(encode_columnar(COLUMNS, ROWS * 50))
+    packed = compress(body, "gzip")
+    assert len(packed) < len(body) and gzip.decompress(packed) == body
+    assert compress(body, None) is body
@@ -0,0 +1,48 @@
+from app.domain.models import ExecutionResult
+from app.infrastructure.result_cache import ResultCache, estimate_size
+from app.infrastructure.sqlite_db import SqliteRepository
+
+def result(n: int) -> ExecutionResult:
+    return ExecutionResult(columns=["id", "name"], rows=[(i, f"name {i}") for i in range(n)], success=True)
+
+def test_repeated_query_is_served_from_cache_until_a_write(db_path):
+    db = SqliteRepository(db_path, max_workers=1, result_cache=ResultCache())
+    try:
+        sql = "SELECT COUNT(*) FROM reviews"
+        first = db.execute_query(sql)
+        assert not first.cached
+        # Whitespace and a trailing semicolon do not make it a different statement
+        second = db.execute_query("SELECT  COUNT(*)\nFROM reviews;")
+        assert second.cached and second.rows == first.rows
+
+        db.execute_write("DELETE FROM reviews")
+        after_write = db.execute_query(sql)
+        assert not after_write.cached and after_write.rows == [(0,)]
+        assert db.result_cache.stats()["invalidations"] == 1
+    finally:
+        db.close()
+
+def test_failed_queries_are_not_cached(db_path):
+    db = SqliteRepository(db_path, max_workers=1, result_cache=ResultCache())
+    try:
+        assert not db.execute_query("SELECT nope FROM reviews").success
+        assert db.result_cache.stats()["entries"] == 0
+    finally:
+        db.close()
+
+def test_cache_stays_within_its_byte_bound():
+    size = estimate_size(result(100))
+    cache = ResultCache(max_bytes=size * 3, max_entry_bytes=size * 2)
+
+    for n in range(5):
+        cache.put(f"SELECT {n}", 1, result(100))
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes
+    assert stats["entries"] == 3 and stats["evictions"] == 2
+    # Least recently used first
+    assert cache.get("SELECT 0", 1) is None
+    assert cache.get("SELECT 4", 1).cached
+
+    # Entries above max_entry_bytes are not stored at all
+    cache.put("SELECT big", 1, result(1000))
+    assert cache.get("SELECT big", 1) is None
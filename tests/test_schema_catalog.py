@@ -0,0 +1,45 @@
+from app.infrastructure.sqlite_db import SqliteRepository
+
+def make_repo(db_path, staleness: float = 0.0) -> SqliteRepository:
+    return SqliteRepository(db_path, max_workers=1, catalog_staleness=staleness)
+
+def test_schema_change_reloads_the_catalog(db_path):
+    db = make_repo(db_path)
+    try:
+        version = db.get_schema_version()
+        assert "audit_log" not in db.get_all_table_names()
+        loads = db.catalog.schema_loads
+
+        assert db.execute_write("CREATE TABLE audit_log (id INTEGER PRIMARY KEY, note TEXT)").success
+        assert db.get_schema_version() != version
+        assert "audit_log" in db.get_all_table_names()
+        assert db.get_schema_info(["audit_log"])[0].columns == ["id (INTEGER)", "note (TEXT)"]
+        assert db.catalog.schema_loads == loads + 1
+    finally:
+        db.close()
+
+def test_data_change_reloads_only_the_samples(db_path):
+    db = make_repo(db_path)
+    try:
+        db.execute_write("CREATE TABLE notes (body TEXT)")
+        assert db.get_schema_info(["notes"])[0].sample_rows == []
+        schema_loads, sample_loads = db.catalog.schema_loads, db.catalog.sample_loads
+
+        db.execute_write("INSERT INTO notes VALUES ('hello')")
+        assert db.get_schema_info(["notes"])[0].sample_rows == [{"body": "hello"}]
+        assert db.catalog.schema_loads == schema_loads
+        assert db.catalog.sample_loads == sample_loads + 1
+    finally:
+        db.close()
+
+def test_lookups_within_the_staleness_window_are_served_from_memory(db_path):
+    db = make_repo(db_path, staleness=60.0)
+    try:
+        tables = db.get_all_table_names()
+        db.execute_write("CREATE TABLE late (id INTEGER)")
+        assert db.get_all_table_names() == tables
+
+        db.catalog.refresh(force=True)
+        assert "late" in db.get_all_table_names()
+    finally:
+        db.close()
@@ -0,0 +1,32 @@
+import pytest
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.schema_index import SchemaIndex, tokenize
+
+@pytest.fixture
+def infos(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    try:
+        yield db.get_schema_info(db.get_all_table_names())
+    finally:
+        db.close()
+
+def tables(results):
+    return [table for table, _ in results]
+
+def test_tokenize_splits_identifiers_and_stems():
+    assert tokenize("Show the order_items per categories") == ["order", "item", "category"]
+
+def test_table_name_outranks_tables_that_only_reference_it(infos):
+    results = SchemaIndex(infos).search("cheapest products", k=3)
+    assert tables(results)[0] == "products"
+    assert results[0][1] > results[1][1]
+
+def test_business_words_reach_the_schema_through_synonyms(infos):
+    assert tables(SchemaIndex(infos).search("top customers", k=1)) == ["users"]
+    # Without the synonym map the users table is not found at all
+    assert "users" not in tables(SchemaIndex(infos, synonyms={}).search("top customers"))
+
+def test_min_score_and_k_trim_the_result(infos):
+    index = SchemaIndex(infos)
+    assert len(index.search("products reviews orders", k=2)) == 2
+    assert index.search("products", min_score=1e6) == []
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from conftest import StaticRag
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.services.query_pipeline import QueryPipeline
+from app.services.single_flight import SingleFlight
+from app.services.validator import SqlValidator
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def scenario():
+        same = await asyncio.gather(*(flights.do("q", work) for _ in range(3)))
+        other = await flights.do("other", work)
+        # Finished flights are forgotten: the next call runs again
+        again = await flights.do("q", work)
+        return same, other, again
+
+    same, other, again = asyncio.run(scenario())
+    assert same == [("answer", False), ("answer", True), ("answer", True)]
+    assert other == ("answer", False) and again == ("answer", False)
+    assert len(runs) == 3
+    assert flights.stats() == {"executions": 3, "coalesced": 2, "in_flight": 0}
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("q", work) for _ in range(2)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(scenario())] == [ValueError, ValueError]
+
+def test_work_is_cancelled_only_when_nobody_waits():
+    flights = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(0.05)
+            return "done"
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do("q", work))
+        follower = asyncio.ensure_future(flights.do("q", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        shared = await follower
+
+        alone = asyncio.ensure_future(flights.do("q2", work))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await alone
+        await asyncio.sleep(0)
+        return shared
+
+    assert asyncio.run(scenario()) == ("done", True)
+    assert cancelled == [1]
+
+def test_pipeline_coalesces_identical_questions(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    llm = FakeLLMService(latency=0.02)
+    pipeline = QueryPipeline(rag=StaticRag(db, ["products"]), llm=llm, validator=SqlValidator(), db=db,
+                             single_flight=SingleFlight())
+
+    async def scenario():
+        return await asyncio.gather(pipeline.run("List products"), pipeline.run("  list PRODUCTS "))
+
+    try:
+        first, second = asyncio.run(scenario())
+        assert first.execution.rows == second.execution.rows
+        assert "coalesced" not in first.metadata and second.metadata["coalesced"] is True
+        # One generation and one chart call for both requests
+        assert llm.calls == 2
+    finally:
+        db.close()
@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+import pytest
+from app.domain.exceptions import DatabaseBusyError
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.infrastructure.sqlite_pool import SqliteConnectionPool
+
+def test_pooled_connections_refuse_writes(db_path):
+    pool = SqliteConnectionPool(db_path, size=1)
+    try:
+        with pool.connection() as conn:
+            with pytest.raises(sqlite3.OperationalError, match="readonly"):
+                conn.execute("DELETE FROM products")
+            assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] > 0
+    finally:
+        pool.close()
+
+def test_repository_reads_from_the_pool_and_writes_through_the_writer(db_path):
+    db = SqliteRepository(db_path, max_workers=2)
+    try:
+        assert not db.execute_query("DELETE FROM products").success
+        assert db.execute_write("DELETE FROM reviews").success
+        assert db.execute_query("SELECT COUNT(*) FROM reviews").rows == [(0,)]
+        # The writer switched the database to WAL
+        assert db.execute_query("PRAGMA journal_mode").rows == [("wal",)]
+    finally:
+        db.close()
+
+def test_thread_gets_its_own_connection_back(db_path):
+    pool = SqliteConnectionPool(db_path, size=2)
+    try:
+        with pool.connection() as first:
+            pass
+        with pool.connection() as again:
+            assert again is first
+        assert pool.stats().open_connections == 1
+    finally:
+        pool.close()
+
+def test_acquire_waits_for_a_release(db_path):
+    pool = SqliteConnectionPool(db_path, size=1, acquire_timeout=5)
+    try:
+        held = pool._acquire()
+        threading.Timer(0.05, pool._release, args=(held,)).start()
+        with pool.connection() as conn:
+            assert conn is held
+        assert pool.stats().waits == 1 and pool.stats().timeouts == 0
+    finally:
+        pool.close()
+
+def test_acquire_gives_up_after_timeout(db_path):
+    pool = SqliteConnectionPool(db_path, size=1, acquire_timeout=0.05)
+    try:
+        with pool.connection():
+            with pytest.raises(DatabaseBusyError):
+                pool._acquire()
+        assert pool.stats().timeouts == 1
+    finally:
+        pool.close()
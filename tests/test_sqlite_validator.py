@@ -0,0 +1,73 @@
+import asyncio
+import sqlite3
+import threading
+import pytest
+from conftest import StaticRag
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.infrastructure.sqlite_validator import SqliteAuthorizerValidator
+from app.services.query_pipeline import QueryPipeline
+
+class StaticCatalog:
+    """Just what the validator asks of the database."""
+
+    def get_schema_version(self) -> int:
+        return 1
+
+    def get_all_table_names(self):
+        return ["items"]
+
+def test_locked_database_is_raised_and_not_cached(tmp_path):
+    path = str(tmp_path / "items.db")
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    validator = SqliteAuthorizerValidator(
+        lambda: sqlite3.connect(path, timeout=0, check_same_thread=False), StaticCatalog()
+    )
+    try:
+        writer.execute("BEGIN EXCLUSIVE")
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            validator.validate("SELECT name FROM items")
+        writer.execute("COMMIT")
+
+        assert validator.validate("SELECT name FROM items").is_valid
+        assert validator.stats()["hits"] == 0
+    finally:
+        validator.close()
+        writer.close()
+
+def test_invalid_and_denied_statements_are_cached(tmp_path):
+    path = str(tmp_path / "items.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    validator = SqliteAuthorizerValidator(lambda: sqlite3.connect(path, check_same_thread=False), StaticCatalog())
+    try:
+        for sql in ("SELECT nope FROM items", "SELECT * FROM sqlite_master"):
+            assert not validator.validate(sql).is_valid
+            assert not validator.validate(sql).is_valid
+        assert validator.stats() == {"entries": 2, "hits": 2, "misses": 2}
+    finally:
+        validator.close()
+
+class ThreadRecordingValidator(SqliteAuthorizerValidator):
+    def validate(self, sql):
+        self.thread = threading.get_ident()
+        return super().validate(sql)
+
+def test_pipeline_validates_off_the_event_loop(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    validator = ThreadRecordingValidator(db.pool.open_connection, db)
+    llm = FakeLLMService(latency=0, answers={"list the products": "SELECT title FROM products"})
+    pipeline = QueryPipeline(rag=StaticRag(db, ["products"]), llm=llm, validator=validator, db=db)
+
+    async def scenario():
+        outcome = await pipeline.run("List the products")
+        return outcome, threading.get_ident()
+
+    try:
+        outcome, loop_thread = asyncio.run(scenario())
+        assert outcome.error is None
+        assert validator.thread != loop_thread
+    finally:
+        validator.close()
+        db.close()
@@ -0,0 +1,45 @@
+import asyncio
+from conftest import StaticRag
+from app.infrastructure.fake_llm import FakeLLMService
+from app.infrastructure.sqlite_db import SqliteRepository
+from app.infrastructure.telemetry import metrics, current_trace
+from app.services.query_pipeline import QueryPipeline
+from app.services.validator import SqlValidator
+
+def test_stream_execution_span_excludes_the_client_read_time(db_path):
+    db = SqliteRepository(db_path, max_workers=1)
+    llm = FakeLLMService(latency=0, answers={"list the products": "SELECT title FROM products"})
+    pipeline = QueryPipeline(rag=StaticRag(db, ["products"]), llm=llm, validator=SqlValidator(), db=db)
+
+    async def slow_client():
+        events = {}
+        async for event, payload in pipeline.stream("List the products", chunk_size=1):
+            events[event] = payload
+            if event == "rows":
+                # The client takes its time reading each chunk
+                await asyncio.sleep(0.1)
+        spans = [s for s in current_trace().spans if s.name == "execution"]
+        return events, spans
+
+    try:
+        events, spans = asyncio.run(slow_client())
+        rows = events["done"]["row_count"]
+        assert rows >= 2
+        assert events["done"]["metadata"]["timings"]["execution"] < 0.05
+        assert len(spans) == 1 and spans[0].duration < 0.05 and spans[0].attributes["rows"] == rows
+    finally:
+        db.close()
+
+def test_prometheus_rendering_of_counters_and_histograms():
+    counter = metrics.counter("test_events_total", "Test events", ["kind"])
+    histogram = metrics.histogram("test_latency_seconds", "Test latency", buckets=(0.1, 1.0))
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    text = metrics.render()
+    assert 'test_events_total{kind="a"} 3' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_latency_seconds_count 2" in text
@@ -0,0 +1,52 @@
+import os
+import threading
+from app.infrastructure.vector_index import VectorIndex
+
+def test_concurrent_saves_keep_a_consistent_index(tmp_path):
+    path = str(tmp_path / "index" / "vectors")
+    index = VectorIndex(path, save_every=1)
+
+    def add(worker: int):
+        for i in range(25):
+            index.add_question(f"question {worker} number {i}", ["orders"])
+            index.save()
+
+    threads = [threading.Thread(target=add, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index.close()
+
+    # No temp files left behind, and the files on disk hold every question
+    assert sorted(os.listdir(tmp_path / "index")) == ["vectors.json", "vectors.npy"]
+    assert VectorIndex(path).stats()["questions"] == 100
+
+def test_failed_save_is_logged_not_raised(tmp_path):
+    blocker = tmp_path / "not_a_directory"
+    blocker.write_text("")
+    index = VectorIndex(str(blocker / "vectors"), save_every=1)
+
+    index.add_question("how many orders", ["orders"])
+    assert index.save() is False
+    assert index.stats()["unsaved"] == 1
+    index.close()
+
+def run_threads(target, count: int = 8):
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_concurrent_adds_of_one_question_keep_one_entry():
+    index = VectorIndex()
+    run_threads(lambda n: [index.add_question("how many orders", ["orders"]) for _ in range(20)])
+    assert index.stats()["questions"] == 1
+    assert index.stats()["entries"] == len(index._matrix)
+
+def test_question_cap_holds_under_concurrency():
+    index = VectorIndex(max_questions=5)
+    run_threads(lambda n: [index.add_question(f"question {n} number {i}", ["orders"]) for i in range(10)])
+    assert index.stats()["questions"] == 5
+    assert index.stats()["entries"] == len(index._matrix)